@@ -1,67 +1,2468 @@
-from flask import Flask, render_template, g, request, redirect, url_for, session, flash, jsonify
-from datetime import date, datetime, timedelta
+from flask import Flask, render_template, g, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, has_request_context
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from itsdangerous import BadSignature
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.security import check_password_hash, generate_password_hash
+import click
+from datetime import date, datetime, timedelta, timezone
+import base64
+import cProfile
+import csv
+import functools
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import math
+import os
+import pstats
+import queue
+import re
+import secrets
 import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, OrderedDict, defaultdict, deque
 
 # CONFIG
-DATABASE = "Community Connect.db"  # your SQLite database file
+DATABASE = os.environ.get("COMMUNITY_CONNECT_DB", "Community Connect.db")  # your SQLite database file
+POOL_SIZE = 8              # warm read-only connections kept per process
+WRITER_POOL_SIZE = 1       # connections for requests that may write; SQLite lets one write at a time anyway
+POOL_TIMEOUT = 10          # seconds a request waits for a free connection
+CACHED_STATEMENTS = 256    # prepared statements kept per connection (sqlite3 default is 128)
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_BACKEND = "memory"   # "memory" (per process LRU) or "file" (shared between processes)
+CACHE_FILE = "cache.db"
+CACHE_TTL = 300            # seconds
+CACHE_MAX_ENTRIES = 1024
+FRAGMENT_CACHE_MAX_ENTRIES = 20000  # rendered cards and profile blocks kept per process
+FRAGMENT_TTL = 3600                 # seconds, entries are keyed on row versions so this only frees memory
+PROFILE_CACHE_MAX_ENTRIES = 10000   # volunteer profiles memoised per process
+PROFILE_TTL = 30                    # seconds a memoised profile may lag a write made by another process
+SLOW_QUERY_MS = 50         # statements slower than this are logged
+N_PLUS_ONE_THRESHOLD = 10  # the same statement run this many times in one request is logged as an N+1
+PROFILING = False          # allow ?_profile=1 on local requests to return a cProfile report
+SESSION_IDLE_SECONDS = 2 * 60 * 60  # server-side sessions unused for this long are expired
+SESSION_TOUCH_SECONDS = 60          # how stale a session's LastSeen may get before it is rewritten
+PASSWORD_WORKERS = 2                # threads that hash passwords, so logins cannot use every CPU
+NOTIFY_BUFFER_SIZE = 1000           # recent notifications kept for clients that reconnect
+NOTIFY_HEARTBEAT_SECONDS = 25       # idle event streams get a comment this often so proxies keep them open
+NOTIFY_RETRY_MS = 3000              # how long a browser waits before reconnecting a dropped stream
+LIFECYCLE_INTERVAL_SECONDS = 300    # how often each process's scheduler extends series, passes and archives events, 0 to leave it to the CLI
+LIFECYCLE_BATCH_SIZE = 500          # events per write transaction, so requests never wait long behind it
+ARCHIVE_AFTER_DAYS = 90             # passed events older than this move to the Archived* tables
+READ_REPLICA = os.environ.get("COMMUNITY_CONNECT_REPLICA")  # snapshot file for read-only routes, None to read DATABASE itself
+REPLICA_REFRESH_SECONDS = 5         # how often the snapshot is copied from DATABASE
+REPLICA_MAX_STALENESS = 15          # seconds; an older snapshot is passed over and DATABASE read instead
 app = Flask(__name__)
 app.secret_key = "Jiggery"
+app.config["LIVE_NOTIFICATIONS"] = False  # asgi.py turns this on, it is the only server of /notifications
 
-# DATABSE CONNECTION
-def get_db():
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
+# DATABSE CONNECTION POOL
+class ConnectionPool:
+    """
+    Keeps up to `size` open connections to one database file so the page cache and
+    prepared statements survive between requests. Connections are opened lazily; when
+    all of them are checked out, callers wait for one to be returned. A read_only pool
+    opens the file with mode=ro, so its connections can never take the write lock.
+    """
+
+    def __init__(self, database, size=POOL_SIZE, timeout=POOL_TIMEOUT, read_only=False):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.read_only = read_only
+        self.pid = os.getpid()
+        self.idle = []  # used as a stack so the warmest connection is reused first
+        self.waiters = deque()  # callers waiting for a connection, oldest first
+        self.lock = threading.Lock()
+        self.metrics = {"checkouts": 0, "waits": 0, "open_connections": 0, "in_use": 0}
+
+    def connect(self):
+        if self.read_only and needs_migration(DATABASE):
+            # A read-only connection cannot migrate, so bring the schema up to date through a writable one first
+            writer = connect_database()
+            migrate(writer)
+            writer.close()
+        db = sqlite3.connect(
+            f"file:{urllib.parse.quote(os.path.abspath(self.database))}?mode=ro" if self.read_only else self.database,
+            uri=self.read_only,
+            factory=InstrumentedConnection,
+            timeout=self.timeout,
+            check_same_thread=False,  # connections move between worker threads via the pool
+            cached_statements=CACHED_STATEMENTS,
+        )
         db.row_factory = sqlite3.Row  # lets you access results like dicts
+        if not self.read_only:
+            # WAL lets readers carry on while a writer commits, and NORMAL is durable enough under WAL
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+        db.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        # SQLite leaves foreign keys off unless each connection asks; with them on, the schema's
+        # ON DELETE CASCADE clauses remove an event's roles and signups instead of orphaning them
+        db.execute("PRAGMA foreign_keys = ON")
+        if not self.read_only and needs_migration(self.database):
+            migrate(db)
+        return db
+
+    def checkout(self):
+        with self.lock:
+            self.metrics["checkouts"] += 1
+            self.metrics["in_use"] += 1
+            if self.idle:
+                return self.idle.pop()
+            if self.metrics["open_connections"] < self.size:
+                self.metrics["open_connections"] += 1
+                waiter = None
+            else:
+                self.metrics["waits"] += 1
+                waiter = queue.SimpleQueue()
+                self.waiters.append(waiter)
+        try:
+            if waiter is None:
+                return self.connect()
+            return waiter.get(timeout=self.timeout)
+        except Exception:
+            with self.lock:
+                self.metrics["in_use"] -= 1
+                if waiter is None:
+                    self.metrics["open_connections"] -= 1
+                elif waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                else:
+                    # A connection was handed over just as we gave up, pass it on
+                    self.release(waiter.get_nowait())
+            raise
+
+    def checkin(self, db):
+        # Never hand the next request a half finished transaction
+        if db.in_transaction:
+            db.rollback()
+        db.stats = None
+        with self.lock:
+            self.metrics["in_use"] -= 1
+            self.release(db)
+
+    def release(self, db):
+        """
+        Gives a free connection straight to the longest waiting caller, or parks it if nobody
+        is waiting. Handing it over means a caller that has just arrived cannot take it first,
+        so under a burst no request waits much longer than the rest. Call with self.lock held.
+        """
+        if self.waiters:
+            self.waiters.popleft().put(db)
+        else:
+            self.idle.append(db)
+
+
+_pools = {}  # (kind, database file) -> ConnectionPool
+_pools_lock = threading.Lock()
+
+def get_pool(kind="write"):
+    """
+    The process's pool of one kind: "write" (the writer, WRITER_POOL_SIZE connections),
+    "read" (read-only connections to DATABASE) or "replica" (read-only, to READ_REPLICA).
+    """
+    key = (kind, READ_REPLICA if kind == "replica" else DATABASE)
+    pool = _pools.get(key)
+    # Connections must not be shared with a forked worker, so each process builds its own pool
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[key] = ConnectionPool(key[1], WRITER_POOL_SIZE if kind == "write" else POOL_SIZE,
+                                                    read_only=kind != "write")
+    return pool
+
+def request_connection(kind):
+    """The request's connection from the pool of this kind, checked out on first use and returned at teardown."""
+    connections = g.setdefault('_connections', {})
+    if kind not in connections:
+        pool = get_pool(kind)
+        db = pool.checkout()
+        # A streamed response can check out a second connection, both add to the same stats
+        db.stats = g.get('_sql_stats')
+        connections[kind] = (pool, db, db.total_changes)
+    return connections[kind][1]
+
+def get_write_db():
+    return request_connection("write")
+
+def get_read_db(live=False):
+    """
+    A read-only connection. It reads the READ_REPLICA snapshot while that is within
+    REPLICA_MAX_STALENESS and was taken after this session's last write, otherwise DATABASE
+    itself. Pass live=True for anything kept past the request, such as cache entries.
+    """
+    if READ_REPLICA and not live and has_request_context():
+        snapshot_at = replica_state["snapshot_at"]
+        if (snapshot_at and time.time() - snapshot_at <= REPLICA_MAX_STALENESS
+                and session.get("written_at", 0) < snapshot_at):
+            return request_connection("replica")
+    return request_connection("read")
+
+def get_db():
+    """The handler's connection: read-only in views marked @read_only, the writer everywhere else."""
+    if g.get('_read_only'):
+        return get_read_db()
+    return get_write_db()
+
+def read_only(view):
+    """Marks a view that never writes, so its GET requests are served from read-only connections."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ("GET", "HEAD"):
+            g._read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.after_request
+def remember_write(response):
+    # Read-your-writes: this session reads DATABASE until a snapshot taken after the write exists
+    connection = g.get('_connections', {}).get("write")
+    if READ_REPLICA and connection is not None and connection[1].total_changes != connection[2]:
+        session["written_at"] = time.time()
+    return response
+
+@app.teardown_appcontext
+def close_connection(exception):
+    for pool, db, _ in g.pop('_connections', {}).values():
+        pool.checkin(db)
+
+def is_local_request():
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+# POOL METRICS (only served to the local machine)
+@app.route("/pool_metrics")
+def pool_metrics():
+    if not is_local_request():
+        return "Not Found", 404
+    return jsonify({f"{kind} {path}": dict(pool.metrics, size=pool.size) for (kind, path), pool in _pools.items()})
+
+#////////////////////////////////////////////////////////////////////INSTRUMENTATION////////////////////////////////////////////////////////////////////
+
+class SqlStats:
+    """The statements one request ran: how many, how long in total, the slowest and the most repeated."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.repeats = Counter()  # statement text -> times run
+        self.slowest = []         # (seconds, statement), slowest first, at most 5
+
+    def record(self, sql, seconds):
+        sql = " ".join(sql.split())
+        self.count += 1
+        self.seconds += seconds
+        self.repeats[sql] += 1
+        if len(self.slowest) < 5 or seconds > self.slowest[-1][0]:
+            self.slowest = sorted(self.slowest + [(seconds, sql)], reverse=True)[:5]
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every statement into the current request's SqlStats."""
+    stats = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            if self.stats is not None:
+                self.stats.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            if self.stats is not None:
+                self.stats.record(sql, time.perf_counter() - start)
+
+class Histogram:
+    """Prometheus style cumulative histogram, one series per route."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # route -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, route, value):
+        with self.lock:
+            series = self.series.setdefault(route, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for route, series in sorted(self.series.items()):
+                label = route.replace("\\", "\\\\").replace('"', '\\"')
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{route="{label}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{route="{label}",le="+Inf"}} {series[-1]}')
+                lines.append(f'{self.name}_sum{{route="{label}"}} {series[-2]}')
+                lines.append(f'{self.name}_count{{route="{label}"}} {series[-1]}')
+        return lines
+
+REQUEST_SECONDS = Histogram("cc_request_duration_seconds", "Time to handle a request.",
+                            [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+REQUEST_QUERIES = Histogram("cc_request_queries", "SQL statements run per request.",
+                            [0, 1, 2, 3, 5, 10, 20, 50, 100, 500])
+REQUEST_SQL_SECONDS = Histogram("cc_request_sql_seconds", "Time spent in SQLite per request.",
+                                [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1])
+slow_queries = Counter()  # route -> statements slower than SLOW_QUERY_MS
+n_plus_ones = Counter()   # route -> requests that repeated a statement N_PLUS_ONE_THRESHOLD times
+
+@app.before_request
+def start_request_timer():
+    g._request_start = time.perf_counter()
+    g._sql_stats = SqlStats()
+    if PROFILING and request.args.get("_profile") and is_local_request():
+        g._profiler = cProfile.Profile()
+        g._profiler.enable()
+
+@app.after_request
+def finish_request_metrics(response):
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+        response = Response(report.getvalue(), mimetype="text/plain")
+    # Recorded once the body has been sent, so streamed responses count their queries too
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    response.call_on_close(functools.partial(record_request_metrics, route, g._request_start, g._sql_stats))
+    return response
+
+def record_request_metrics(route, start, stats):
+    REQUEST_SECONDS.observe(route, time.perf_counter() - start)
+    REQUEST_QUERIES.observe(route, stats.count)
+    REQUEST_SQL_SECONDS.observe(route, stats.seconds)
+
+    for seconds, sql in stats.slowest:
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            slow_queries[route] += 1
+            app.logger.warning("Slow query in %s (%.1f ms): %s", route, seconds * 1000, sql[:200])
+    sql, times = stats.repeats.most_common(1)[0] if stats.repeats else ("", 0)
+    if times >= N_PLUS_ONE_THRESHOLD:
+        n_plus_ones[route] += 1
+        app.logger.warning("Possible N+1 in %s: ran %d times: %s", route, times, sql[:200])
+
+# PROMETHEUS METRICS (only served to the local machine)
+@app.route("/metrics")
+def metrics():
+    if not is_local_request():
+        return "Not Found", 404
+    lines = []
+    for histogram in (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS):
+        lines.extend(histogram.render())
+    for name, help_text, counts in (("cc_slow_queries_total", f"Statements slower than {SLOW_QUERY_MS} ms.", slow_queries),
+                                    ("cc_n_plus_one_total", "Requests that repeated one statement many times.", n_plus_ones)):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{route="{route}"}} {count}' for route, count in sorted(counts.items())]
+    for key in ("checkouts", "waits", "open_connections", "in_use"):
+        lines += [f"# TYPE cc_pool_{key} {'counter' if key in ('checkouts', 'waits') else 'gauge'}"]
+        lines += [f'cc_pool_{key}{{database="{path}",kind="{kind}"}} {pool.metrics[key]}' for (kind, path), pool in _pools.items()]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+#////////////////////////////////////////////////////////////////////MIGRATIONS////////////////////////////////////////////////////////////////////
+
+def profile_skills_sql(volunteer_id):
+    """SQL for a volunteer's skill names as a JSON array, in name order."""
+    return f"""
+        SELECT json_group_array(Name) FROM (
+            SELECT s.Name FROM VolunteerSkills vs JOIN Skills s ON s.ID = vs.SkillID
+            WHERE vs.VolunteerID = {volunteer_id}
+            ORDER BY s.Name
+        )"""
+
+def upcoming_signups_sql(condition):
+    """SQL counting the pending and accepted signups for upcoming events that match condition."""
+    return f"""
+        SELECT COUNT(*) FROM Signups s
+        JOIN EventRoles er ON er.ID = s.RoleID
+        JOIN Events e ON e.ID = er.EventID
+        WHERE {condition} AND s.Status IN ('Pending', 'Accepted') AND e.Status = 'Upcoming'"""
+
+# Summary tables kept current by the triggers in migration 6. Each query recomputes one table
+# from scratch, for the first fill and for rebuild-stats.
+STATS_QUERIES = {
+    "OrganisationStats": """
+        SELECT o.ID,
+            (SELECT COUNT(*) FROM Events e WHERE e.OrganisationID = o.ID),
+            (SELECT COUNT(*) FROM Events e JOIN EventRoles er ON er.EventID = e.ID WHERE e.OrganisationID = o.ID),
+            COUNT(s.ID),
+            COALESCE(SUM(s.Status = 'Pending'), 0),
+            COALESCE(SUM(s.Status = 'Accepted'), 0),
+            COALESCE(SUM(s.Status = 'Rejected'), 0)
+        FROM Organisations o
+        LEFT JOIN Events e ON e.OrganisationID = o.ID
+        LEFT JOIN EventRoles er ON er.EventID = e.ID
+        LEFT JOIN Signups s ON s.RoleID = er.ID
+        GROUP BY o.ID
+    """,
+    "RoleStats": """
+        SELECT er.ID, er.EventID, e.OrganisationID,
+            COUNT(s.ID),
+            COALESCE(SUM(s.Status = 'Pending'), 0),
+            COALESCE(SUM(s.Status = 'Accepted'), 0),
+            COALESCE(SUM(s.Status = 'Rejected'), 0)
+        FROM EventRoles er
+        JOIN Events e ON e.ID = er.EventID
+        LEFT JOIN Signups s ON s.RoleID = er.ID
+        GROUP BY er.ID
+    """,
+    "VolunteerStats": """
+        SELECT v.ID, COUNT(s.ID), COALESCE(SUM(s.Status = 'Accepted'), 0)
+        FROM Volunteers v
+        LEFT JOIN Signups s ON s.VolunteerID = v.ID
+        GROUP BY v.ID
+    """,
+    # The read model behind volunteer profiles, kept current by the migration 13 triggers
+    "VolunteerProfiles": f"""
+        SELECT v.ID, ({profile_skills_sql("v.ID")}), ({upcoming_signups_sql("s.VolunteerID = v.ID")})
+        FROM Volunteers v
+    """,
+}
+
+def rebuild_stats(db):
+    """
+    Recomputes every summary table, for recovery if they ever drift. Returns how many rows
+    were missing or wrong. Runs inside the caller's transaction. TotalHoursContributed is a running total
+    of events that have passed and is left alone. Counts for archived rows come from ArchivedStats.
+    """
+    tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    archived = "ArchivedStats" in tables
+    drifted = 0
+    for table, query in STATS_QUERIES.items():
+        if table not in tables:
+            continue  # added by a later migration than the one running this
+        db.execute(f"CREATE TEMP TABLE fresh_stats AS SELECT * FROM {table} WHERE 0")
+        db.execute(f"INSERT INTO fresh_stats {query}")
+        if archived and table in ARCHIVED_STATS:
+            add_archived_counts(db, "fresh_stats", table, "ArchivedStats")
+        drifted += db.execute(f"SELECT COUNT(*) FROM (SELECT * FROM fresh_stats EXCEPT SELECT * FROM {table})").fetchone()[0]
+        db.execute(f"DELETE FROM {table}")
+        db.execute(f"INSERT INTO {table} SELECT * FROM fresh_stats")
+        db.execute("DROP TABLE temp.fresh_stats")
+    return drifted
+
+# Archived events, roles and signups still count towards these summary tables (kind, key, counters)
+ARCHIVED_STATS = {
+    "OrganisationStats": ("organisation", "OrganisationID",
+                          ["EventCount", "RoleCount", "SignupCount", "PendingCount", "AcceptedCount", "RejectedCount"]),
+    "VolunteerStats": ("volunteer", "VolunteerID", ["SignupCount", "AcceptedCount"]),
+}
+
+def add_archived_counts(db, target, table, source):
+    """Adds the counters in source (ArchivedStats or a batch shaped like it) to target, a table shaped like table."""
+    kind, key, columns = ARCHIVED_STATS[table]
+    db.execute(
+        f"""
+        UPDATE {target} SET {", ".join(f"{c} = {target}.{c} + a.{c}" for c in columns)}
+        FROM {source} a
+        WHERE a.Kind = ? AND a.ID = {target}.{key}
+        """,
+        (kind,)
+    )
+
+def stats_counts(table, key, sign, status):
+    """SQL for one trigger step that moves a summary row's counters for a signup by +1 or -1."""
+    return f"""
+            UPDATE {table} SET
+                SignupCount = SignupCount {sign} 1,
+                PendingCount = PendingCount {sign} ({status} = 'Pending'),
+                AcceptedCount = AcceptedCount {sign} ({status} = 'Accepted'),
+                RejectedCount = RejectedCount {sign} ({status} = 'Rejected')
+            WHERE {key};"""
+
+# Hours between an event's StartTime and EndTime
+EVENT_HOURS = "ROUND((julianday(e.EndTime) - julianday(e.StartTime)) * 24, 2)"
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+
+def load_gazetteer(db):
+    """Loads the bundled suburbs and cities (name, state, lat, lon) into Places."""
+    with open(GAZETTEER_FILE, newline="") as f:
+        db.executemany(
+            "INSERT OR IGNORE INTO Places (Name, State, Latitude, Longitude) VALUES (?, ?, ?, ?)",
+            ((row["Name"], row["State"], float(row["Latitude"]), float(row["Longitude"])) for row in csv.DictReader(f))
+        )
+
+def geocode_sql(location):
+    """
+    SQL for the (Latitude, Longitude) of the longest place name found as whole words in a
+    location expression, so "Sydney Park" finds Sydney and "North Sydney" beats Sydney.
+    """
+    # The location is cleaned up once in its own subquery rather than once per place
+    return f"""
+        SELECT Places.Latitude, Places.Longitude
+        FROM Places, (SELECT ' ' || lower(replace(replace(replace({location}, ',', ' '), '.', ' '), '-', ' ')) || ' ' AS Words) l
+        WHERE instr(l.Words, ' ' || lower(Places.Name) || ' ') > 0
+        ORDER BY length(Places.Name) DESC
+        LIMIT 1
+    """
+
+# Each migration is (version, description, statements). The database's PRAGMA user_version
+# records the last one applied, so only newer migrations run. Never edit a migration that has
+# shipped - add a new one instead.
+MIGRATIONS = [
+    (1, "indexes for the hot lookup columns", [
+        # Duplicate signups would stop the unique index being created, keep the oldest one
+        """
+        DELETE FROM Signups
+        WHERE ID NOT IN (SELECT MIN(ID) FROM Signups GROUP BY VolunteerID, RoleID)
+        """,
+        """
+        DELETE FROM VolunteerSkills
+        WHERE ID NOT IN (SELECT MIN(ID) FROM VolunteerSkills GROUP BY VolunteerID, SkillID)
+        """,
+        # One signup per volunteer per role, register_for_role relies on this
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_signups_volunteer_role ON Signups(VolunteerID, RoleID)",
+        "CREATE INDEX IF NOT EXISTS idx_signups_role ON Signups(RoleID, Status)",
+        "CREATE INDEX IF NOT EXISTS idx_eventroles_event ON EventRoles(EventID, SkillID)",
+        "CREATE INDEX IF NOT EXISTS idx_events_organisation_date ON Events(OrganisationID, Date)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_volunteerskills_volunteer_skill ON VolunteerSkills(VolunteerID, SkillID)",
+        # login() finds accounts by Email through its UNIQUE autoindex. Password stays out of
+        # every index, where it would be one more copy of each plaintext password
+    ]),
+    (2, "indexes for keyset paging of events", [
+        # Every index ends with the rowid, so these are all ordered by (..., Date, ID)
+        "CREATE INDEX IF NOT EXISTS idx_events_date ON Events(Date)",
+        "CREATE INDEX IF NOT EXISTS idx_events_location_date ON Events(Location, Date)",
+    ]),
+    (3, "data generation counter for bulk jobs", [
+        # Bulk jobs run in their own process, so they bump this instead of clearing the servers'
+        # in-memory matchers and caches, which they cannot reach. See sync_data_generation().
+        """
+        CREATE TABLE IF NOT EXISTS DataGeneration (
+            ID INTEGER PRIMARY KEY CHECK (ID = 1),
+            Value INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO DataGeneration (ID, Value) VALUES (1, 0)",
+    ]),
+    (4, "full text search over events, roles and organisations", [
+        # rowid = ID * 4 + kind (1 event, 2 role, 3 organisation) so triggers find a row without a scan
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS SearchIndex USING fts5(
+            Name, Description, Location,
+            Kind UNINDEXED, ItemID UNINDEXED, EventID UNINDEXED,
+            prefix = '2 3'
+        )
+        """,
+        """
+        INSERT INTO SearchIndex (rowid, Name, Description, Location, Kind, ItemID, EventID)
+        SELECT ID * 4 + 1, Name, Description, Location, 'event', ID, ID FROM Events
+        UNION ALL
+        SELECT ID * 4 + 2, Name, Description, NULL, 'role', ID, EventID FROM EventRoles
+        UNION ALL
+        SELECT ID * 4 + 3, Name, Description, Address, 'organisation', ID, NULL FROM Organisations
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_events_insert AFTER INSERT ON Events BEGIN
+            INSERT INTO SearchIndex (rowid, Name, Description, Location, Kind, ItemID, EventID)
+            VALUES (new.ID * 4 + 1, new.Name, new.Description, new.Location, 'event', new.ID, new.ID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_events_update AFTER UPDATE OF Name, Description, Location ON Events BEGIN
+            UPDATE SearchIndex SET Name = new.Name, Description = new.Description, Location = new.Location
+            WHERE rowid = new.ID * 4 + 1;
+        END
+        """,
+        # Also drops the event's roles, which stay behind when foreign keys are not enforced
+        """
+        CREATE TRIGGER IF NOT EXISTS search_events_delete AFTER DELETE ON Events BEGIN
+            DELETE FROM SearchIndex WHERE rowid = old.ID * 4 + 1;
+            DELETE FROM SearchIndex WHERE rowid IN (SELECT ID * 4 + 2 FROM EventRoles WHERE EventID = old.ID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_roles_insert AFTER INSERT ON EventRoles BEGIN
+            INSERT INTO SearchIndex (rowid, Name, Description, Location, Kind, ItemID, EventID)
+            VALUES (new.ID * 4 + 2, new.Name, new.Description, NULL, 'role', new.ID, new.EventID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_roles_update AFTER UPDATE OF Name, Description ON EventRoles BEGIN
+            UPDATE SearchIndex SET Name = new.Name, Description = new.Description
+            WHERE rowid = new.ID * 4 + 2;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_roles_delete AFTER DELETE ON EventRoles BEGIN
+            DELETE FROM SearchIndex WHERE rowid = old.ID * 4 + 2;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_organisations_insert AFTER INSERT ON Organisations BEGIN
+            INSERT INTO SearchIndex (rowid, Name, Description, Location, Kind, ItemID, EventID)
+            VALUES (new.ID * 4 + 3, new.Name, new.Description, new.Address, 'organisation', new.ID, NULL);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_organisations_update AFTER UPDATE OF Name, Description, Address ON Organisations BEGIN
+            UPDATE SearchIndex SET Name = new.Name, Description = new.Description, Location = new.Address
+            WHERE rowid = new.ID * 4 + 3;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_organisations_delete AFTER DELETE ON Organisations BEGIN
+            DELETE FROM SearchIndex WHERE rowid = old.ID * 4 + 3;
+        END
+        """,
+    ]),
+    (5, "coordinates and a spatial index for events near a volunteer", [
+        """
+        CREATE TABLE IF NOT EXISTS Places (
+            ID INTEGER PRIMARY KEY,
+            Name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            State TEXT,
+            Latitude REAL NOT NULL,
+            Longitude REAL NOT NULL
+        )
+        """,
+        load_gazetteer,
+        "ALTER TABLE Events ADD COLUMN Latitude REAL",
+        "ALTER TABLE Events ADD COLUMN Longitude REAL",
+        "ALTER TABLE Volunteers ADD COLUMN Latitude REAL",
+        "ALTER TABLE Volunteers ADD COLUMN Longitude REAL",
+        f"UPDATE Events SET (Latitude, Longitude) = ({geocode_sql('Events.Location')})",
+        f"UPDATE Volunteers SET (Latitude, Longitude) = ({geocode_sql('Volunteers.Location')})",
+        # R*Tree of event points (min = max), kept in step with Events.Latitude/Longitude below
+        "CREATE VIRTUAL TABLE IF NOT EXISTS EventLocations USING rtree(ID, MinLat, MaxLat, MinLon, MaxLon)",
+        """
+        INSERT INTO EventLocations
+        SELECT ID, Latitude, Latitude, Longitude, Longitude FROM Events WHERE Latitude IS NOT NULL AND Longitude IS NOT NULL
+        """,
+        # Rows inserted with coordinates keep them, anything else is geocoded from Location
+        f"""
+        CREATE TRIGGER IF NOT EXISTS events_geocode_insert AFTER INSERT ON Events WHEN new.Latitude IS NULL BEGIN
+            UPDATE Events SET Latitude = p.Latitude, Longitude = p.Longitude
+            FROM ({geocode_sql('new.Location')}) p WHERE Events.ID = new.ID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS events_geocode_update AFTER UPDATE OF Location ON Events
+        WHEN new.Location IS NOT old.Location BEGIN
+            UPDATE Events SET Latitude = NULL, Longitude = NULL WHERE ID = new.ID;
+            UPDATE Events SET Latitude = p.Latitude, Longitude = p.Longitude
+            FROM ({geocode_sql('new.Location')}) p WHERE Events.ID = new.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS events_locate_insert AFTER INSERT ON Events WHEN new.Latitude IS NOT NULL BEGIN
+            INSERT INTO EventLocations VALUES (new.ID, new.Latitude, new.Latitude, new.Longitude, new.Longitude);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS events_locate_update AFTER UPDATE OF Latitude, Longitude ON Events BEGIN
+            DELETE FROM EventLocations WHERE ID = old.ID;
+            INSERT INTO EventLocations
+            SELECT new.ID, new.Latitude, new.Latitude, new.Longitude, new.Longitude
+            WHERE new.Latitude IS NOT NULL AND new.Longitude IS NOT NULL;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS events_locate_delete AFTER DELETE ON Events BEGIN
+            DELETE FROM EventLocations WHERE ID = old.ID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS volunteers_geocode_insert AFTER INSERT ON Volunteers WHEN new.Latitude IS NULL BEGIN
+            UPDATE Volunteers SET Latitude = p.Latitude, Longitude = p.Longitude
+            FROM ({geocode_sql('new.Location')}) p WHERE Volunteers.ID = new.ID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS volunteers_geocode_update AFTER UPDATE OF Location ON Volunteers
+        WHEN new.Location IS NOT old.Location BEGIN
+            UPDATE Volunteers SET Latitude = NULL, Longitude = NULL WHERE ID = new.ID;
+            UPDATE Volunteers SET Latitude = p.Latitude, Longitude = p.Longitude
+            FROM ({geocode_sql('new.Location')}) p WHERE Volunteers.ID = new.ID;
+        END
+        """,
+    ]),
+    (6, "summary tables for organisation, role and volunteer statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS OrganisationStats (
+            OrganisationID INTEGER PRIMARY KEY,
+            EventCount INTEGER NOT NULL DEFAULT 0,
+            RoleCount INTEGER NOT NULL DEFAULT 0,
+            SignupCount INTEGER NOT NULL DEFAULT 0,
+            PendingCount INTEGER NOT NULL DEFAULT 0,
+            AcceptedCount INTEGER NOT NULL DEFAULT 0,
+            RejectedCount INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS RoleStats (
+            RoleID INTEGER PRIMARY KEY,
+            EventID INTEGER NOT NULL,
+            OrganisationID INTEGER NOT NULL,
+            SignupCount INTEGER NOT NULL DEFAULT 0,
+            PendingCount INTEGER NOT NULL DEFAULT 0,
+            AcceptedCount INTEGER NOT NULL DEFAULT 0,
+            RejectedCount INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rolestats_event ON RoleStats(EventID)",
+        """
+        CREATE TABLE IF NOT EXISTS VolunteerStats (
+            VolunteerID INTEGER PRIMARY KEY,
+            SignupCount INTEGER NOT NULL DEFAULT 0,
+            AcceptedCount INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        rebuild_stats,
+        # Deleting an event takes its roles and their signups with it (the schema's ON DELETE
+        # CASCADE, which only applies when foreign keys are enforced), so the counts below stay true
+        """
+        CREATE TRIGGER IF NOT EXISTS events_cascade_delete AFTER DELETE ON Events BEGIN
+            DELETE FROM Signups WHERE RoleID IN (SELECT ID FROM EventRoles WHERE EventID = old.ID);
+            DELETE FROM EventRoles WHERE EventID = old.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_organisations_insert AFTER INSERT ON Organisations BEGIN
+            INSERT OR IGNORE INTO OrganisationStats (OrganisationID) VALUES (new.ID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_organisations_delete AFTER DELETE ON Organisations BEGIN
+            DELETE FROM OrganisationStats WHERE OrganisationID = old.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_volunteers_insert AFTER INSERT ON Volunteers BEGIN
+            INSERT OR IGNORE INTO VolunteerStats (VolunteerID) VALUES (new.ID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_volunteers_delete AFTER DELETE ON Volunteers BEGIN
+            DELETE FROM VolunteerStats WHERE VolunteerID = old.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_events_insert AFTER INSERT ON Events BEGIN
+            UPDATE OrganisationStats SET EventCount = EventCount + 1 WHERE OrganisationID = new.OrganisationID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_events_delete AFTER DELETE ON Events BEGIN
+            UPDATE OrganisationStats SET EventCount = EventCount - 1 WHERE OrganisationID = old.OrganisationID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_roles_insert AFTER INSERT ON EventRoles BEGIN
+            INSERT OR IGNORE INTO RoleStats (RoleID, EventID, OrganisationID)
+            SELECT new.ID, new.EventID, OrganisationID FROM Events WHERE ID = new.EventID;
+            UPDATE OrganisationStats SET RoleCount = RoleCount + 1
+            WHERE OrganisationID = (SELECT OrganisationID FROM Events WHERE ID = new.EventID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stats_roles_delete AFTER DELETE ON EventRoles BEGIN
+            UPDATE OrganisationStats SET RoleCount = RoleCount - 1
+            WHERE OrganisationID = (SELECT OrganisationID FROM RoleStats WHERE RoleID = old.ID);
+            DELETE FROM RoleStats WHERE RoleID = old.ID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS stats_signups_insert AFTER INSERT ON Signups BEGIN
+            {stats_counts("RoleStats", "RoleID = new.RoleID", "+", "new.Status")}
+            {stats_counts("OrganisationStats", "OrganisationID = (SELECT OrganisationID FROM RoleStats WHERE RoleID = new.RoleID)", "+", "new.Status")}
+            UPDATE VolunteerStats SET SignupCount = SignupCount + 1, AcceptedCount = AcceptedCount + (new.Status = 'Accepted')
+            WHERE VolunteerID = new.VolunteerID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS stats_signups_delete AFTER DELETE ON Signups BEGIN
+            {stats_counts("RoleStats", "RoleID = old.RoleID", "-", "old.Status")}
+            {stats_counts("OrganisationStats", "OrganisationID = (SELECT OrganisationID FROM RoleStats WHERE RoleID = old.RoleID)", "-", "old.Status")}
+            UPDATE VolunteerStats SET SignupCount = SignupCount - 1, AcceptedCount = AcceptedCount - (old.Status = 'Accepted')
+            WHERE VolunteerID = old.VolunteerID;
+        END
+        """,
+        # A status change is the old signup leaving the counts and the new one joining them
+        f"""
+        CREATE TRIGGER IF NOT EXISTS stats_signups_update AFTER UPDATE OF Status, RoleID, VolunteerID ON Signups BEGIN
+            {stats_counts("RoleStats", "RoleID = old.RoleID", "-", "old.Status")}
+            {stats_counts("OrganisationStats", "OrganisationID = (SELECT OrganisationID FROM RoleStats WHERE RoleID = old.RoleID)", "-", "old.Status")}
+            UPDATE VolunteerStats SET SignupCount = SignupCount - 1, AcceptedCount = AcceptedCount - (old.Status = 'Accepted')
+            WHERE VolunteerID = old.VolunteerID;
+            {stats_counts("RoleStats", "RoleID = new.RoleID", "+", "new.Status")}
+            {stats_counts("OrganisationStats", "OrganisationID = (SELECT OrganisationID FROM RoleStats WHERE RoleID = new.RoleID)", "+", "new.Status")}
+            UPDATE VolunteerStats SET SignupCount = SignupCount + 1, AcceptedCount = AcceptedCount + (new.Status = 'Accepted')
+            WHERE VolunteerID = new.VolunteerID;
+        END
+        """,
+        # Volunteers are credited an event's hours when it passes with their signup accepted,
+        # or when they are accepted after it has passed
+        f"""
+        CREATE TRIGGER IF NOT EXISTS hours_events_status AFTER UPDATE OF Status ON Events
+        WHEN (old.Status = 'Passed') <> (new.Status = 'Passed') BEGIN
+            UPDATE Volunteers
+            SET TotalHoursContributed = TotalHoursContributed
+                + (SELECT CASE WHEN new.Status = 'Passed' THEN 1 ELSE -1 END * {EVENT_HOURS} FROM Events e WHERE e.ID = new.ID)
+            WHERE ID IN (
+                SELECT s.VolunteerID FROM EventRoles er JOIN Signups s ON s.RoleID = er.ID
+                WHERE er.EventID = new.ID AND s.Status = 'Accepted'
+            );
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS hours_signups_status AFTER UPDATE OF Status ON Signups
+        WHEN (old.Status = 'Accepted') <> (new.Status = 'Accepted') BEGIN
+            UPDATE Volunteers
+            SET TotalHoursContributed = TotalHoursContributed
+                + (SELECT CASE WHEN new.Status = 'Accepted' THEN 1 ELSE -1 END * {EVENT_HOURS}
+                   FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                   WHERE er.ID = new.RoleID AND e.Status = 'Passed')
+            WHERE ID = new.VolunteerID
+              AND EXISTS (SELECT 1 FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                          WHERE er.ID = new.RoleID AND e.Status = 'Passed');
+        END
+        """,
+    ]),
+    (7, "waitlist for roles that are full", [
+        """
+        CREATE TABLE IF NOT EXISTS Waitlist (
+            ID INTEGER PRIMARY KEY,
+            RoleID INTEGER NOT NULL,
+            VolunteerID INTEGER NOT NULL,
+            JoinedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (RoleID) REFERENCES EventRoles(ID) ON DELETE CASCADE,
+            FOREIGN KEY (VolunteerID) REFERENCES Volunteers(ID) ON DELETE CASCADE
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_waitlist_volunteer_role ON Waitlist(VolunteerID, RoleID)",
+        # Promotion takes the earliest entries for a role first
+        "CREATE INDEX IF NOT EXISTS idx_waitlist_role ON Waitlist(RoleID, ID)",
+        """
+        CREATE TRIGGER IF NOT EXISTS waitlist_roles_delete AFTER DELETE ON EventRoles BEGIN
+            DELETE FROM Waitlist WHERE RoleID = old.ID;
+        END
+        """,
+    ]),
+    (8, "server-side sessions, password hashes and one accounts view for login", [
+        # Earlier versions of migration 1 indexed (Email, Password), one more copy of every plain
+        # password. Login reads the Email autoindexes, so those indexes go.
+        "DROP INDEX IF EXISTS idx_volunteers_login",
+        "DROP INDEX IF EXISTS idx_organisations_login",
+        # The token in the cookie is never stored, only its SHA-256
+        """
+        CREATE TABLE IF NOT EXISTS Sessions (
+            ID TEXT PRIMARY KEY,
+            UserType TEXT,
+            UserID INTEGER,
+            Data TEXT NOT NULL,
+            CreatedAt REAL NOT NULL,
+            LastSeen REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user ON Sessions(UserType, UserID)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON Sessions(LastSeen)",
+        # Hashes are too long for the Password columns' CHECK, so they live here. Accounts that
+        # still have a plain Password are moved over the next time they log in.
+        """
+        CREATE TABLE IF NOT EXISTS Credentials (
+            UserType TEXT NOT NULL,
+            UserID INTEGER NOT NULL,
+            PasswordHash TEXT NOT NULL,
+            PRIMARY KEY (UserType, UserID)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE VIEW IF NOT EXISTS Accounts AS
+        SELECT 'volunteer' AS UserType, v.ID AS UserID, v.Email, v.Password, c.PasswordHash, v.FirstName AS DisplayName
+        FROM Volunteers v
+        LEFT JOIN Credentials c ON c.UserType = 'volunteer' AND c.UserID = v.ID
+        UNION ALL
+        SELECT 'organisation', o.ID, o.Email, o.Password, c.PasswordHash, o.Name
+        FROM Organisations o
+        LEFT JOIN Credentials c ON c.UserType = 'organisation' AND c.UserID = o.ID
+        """,
+    ]),
+    (9, "row versions for fragment caching", [
+        "ALTER TABLE Organisations ADD COLUMN Version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE Events ADD COLUMN Version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE Volunteers ADD COLUMN Version INTEGER NOT NULL DEFAULT 0",
+        # Any update that does not set Version itself moves it on by one
+        """
+        CREATE TRIGGER IF NOT EXISTS version_organisations AFTER UPDATE ON Organisations
+        WHEN new.Version = old.Version BEGIN
+            UPDATE Organisations SET Version = old.Version + 1 WHERE ID = new.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS version_events AFTER UPDATE ON Events
+        WHEN new.Version = old.Version BEGIN
+            UPDATE Events SET Version = old.Version + 1 WHERE ID = new.ID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS version_volunteers AFTER UPDATE ON Volunteers
+        WHEN new.Version = old.Version BEGIN
+            UPDATE Volunteers SET Version = old.Version + 1 WHERE ID = new.ID;
+        END
+        """,
+        # A volunteer's skills are part of their profile block
+        """
+        CREATE TRIGGER IF NOT EXISTS version_volunteerskills_insert AFTER INSERT ON VolunteerSkills BEGIN
+            UPDATE Volunteers SET Version = Version + 1 WHERE ID = new.VolunteerID;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS version_volunteerskills_delete AFTER DELETE ON VolunteerSkills BEGIN
+            UPDATE Volunteers SET Version = Version + 1 WHERE ID = old.VolunteerID;
+        END
+        """,
+    ]),
+    (10, "recurring event series", [
+        # A series holds the template every occurrence is copied from. Occurrences up to
+        # MaterialisedUntil exist as Events rows; later ones are computed from Rule when asked for.
+        """
+        CREATE TABLE IF NOT EXISTS EventSeries (
+            ID INTEGER PRIMARY KEY,
+            OrganisationID INTEGER NOT NULL,
+            Name TEXT NOT NULL,
+            Location TEXT NOT NULL,
+            Description TEXT,
+            StartTime TIME NOT NULL,
+            EndTime TIME NOT NULL,
+            StartDate DATE NOT NULL,
+            Rule TEXT NOT NULL,
+            EndDate DATE,
+            MaterialisedUntil DATE NOT NULL,
+            FOREIGN KEY (OrganisationID) REFERENCES Organisations(ID) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_eventseries_organisation ON EventSeries(OrganisationID)",
+        "CREATE INDEX IF NOT EXISTS idx_eventseries_materialised ON EventSeries(MaterialisedUntil)",
+        """
+        CREATE TABLE IF NOT EXISTS SeriesRoles (
+            ID INTEGER PRIMARY KEY,
+            SeriesID INTEGER NOT NULL,
+            SkillID INTEGER,
+            Name TEXT NOT NULL,
+            Description TEXT,
+            VolunteersNeeded INTEGER,
+            FOREIGN KEY (SeriesID) REFERENCES EventSeries(ID) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_seriesroles_series ON SeriesRoles(SeriesID)",
+        "ALTER TABLE Events ADD COLUMN SeriesID INTEGER REFERENCES EventSeries(ID)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_events_series_date ON Events(SeriesID, Date) WHERE SeriesID IS NOT NULL",
+    ]),
+    (11, "event lifecycle: status indexes and archive tables", [
+        # The scheduler's two queries, and the events page, which lists upcoming events only
+        "CREATE INDEX IF NOT EXISTS idx_events_upcoming ON Events(Date, ID) WHERE Status = 'Upcoming'",
+        "CREATE INDEX IF NOT EXISTS idx_events_passed ON Events(Date) WHERE Status = 'Passed'",
+        # Cold copies of passed events. They live in the same file so that moving a batch is one transaction.
+        """
+        CREATE TABLE IF NOT EXISTS ArchivedEvents (
+            ID INTEGER PRIMARY KEY,
+            OrganisationID INTEGER NOT NULL,
+            Name TEXT NOT NULL,
+            Date DATE NOT NULL,
+            Location TEXT NOT NULL,
+            Description TEXT,
+            StartTime TIME NOT NULL,
+            EndTime TIME NOT NULL,
+            Status TEXT NOT NULL,
+            Latitude REAL,
+            Longitude REAL,
+            Version INTEGER NOT NULL DEFAULT 0,
+            SeriesID INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_archivedevents_organisation_date ON ArchivedEvents(OrganisationID, Date)",
+        """
+        CREATE TABLE IF NOT EXISTS ArchivedEventRoles (
+            ID INTEGER PRIMARY KEY,
+            EventID INTEGER NOT NULL,
+            SkillID INTEGER,
+            Name TEXT NOT NULL,
+            Description TEXT,
+            VolunteersNeeded INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_archivedeventroles_event ON ArchivedEventRoles(EventID)",
+        """
+        CREATE TABLE IF NOT EXISTS ArchivedSignups (
+            ID INTEGER PRIMARY KEY,
+            VolunteerID INTEGER NOT NULL,
+            RoleID INTEGER NOT NULL,
+            Status TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_archivedsignups_volunteer ON ArchivedSignups(VolunteerID)",
+        "CREATE INDEX IF NOT EXISTS idx_archivedsignups_role ON ArchivedSignups(RoleID)",
+        # What the archived rows contributed to OrganisationStats and VolunteerStats
+        """
+        CREATE TABLE IF NOT EXISTS ArchivedStats (
+            Kind TEXT NOT NULL,
+            ID INTEGER NOT NULL,
+            EventCount INTEGER NOT NULL DEFAULT 0,
+            RoleCount INTEGER NOT NULL DEFAULT 0,
+            SignupCount INTEGER NOT NULL DEFAULT 0,
+            PendingCount INTEGER NOT NULL DEFAULT 0,
+            AcceptedCount INTEGER NOT NULL DEFAULT 0,
+            RejectedCount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Kind, ID)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (12, "organisation signup dashboard", [
+        # An organisation's upcoming (or passed) events in date order, without stepping over the others
+        "CREATE INDEX IF NOT EXISTS idx_events_organisation_status_date ON Events(OrganisationID, Status, Date)",
+    ]),
+    (13, "volunteer profile read model", [
+        # What a profile needs beyond the Volunteers row itself, so one lookup by ID serves it
+        """
+        CREATE TABLE IF NOT EXISTS VolunteerProfiles (
+            VolunteerID INTEGER PRIMARY KEY,
+            Skills TEXT NOT NULL DEFAULT '[]',
+            UpcomingSignupCount INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        f"INSERT OR REPLACE INTO VolunteerProfiles {STATS_QUERIES['VolunteerProfiles']}",
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_volunteers_insert AFTER INSERT ON Volunteers BEGIN
+            INSERT OR IGNORE INTO VolunteerProfiles (VolunteerID) VALUES (new.ID);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_volunteers_delete AFTER DELETE ON Volunteers BEGIN
+            DELETE FROM VolunteerProfiles WHERE VolunteerID = old.ID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS profiles_volunteerskills_insert AFTER INSERT ON VolunteerSkills BEGIN
+            UPDATE VolunteerProfiles SET Skills = ({profile_skills_sql("new.VolunteerID")}) WHERE VolunteerID = new.VolunteerID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS profiles_volunteerskills_delete AFTER DELETE ON VolunteerSkills BEGIN
+            UPDATE VolunteerProfiles SET Skills = ({profile_skills_sql("old.VolunteerID")}) WHERE VolunteerID = old.VolunteerID;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS profiles_skills_update AFTER UPDATE OF Name ON Skills BEGIN
+            UPDATE VolunteerProfiles SET Skills = ({profile_skills_sql("VolunteerProfiles.VolunteerID")})
+            WHERE VolunteerID IN (SELECT VolunteerID FROM VolunteerSkills WHERE SkillID = new.ID);
+        END
+        """,
+        # A signup counts while it is pending or accepted and its event is upcoming
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_signups_insert AFTER INSERT ON Signups
+        WHEN new.Status IN ('Pending', 'Accepted') BEGIN
+            UPDATE VolunteerProfiles SET UpcomingSignupCount = UpcomingSignupCount + 1
+            WHERE VolunteerID = new.VolunteerID AND EXISTS (
+                SELECT 1 FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                WHERE er.ID = new.RoleID AND e.Status = 'Upcoming');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_signups_delete AFTER DELETE ON Signups
+        WHEN old.Status IN ('Pending', 'Accepted') BEGIN
+            UPDATE VolunteerProfiles SET UpcomingSignupCount = UpcomingSignupCount - 1
+            WHERE VolunteerID = old.VolunteerID AND EXISTS (
+                SELECT 1 FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                WHERE er.ID = old.RoleID AND e.Status = 'Upcoming');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_signups_update AFTER UPDATE OF Status, RoleID, VolunteerID ON Signups BEGIN
+            UPDATE VolunteerProfiles SET UpcomingSignupCount = UpcomingSignupCount - 1
+            WHERE VolunteerID = old.VolunteerID AND old.Status IN ('Pending', 'Accepted') AND EXISTS (
+                SELECT 1 FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                WHERE er.ID = old.RoleID AND e.Status = 'Upcoming');
+            UPDATE VolunteerProfiles SET UpcomingSignupCount = UpcomingSignupCount + 1
+            WHERE VolunteerID = new.VolunteerID AND new.Status IN ('Pending', 'Accepted') AND EXISTS (
+                SELECT 1 FROM EventRoles er JOIN Events e ON e.ID = er.EventID
+                WHERE er.ID = new.RoleID AND e.Status = 'Upcoming');
+        END
+        """,
+        # An event passing (or being set back to upcoming) moves all of its signups at once.
+        # The event's signups are grouped by volunteer in one pass; a count correlated on the
+        # volunteer would walk every signup they ever made, for each event.
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_events_status AFTER UPDATE OF Status ON Events
+        WHEN (old.Status = 'Upcoming') <> (new.Status = 'Upcoming') BEGIN
+            UPDATE VolunteerProfiles
+            SET UpcomingSignupCount = UpcomingSignupCount + CASE WHEN new.Status = 'Upcoming' THEN c.n ELSE -c.n END
+            FROM (
+                SELECT s.VolunteerID, COUNT(*) AS n FROM EventRoles er JOIN Signups s ON s.RoleID = er.ID
+                WHERE er.EventID = new.ID AND s.Status IN ('Pending', 'Accepted')
+                GROUP BY s.VolunteerID
+            ) c
+            WHERE VolunteerProfiles.VolunteerID = c.VolunteerID;
+        END
+        """,
+        # The foreign-key cascade removes the signups after the event has gone, when the
+        # signup triggers can no longer see that it was upcoming, so they are counted off here
+        """
+        CREATE TRIGGER IF NOT EXISTS profiles_events_delete BEFORE DELETE ON Events
+        WHEN old.Status = 'Upcoming' BEGIN
+            UPDATE VolunteerProfiles
+            SET UpcomingSignupCount = UpcomingSignupCount - c.n
+            FROM (
+                SELECT s.VolunteerID, COUNT(*) AS n FROM EventRoles er JOIN Signups s ON s.RoleID = er.ID
+                WHERE er.EventID = old.ID AND s.Status IN ('Pending', 'Accepted')
+                GROUP BY s.VolunteerID
+            ) c
+            WHERE VolunteerProfiles.VolunteerID = c.VolunteerID;
+        END
+        """,
+    ]),
+    (14, "drop the event cascade trigger", [
+        # Every connection enforces foreign keys, so the schema's ON DELETE CASCADE already
+        # removes an event's roles, signups and waitlist entries; the trigger only repeated it
+        "DROP TRIGGER IF EXISTS events_cascade_delete",
+    ]),
+]
+
+_migrated = set()  # absolute paths of the database files already migrated by this process
+
+def needs_migration(database):
+    return os.path.abspath(database) not in _migrated
+
+def migrate(db):
+    """
+    Applies any migrations newer than the database's user_version. Returns the versions applied.
+    Each one runs under BEGIN IMMEDIATE and checks user_version again once it holds the write
+    lock, so processes opening a fresh database at the same time apply every migration once.
+    """
+    applied = []
+    if db.execute("PRAGMA user_version").fetchone()[0] < MIGRATIONS[-1][0]:
+        for version, description, statements in MIGRATIONS:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                if db.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    db.rollback()  # already applied, perhaps by another process just now
+                    continue
+                for statement in statements:
+                    # A step can also be a function, for data that has to come from outside SQL
+                    if callable(statement):
+                        statement(db)
+                    else:
+                        db.execute(statement)
+                db.execute(f"PRAGMA user_version = {version}")
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            applied.append(version)
+    # The connection's own file, which need not be DATABASE (a CLI or test connection)
+    _migrated.add(db.execute("PRAGMA database_list").fetchone()[2])
+    return applied
+
+def app_queries():
+    """Returns (function name, sql) for every SQL string literal in this file."""
+    import ast
+    with open(__file__) as f:
+        tree = ast.parse(f.read())
+    queries = {}
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        for node in ast.walk(func):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                words = node.value.split(None, 1)
+                if len(words) == 2 and words[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                    # ast.walk reaches nested functions twice, keep the outer name
+                    queries.setdefault(node.value.strip(), func.name)
+    return [(func_name, sql) for sql, func_name in queries.items()]
+
+def query_plans(db):
+    """Returns (function name, sql, plan lines) for every query in app_queries()."""
+    plans = []
+    for func_name, sql in app_queries():
+        try:
+            rows = db.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")).fetchall()
+            plan = [row[3] for row in rows]
+        except sqlite3.Error as e:
+            plan = [f"ERROR: {e}"]
+        plans.append((func_name, sql, plan))
+    return plans
+
+def print_query_plans(plans):
+    scans = 0
+    for func_name, sql, plan in plans:
+        print(f"-- {func_name}: {' '.join(sql.split())[:100]}")
+        for line in plan:
+            # SCAN means a full table walk, unless it walks an index or a CTE from the same query
+            words = line.split()
+            is_cte = len(words) > 1 and re.search(rf"\b{re.escape(words[1])}\s+AS\s*\(", sql, re.IGNORECASE)
+            if words[0] == "SCAN" and "INDEX" not in line and not is_cte:
+                scans += 1
+                line += "   <-- full scan"
+            print(f"     {line}")
+    print(f"{len(plans)} queries, {scans} full table scans")
+
+def connect_database(timeout=POOL_TIMEOUT):
+    """A connection outside the pool, for CLI commands and background threads. Enforces foreign keys like the pool's."""
+    db = sqlite3.connect(DATABASE, timeout=timeout)
+    db.execute("PRAGMA foreign_keys = ON")
     return db
 
-@app.teardown_appcontext
-def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
+# FLASK CLI: flask --app app migrate / flask --app app explain
+@app.cli.command("migrate")
+def migrate_command():
+    """Applies pending migrations, printing query plans before and after."""
+    db = connect_database()
+    print("== BEFORE ==")
+    print_query_plans(query_plans(db))
+    applied = migrate(db)
+    print("== AFTER ==")
+    print_query_plans(query_plans(db))
+    print(f"Applied migrations: {applied or 'none, already up to date'}")
+    db.close()
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recomputes the summary tables from Events, EventRoles and Signups."""
+    db = connect_database()
+    migrate(db)
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        drifted = rebuild_stats(db)
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print(f"Rebuilt statistics, {drifted} rows were missing or out of date")
+
+@app.cli.command("explain")
+def explain_command():
+    """Prints the EXPLAIN QUERY PLAN output for every query in app.py."""
+    db = connect_database()
+    print_query_plans(query_plans(db))
+    db.close()
+
+#////////////////////////////////////////////////////////////////////SKILL MATCHING////////////////////////////////////////////////////////////////////
+
+def bit_indexes(bits):
+    """Yields the positions of the set bits in an int, lowest first."""
+    digits = bin(bits)[:1:-1]  # least significant bit first, without the 0b prefix
+    i = digits.find("1")
+    while i != -1:
+        yield i
+        i = digits.find("1", i + 1)
+
+class SkillMatcher:
+    """
+    In-memory index of who can fill which role, built from VolunteerSkills and EventRoles.
+    Sets are stored as Python ints used as bitsets (bit n set = ID n is a member), so a
+    lookup is a handful of big-int ORs instead of a join per role.
+
+    The index lives in this process only: routes that change skills or roles update it as
+    they commit, and a role or volunteer it has not seen is loaded on demand.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.all_volunteers = 0                     # volunteer ID bitset
+        self.volunteer_skills = {}                  # volunteer ID -> skill ID bitset
+        self.skill_volunteers = defaultdict(int)    # skill ID -> volunteer ID bitset
+        self.role_skill = {}                        # role ID -> required skill ID (0 = none)
+        self.role_event = {}                        # role ID -> event ID
+        self.open_roles = 0                         # role ID bitset of roles on upcoming events
+        self.skill_roles = defaultdict(int)         # skill ID -> open role ID bitset
+        self.unskilled_roles = 0                    # open roles with no required skill
+
+    def load(self, db):
+        with self.lock:
+            for (volunteer_id,) in db.execute("SELECT ID FROM Volunteers"):
+                self.all_volunteers |= 1 << volunteer_id
+            for volunteer_id, skill_id in db.execute("SELECT VolunteerID, SkillID FROM VolunteerSkills"):
+                self.volunteer_skills[volunteer_id] = self.volunteer_skills.get(volunteer_id, 0) | 1 << skill_id
+                self.skill_volunteers[skill_id] |= 1 << volunteer_id
+            for role_id, event_id, skill_id, status in db.execute(
+                """
+                SELECT er.ID, er.EventID, er.SkillID, e.Status
+                FROM EventRoles er
+                JOIN Events e ON er.EventID = e.ID
+                """
+            ):
+                self._add_role(role_id, event_id, skill_id, status == "Upcoming")
+
+    def _add_role(self, role_id, event_id, skill_id, is_open=True):
+        # SkillID can be NULL or '' when a role was added without choosing a skill
+        skill_id = int(skill_id) if skill_id else 0
+        self.role_skill[role_id] = skill_id
+        self.role_event[role_id] = event_id
+        if is_open:
+            self.open_roles |= 1 << role_id
+            if skill_id:
+                self.skill_roles[skill_id] |= 1 << role_id
+            else:
+                self.unskilled_roles |= 1 << role_id
+
+    def _remove_role(self, role_id):
+        skill_id = self.role_skill.pop(role_id, 0)
+        self.role_event.pop(role_id, None)
+        mask = ~(1 << role_id)
+        self.open_roles &= mask
+        self.unskilled_roles &= mask
+        if skill_id:
+            self.skill_roles[skill_id] &= mask
+
+    def add_role(self, role_id, event_id, skill_id):
+        with self.lock:
+            self._add_role(role_id, event_id, skill_id)
+
+    def remove_event(self, event_id):
+        self.remove_events([event_id])
+
+    def remove_events(self, event_ids):
+        event_ids = {int(event_id) for event_id in event_ids}
+        with self.lock:
+            for role_id in [r for r, e in self.role_event.items() if e in event_ids]:
+                self._remove_role(role_id)
+
+    def close_events(self, event_ids):
+        """Takes the roles of events that have passed out of the open sets."""
+        event_ids = set(event_ids)
+        with self.lock:
+            for role_id in [r for r, e in self.role_event.items() if e in event_ids]:
+                mask = ~(1 << role_id)
+                self.open_roles &= mask
+                self.unskilled_roles &= mask
+                skill_id = self.role_skill[role_id]
+                if skill_id:
+                    self.skill_roles[skill_id] &= mask
+
+    def refresh_volunteer(self, db, volunteer_id):
+        """Re-reads one volunteer's skills, after a signup or a profile edit."""
+        new_skills = 0
+        for (skill_id,) in db.execute("SELECT SkillID FROM VolunteerSkills WHERE VolunteerID = ?", (volunteer_id,)):
+            new_skills |= 1 << skill_id
+        with self.lock:
+            self.all_volunteers |= 1 << volunteer_id
+            old_skills = self.volunteer_skills.get(volunteer_id, 0)
+            for skill_id in bit_indexes(old_skills & ~new_skills):
+                self.skill_volunteers[skill_id] &= ~(1 << volunteer_id)
+            for skill_id in bit_indexes(new_skills & ~old_skills):
+                self.skill_volunteers[skill_id] |= 1 << volunteer_id
+            self.volunteer_skills[volunteer_id] = new_skills
+
+    def ensure_role(self, db, role_id):
+        """Loads a role this process has not seen yet, e.g. one added by another worker."""
+        if role_id in self.role_skill:
+            return True
+        row = db.execute(
+            """
+            SELECT er.EventID, er.SkillID, e.Status
+            FROM EventRoles er
+            JOIN Events e ON er.EventID = e.ID
+            WHERE er.ID = ?
+            """,
+            (role_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        with self.lock:
+            self._add_role(role_id, row[0], row[1], row[2] == "Upcoming")
+        return True
+
+    def matching_roles(self, volunteer_id):
+        """Bitset of the open roles this volunteer has the skill for."""
+        roles = self.unskilled_roles
+        for skill_id in bit_indexes(self.volunteer_skills.get(volunteer_id, 0)):
+            roles |= self.skill_roles.get(skill_id, 0)
+        return roles
+
+    def qualified_volunteers(self, role_id):
+        """Bitset of the volunteers who have the skill this role needs."""
+        skill_id = self.role_skill[role_id]
+        return self.skill_volunteers.get(skill_id, 0) if skill_id else self.all_volunteers
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+_seen_generations = {}  # database -> the DataGeneration value this process's matcher and caches were built from
+
+def sync_data_generation(db):
+    """
+    Drops the matcher and the cached lists if a bulk job (flask import-data, or a lifecycle run
+    that wrote new occurrences) has bumped DataGeneration since this process last looked, so
+    they are rebuilt from the new rows.
+    """
+    generation = db.execute("SELECT Value FROM DataGeneration WHERE ID = 1").fetchone()[0]
+    seen = _seen_generations.get(DATABASE)
+    if seen is not None and seen != generation:
+        _matchers.pop(DATABASE, None)
+        invalidate("organisations", "skills")
+    _seen_generations[DATABASE] = generation
+
+def get_matcher():
+    """Returns the SkillMatcher for the current database, building it on first use."""
+    sync_data_generation(get_db())
+    matcher = _matchers.get(DATABASE)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.get(DATABASE)
+            if matcher is None:
+                matcher = SkillMatcher()
+                matcher.load(get_read_db(live=True))  # kept for the life of the process, so never from a snapshot
+                _matchers[DATABASE] = matcher
+    return matcher
+
+#////////////////////////////////////////////////////////////////////READ-THROUGH CACHE////////////////////////////////////////////////////////////////////
+
+class MemoryCache:
+    """LRU cache with a per-entry expiry time, private to this process."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires, entry), least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, entry, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+class FileCache:
+    """Cache kept in its own SQLite file, so every worker process shares the entries and invalidations."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Cache (
+                    Key TEXT PRIMARY KEY,
+                    Expires REAL NOT NULL,
+                    Entry TEXT NOT NULL
+                )
+                """
+            )
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        db = self.connect()
+        try:
+            row = db.execute("SELECT Entry FROM Cache WHERE Key = ? AND Expires >= ?", (key, time.time())).fetchone()
+        finally:
+            db.close()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry, ttl):
+        db = self.connect()
+        try:
+            with db:
+                db.execute("INSERT OR REPLACE INTO Cache (Key, Expires, Entry) VALUES (?, ?, ?)", (key, time.time() + ttl, json.dumps(entry)))
+        finally:
+            db.close()
+
+    def delete(self, *keys):
+        db = self.connect()
+        try:
+            with db:
+                db.executemany("DELETE FROM Cache WHERE Key = ?", [(key,) for key in keys])
+        finally:
+            db.close()
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = FileCache() if CACHE_BACKEND == "file" else MemoryCache()
+    return _cache
+
+def cached(key, loader):
+    """
+    Returns the cache entry for key, calling loader() to fill it on a miss. An entry is a dict
+    of the loaded value (which must be JSON serialisable), its ETag and its load time.
+    """
+    sync_data_generation(get_db())
+    entry = get_cache().get(key)
+    if entry is None:
+        value = loader()
+        body = json.dumps(value, sort_keys=True, default=str)
+        entry = {"value": value, "etag": hashlib.sha1(body.encode()).hexdigest(), "last_modified": int(time.time())}
+        get_cache().set(key, entry, CACHE_TTL)
+    return entry
+
+def invalidate(*keys):
+    get_cache().delete(*keys)
+
+def is_not_modified(entry, variant=""):
+    """True if the browser's copy (If-None-Match / If-Modified-Since) is still current."""
+    if request.if_none_match:
+        return request.if_none_match.contains(entry["etag"] + variant)
+    since = request.if_modified_since
+    return since is not None and since.timestamp() >= entry["last_modified"]
+
+def conditional_response(entry, response, variant=""):
+    response = app.make_response(response)
+    response.set_etag(entry["etag"] + variant)
+    response.last_modified = datetime.fromtimestamp(entry["last_modified"], timezone.utc)
+    response.cache_control.no_cache = True  # always revalidate, the 304 is cheap
+    response.vary.add("Cookie")
+    return response
+
+#////////////////////////////////////////////////////////////////////FRAGMENT CACHE////////////////////////////////////////////////////////////////////
+
+# Compiled templates are kept on disk between runs, and every template is compiled once at
+# startup instead of on its first request
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+def precompile_templates():
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+# Rendered cards and blocks. Keys include the row's Version, which the migration 9 triggers
+# move on with every write, so an edit makes the old copy unreachable in every process and
+# nothing has to be deleted
+fragment_cache = MemoryCache(FRAGMENT_CACHE_MAX_ENTRIES)
+
+def render_fragment(template_name, key, load=None, **context):
+    """
+    Returns the HTML of a partial template, rendering it only if no copy is cached under key.
+    Context comes from the keyword arguments or, so that a hit can skip the queries, from
+    load(). Partials are rendered without the request context, so they cannot pick up the
+    session by accident.
+    """
+    cache_key = (template_name, *key)
+    html = fragment_cache.get(cache_key)
+    if html is None:
+        if load is not None:
+            context = load()
+        html = Markup(app.jinja_env.get_template(template_name).render(**context))
+        fragment_cache.set(cache_key, html, FRAGMENT_TTL)
+    return html
+
+app.jinja_env.globals["fragment"] = render_fragment
+precompile_templates()
+
+#////////////////////////////////////////////////////////////////////BULK IMPORT / EXPORT////////////////////////////////////////////////////////////////////
+
+# flask --app app import-data volunteers roster.csv
+# flask --app app export-data events events.jsonl
+# Files ending in .csv are read/written as CSV with a header row, anything else as JSON lines.
+IMPORT_CHUNK_SIZE = 5000
+
+# entity -> (table, columns read from each record). Column names match the database.
+IMPORT_SPECS = {
+    "volunteers": ("Volunteers", ["Password", "FirstName", "LastName", "Email", "PhoneNumber", "Location", "BirthDate", "Bio"]),
+    "events": ("Events", ["OrganisationID", "Name", "Date", "Location", "StartTime", "EndTime", "Description"]),
+    "roles": ("EventRoles", ["EventID", "Name", "Description", "SkillID", "VolunteersNeeded"]),
+}
+
+# Passwords are never exported. Volunteer skills and role skills are written as names.
+EXPORT_QUERIES = {
+    "volunteers": """
+        SELECT 
+            v.ID, v.FirstName, v.LastName, v.Email, v.PhoneNumber, v.Location, v.BirthDate, v.Bio, v.TotalHoursContributed,
+            (SELECT group_concat(s.Name, ';') FROM VolunteerSkills vs JOIN Skills s ON vs.SkillID = s.ID WHERE vs.VolunteerID = v.ID) AS Skills
+        FROM Volunteers v
+        ORDER BY v.ID
+        """,
+    "events": """
+        SELECT ID, OrganisationID, Name, Date, Location, StartTime, EndTime, Description, Status 
+        FROM Events 
+        ORDER BY ID
+        """,
+    "roles": """
+        SELECT er.ID, er.EventID, er.Name, er.Description, s.Name AS Skill, er.VolunteersNeeded
+        FROM EventRoles er
+        LEFT JOIN Skills s ON er.SkillID = s.ID
+        ORDER BY er.ID
+        """,
+}
+
+def read_records(path):
+    """Yields one dict per CSV row or JSON line, reading the file lazily."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def split_skills(value):
+    return [name.strip() for name in (value or "").split(";") if name.strip()]
+
+def resolve_skill_ids(db, skill_ids, names):
+    """
+    Fills skill_ids (name -> ID) for every name in names, creating missing skills with one
+    executemany and one lookup instead of a query and commit per skill.
+    """
+    missing = [name for name in set(names) if name not in skill_ids]
+    if missing:
+        db.executemany("INSERT OR IGNORE INTO Skills (Name) VALUES (?)", [(name,) for name in missing])
+        for skill_id, name in db.execute("SELECT ID, Name FROM Skills WHERE Name IN (SELECT value FROM json_each(?))", (json.dumps(missing),)):
+            skill_ids[name] = skill_id
+
+def import_records(db, entity, records, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Inserts records into the entity's table, one transaction per chunk. Rows that break a
+    constraint (duplicate email, missing required field, ...) are skipped, not fatal.
+    Returns (imported, skipped).
+    """
+    table, columns = IMPORT_SPECS[entity]
+    insert = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    skill_ids = {name: skill_id for skill_id, name in db.execute("SELECT ID, Name FROM Skills")}
+    imported = skipped = 0
+
+    for chunk in chunked(records, chunk_size):
+        with db:  # commits the chunk, or rolls it back if something unexpected fails
+            if entity == "roles":
+                resolve_skill_ids(db, skill_ids, [r["Skill"] for r in chunk if r.get("Skill")])
+                for record in chunk:
+                    record["SkillID"] = skill_ids.get(record.get("Skill")) or record.get("SkillID") or None
+            # CSV gives empty strings for blank cells, store those as NULL
+            rows = [tuple(record.get(column) if record.get(column) != "" else None for column in columns) for record in chunk]
+            last_id = db.execute(f"SELECT IFNULL(MAX(ID), 0) FROM {table}").fetchone()[0]
+            # rowcount, unlike total_changes, leaves out rows written by triggers on the table
+            inserted = db.executemany(insert, rows).rowcount
+
+            if entity == "volunteers":
+                wanted = {r["Email"]: split_skills(r.get("Skills")) for r in chunk if r.get("Email") and r.get("Skills")}
+                if wanted:
+                    # Only volunteers created by this chunk, an existing account with the same email is left alone
+                    ids = db.execute(
+                        "SELECT ID, Email FROM Volunteers WHERE ID > ? AND Email IN (SELECT value FROM json_each(?))",
+                        (last_id, json.dumps(list(wanted)))
+                    ).fetchall()
+                    resolve_skill_ids(db, skill_ids, [name for _, email in ids for name in wanted[email]])
+                    db.executemany(
+                        "INSERT OR IGNORE INTO VolunteerSkills (VolunteerID, SkillID) VALUES (?, ?)",
+                        [(volunteer_id, skill_ids[name]) for volunteer_id, email in ids for name in wanted[email]]
+                    )
+        imported += inserted
+        skipped += len(chunk) - inserted
+        if progress:
+            progress(imported, skipped)
+    return imported, skipped
+
+def export_records(db, entity, f, csv_format):
+    """Streams the entity's rows to f straight from the cursor, so memory use stays flat. Returns the row count."""
+    cur = db.execute(EXPORT_QUERIES[entity])
+    columns = [d[0] for d in cur.description]
+    writer = csv.writer(f) if csv_format else None
+    if writer:
+        writer.writerow(columns)
+    count = 0
+    for row in cur:
+        if writer:
+            writer.writerow(row)
+        else:
+            f.write(json.dumps(dict(zip(columns, row))) + "\n")
+        count += 1
+    return count
+
+@app.cli.command("import-data")
+@click.argument("entity", type=click.Choice(list(IMPORT_SPECS)))
+@click.argument("path")
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True)
+def import_data_command(entity, path, chunk_size):
+    """Bulk imports volunteers, events or roles from a CSV or JSON lines file."""
+    db = ConnectionPool(DATABASE).connect()
+    start = time.perf_counter()
+
+    def progress(imported, skipped):
+        elapsed = time.perf_counter() - start
+        print(f"  {imported + skipped} rows read, {imported} imported, {skipped} skipped ({imported / elapsed:,.0f} rows/s)")
+
+    imported, skipped = import_records(db, entity, read_records(path), chunk_size, progress)
+    elapsed = time.perf_counter() - start
+    # Running servers drop their matchers and cached lists when they next see the new generation
+    db.execute("UPDATE DataGeneration SET Value = Value + 1 WHERE ID = 1")
+    db.commit()
+    db.close()
+    print(f"Imported {imported} {entity} ({skipped} skipped) in {elapsed:.2f}s, {imported / max(elapsed, 1e-9):,.0f} rows/s")
+
+@app.cli.command("export-data")
+@click.argument("entity", type=click.Choice(list(EXPORT_QUERIES)))
+@click.argument("path")
+def export_data_command(entity, path):
+    """Exports volunteers, events or roles to a CSV or JSON lines file."""
+    db = ConnectionPool(DATABASE).connect()
+    start = time.perf_counter()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        count = export_records(db, entity, f, path.endswith(".csv"))
+    elapsed = time.perf_counter() - start
+    db.close()
+    print(f"Exported {count} {entity} in {elapsed:.2f}s, {count / max(elapsed, 1e-9):,.0f} rows/s")
+
+#////////////////////////////////////////////////////////////////////SESSIONS AND PASSWORDS////////////////////////////////////////////////////////////////////
+
+# Hashing is deliberately slow, so it runs on a small fixed pool: a burst of logins queues
+# here instead of taking every CPU away from the request threads
+password_pool = ThreadPoolExecutor(PASSWORD_WORKERS, thread_name_prefix="password")
+
+def hash_password(password):
+    return password_pool.submit(generate_password_hash, password).result()
+
+def check_password(password_hash, password):
+    return password_pool.submit(check_password_hash, password_hash, password).result()
+
+@functools.cache
+def dummy_password_hash():
+    """A hash to check against when no account matches, so a wrong email takes as long as a wrong password."""
+    return generate_password_hash(secrets.token_urlsafe())
+
+def store_password_hash(db, user_type, user_id, password_hash):
+    """Saves a hash for an account and blanks its old plain Password. Runs in the caller's transaction."""
+    db.execute(
+        """
+        INSERT INTO Credentials (UserType, UserID, PasswordHash) VALUES (?, ?, ?)
+        ON CONFLICT(UserType, UserID) DO UPDATE SET PasswordHash = excluded.PasswordHash
+        """,
+        (user_type, user_id, password_hash)
+    )
+    table = "Volunteers" if user_type == "volunteer" else "Organisations"
+    db.execute(f"UPDATE {table} SET Password = '' WHERE ID = ?", (user_id,))
+
+def authenticate(db, email, password):
+    """
+    Returns the Accounts row for an email and password, or None. One indexed lookup covers
+    volunteers and organisations. An account still on a plain password is checked against it
+    and moved to a hash on the way through, on the writer rather than db.
+    """
+    accounts = db.execute(
+        """
+        SELECT UserType, UserID, Password, PasswordHash, DisplayName
+        FROM Accounts
+        WHERE Email = ?
+        """,
+        (email,)
+    ).fetchall()
+    for account in accounts:
+        if account["PasswordHash"]:
+            if check_password(account["PasswordHash"], password):
+                return account
+        elif account["Password"] and hmac.compare_digest(account["Password"].encode(), password.encode()):
+            password_hash = hash_password(password)
+            writer = get_write_db()
+            try:
+                store_password_hash(writer, account["UserType"], account["UserID"], password_hash)
+                writer.commit()
+            except sqlite3.Error:
+                writer.rollback()
+                raise
+            return account
+    if not accounts:
+        check_password(dummy_password_hash(), password)
+    return None
+
+def revoke_sessions(db, user_type, user_id):
+    """Logs an account out everywhere. Runs in the caller's transaction."""
+    db.execute("DELETE FROM Sessions WHERE UserType = ? AND UserID = ?", (user_type, user_id))
+
+def purge_sessions(db):
+    """Deletes sessions that have been idle for longer than SESSION_IDLE_SECONDS."""
+    db.execute("DELETE FROM Sessions WHERE LastSeen < ?", (time.time() - SESSION_IDLE_SECONDS,))
+
+class ServerSideSession(SecureCookieSession):
+    """
+    A session whose data lives in the Sessions table; the cookie only carries a random token.
+    Handlers read the identity (user_type, user_id, first_name or org_name) from it without
+    touching the account tables. Set regenerate to give it a new token on the next save.
+    """
+
+    def __init__(self, initial=None, sid=None, last_seen=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.last_seen = last_seen
+        self.regenerate = False
+
+class SqliteSessionInterface(SecureCookieSessionInterface):
+    """
+    Keeps logged-in sessions in the app database, where they can be revoked and expire when
+    idle. Anonymous ones (a flash() before login) stay in Flask's signed cookie, so visitors
+    who never log in never write a Sessions row.
+    """
+    session_class = ServerSideSession
+
+    def open_session(self, app, request):
+        token = request.cookies.get(self.get_cookie_name(app))
+        if not token:
+            return self.session_class()
+        try:
+            data = self.get_signing_serializer(app).loads(token, max_age=int(app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            pass  # not a signed cookie, so a session token
+        else:
+            # An identity only ever comes from the Sessions table, where it can be revoked. A signed
+            # cookie carrying one predates server-side sessions and is not trusted.
+            return self.session_class(None if "user_id" in data else data)
+        sid = hashlib.sha256(token.encode()).hexdigest()
+        # Always the database file itself, a snapshot may predate the login that made this session
+        row = get_read_db(live=True).execute("SELECT Data, LastSeen FROM Sessions WHERE ID = ?", (sid,)).fetchone()
+        if row is None or row["LastSeen"] < time.time() - SESSION_IDLE_SECONDS:
+            return self.session_class()
+        return self.session_class(json.loads(row["Data"]), sid=sid, last_seen=row["LastSeen"])
+
+    def save_session(self, app, session, response):
+        if "user_id" not in session:
+            self.save_anonymous_session(app, session, response)
+            return
+        now = time.time()
+        if session and session.sid and not session.modified and not session.regenerate:
+            if now - session.last_seen < SESSION_TOUCH_SECONDS:
+                return
+
+        db = get_write_db()
+        # Anything the handler left uncommitted would be rolled back at checkin anyway
+        if db.in_transaction:
+            db.rollback()
+        cookie = self.get_cookie_name(app)
+        try:
+            if session.sid is None or session.regenerate:
+                if session.sid is not None:
+                    db.execute("DELETE FROM Sessions WHERE ID = ?", (session.sid,))
+                else:
+                    purge_sessions(db)
+                token = secrets.token_urlsafe(32)
+                session.sid = hashlib.sha256(token.encode()).hexdigest()
+                session.regenerate = False
+                db.execute(
+                    """
+                    INSERT INTO Sessions (ID, UserType, UserID, Data, CreatedAt, LastSeen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (session.sid, session.get("user_type"), session.get("user_id"), json.dumps(dict(session)), now, now)
+                )
+                response.set_cookie(
+                    cookie, token,
+                    domain=self.get_cookie_domain(app), path=self.get_cookie_path(app),
+                    secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app),
+                    samesite=self.get_cookie_samesite(app),
+                )
+            elif session.modified:
+                db.execute(
+                    """
+                    UPDATE Sessions SET UserType = ?, UserID = ?, Data = ?, LastSeen = ?
+                    WHERE ID = ?
+                    """,
+                    (session.get("user_type"), session.get("user_id"), json.dumps(dict(session)), now, session.sid)
+                )
+            else:
+                db.execute("UPDATE Sessions SET LastSeen = ? WHERE ID = ?", (now, session.sid))
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+
+    def save_anonymous_session(self, app, session, response):
+        if session.sid is not None:
+            # Logged out (session.clear()). The row goes; anything set since, such as a flash,
+            # moves to a signed cookie that replaces the token.
+            db = get_db()
+            if db.in_transaction:
+                db.rollback()
+            try:
+                db.execute("DELETE FROM Sessions WHERE ID = ?", (session.sid,))
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            session.modified = True
+        super().save_session(app, session, response)
+
+app.session_interface = SqliteSessionInterface()
+
+@app.cli.command("revoke-sessions")
+@click.argument("email")
+def revoke_sessions_command(email):
+    """Logs out every session of the account(s) with this email."""
+    db = connect_database()
+    migrate(db)
+    accounts = db.execute("SELECT UserType, UserID FROM Accounts WHERE Email = ?", (email,)).fetchall()
+    for user_type, user_id in accounts:
+        revoke_sessions(db, user_type, user_id)
+    db.commit()
+    db.close()
+    print(f"Revoked the sessions of {len(accounts)} account(s)")
+
+#////////////////////////////////////////////////////////////////////EVENT LIFECYCLE////////////////////////////////////////////////////////////////////
+
+def pass_events(db, today, batch_size=LIFECYCLE_BATCH_SIZE):
+    """
+    Marks up to batch_size upcoming events dated before today as passed, oldest first. The
+    hours_events_status trigger credits the hours of their accepted signups; signups still
+    pending are closed as rejected and waitlists are dropped. Runs in the caller's
+    transaction. Returns the event IDs.
+    """
+    passed = db.execute(
+        """
+        UPDATE Events SET Status = 'Passed'
+        WHERE ID IN (
+            SELECT ID FROM Events
+            WHERE Status = 'Upcoming' AND Date < ?
+            ORDER BY Date
+            LIMIT ?
+        )
+        RETURNING ID
+        """,
+        (today.isoformat(), batch_size)
+    ).fetchall()
+    event_ids = json.dumps([row[0] for row in passed])
+    db.execute(
+        """
+        UPDATE Signups SET Status = 'Rejected'
+        WHERE Status = 'Pending'
+          AND RoleID IN (SELECT er.ID FROM json_each(?) j JOIN EventRoles er ON er.EventID = j.value)
+        """,
+        (event_ids,)
+    )
+    db.execute(
+        "DELETE FROM Waitlist WHERE RoleID IN (SELECT er.ID FROM json_each(?) j JOIN EventRoles er ON er.EventID = j.value)",
+        (event_ids,)
+    )
+    return [row[0] for row in passed]
+
+def archive_columns(db, table):
+    """The columns to copy from table into Archived<table>, adding any the archive is missing."""
+    columns = [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+    archived = {row[1] for row in db.execute(f"PRAGMA table_info(Archived{table})")}
+    for column in columns:
+        if column not in archived:
+            db.execute(f"ALTER TABLE Archived{table} ADD COLUMN {column}")
+    return ", ".join(columns)
+
+def archive_events(db, before, batch_size=LIFECYCLE_BATCH_SIZE):
+    """
+    Moves up to batch_size events that passed before the given date, with their roles and
+    signups, to the Archived* tables. The delete triggers take them out of the summary
+    tables, so their counts are added back and kept in ArchivedStats, where rebuild_stats
+    finds them. Runs in the caller's transaction. Returns the event IDs.
+    """
+    event_ids = json.dumps([row[0] for row in db.execute(
+        "SELECT ID FROM Events WHERE Status = 'Passed' AND Date < ? ORDER BY Date LIMIT ?",
+        (before.isoformat(), batch_size)
+    )])
+    if event_ids == "[]":
+        return []
+
+    db.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS archive_batch (
+            Kind TEXT, ID INTEGER, EventCount INTEGER, RoleCount INTEGER, SignupCount INTEGER,
+            PendingCount INTEGER, AcceptedCount INTEGER, RejectedCount INTEGER
+        )
+        """
+    )
+    db.execute("DELETE FROM archive_batch")
+    db.execute(
+        """
+        INSERT INTO archive_batch
+        SELECT 'organisation', e.OrganisationID, COUNT(DISTINCT e.ID), COUNT(DISTINCT er.ID), COUNT(s.ID),
+            COALESCE(SUM(s.Status = 'Pending'), 0), COALESCE(SUM(s.Status = 'Accepted'), 0), COALESCE(SUM(s.Status = 'Rejected'), 0)
+        FROM json_each(?) j
+        JOIN Events e ON e.ID = j.value
+        LEFT JOIN EventRoles er ON er.EventID = e.ID
+        LEFT JOIN Signups s ON s.RoleID = er.ID
+        GROUP BY e.OrganisationID
+        """,
+        (event_ids,)
+    )
+    db.execute(
+        """
+        INSERT INTO archive_batch
+        SELECT 'volunteer', s.VolunteerID, 0, 0, COUNT(*),
+            SUM(s.Status = 'Pending'), SUM(s.Status = 'Accepted'), SUM(s.Status = 'Rejected')
+        FROM json_each(?) j
+        JOIN EventRoles er ON er.EventID = j.value
+        JOIN Signups s ON s.RoleID = er.ID
+        GROUP BY s.VolunteerID
+        """,
+        (event_ids,)
+    )
+
+    for table, where in (
+        ("Events", "ID IN (SELECT value FROM json_each(?))"),
+        ("EventRoles", "EventID IN (SELECT value FROM json_each(?))"),
+        ("Signups", "RoleID IN (SELECT ID FROM EventRoles WHERE EventID IN (SELECT value FROM json_each(?)))"),
+    ):
+        columns = archive_columns(db, table)
+        db.execute(f"INSERT OR REPLACE INTO Archived{table} ({columns}) SELECT {columns} FROM {table} WHERE {where}", (event_ids,))
+    # The foreign-key cascade takes the roles and signups with them
+    db.execute("DELETE FROM Events WHERE ID IN (SELECT value FROM json_each(?))", (event_ids,))
+
+    db.execute(
+        """
+        INSERT INTO ArchivedStats
+        SELECT * FROM archive_batch WHERE true
+        ON CONFLICT (Kind, ID) DO UPDATE SET
+            EventCount = EventCount + excluded.EventCount,
+            RoleCount = RoleCount + excluded.RoleCount,
+            SignupCount = SignupCount + excluded.SignupCount,
+            PendingCount = PendingCount + excluded.PendingCount,
+            AcceptedCount = AcceptedCount + excluded.AcceptedCount,
+            RejectedCount = RejectedCount + excluded.RejectedCount
+        """
+    )
+    for table in ARCHIVED_STATS:
+        add_archived_counts(db, table, table, "archive_batch")
+    return json.loads(event_ids)
+
+def run_lifecycle(db, today=None):
+    """
+    Writes out repeating events up to SERIES_HORIZON_DAYS ahead, then passes every event whose
+    date has gone and archives every event that passed more than ARCHIVE_AFTER_DAYS ago, one
+    batch per short write transaction. Returns the numbers of events passed and archived.
+    """
+    today = today or date.today()
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        before = db.total_changes
+        extend_series(db, today + timedelta(days=SERIES_HORIZON_DAYS))
+        if db.total_changes != before:
+            # New occurrences and roles reach every process's matcher and cached lists the way an import does
+            db.execute("UPDATE DataGeneration SET Value = Value + 1 WHERE ID = 1")
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    counts = []
+    for step, cutoff in ((pass_events, today), (archive_events, today - timedelta(days=ARCHIVE_AFTER_DAYS))):
+        done = 0
+        while True:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                event_ids = step(db, cutoff)
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            done += len(event_ids)
+            # This process's matcher stops offering their roles; other processes load them as closed
+            matcher = _matchers.get(DATABASE)
+            if matcher is not None and event_ids:
+                matcher.close_events(event_ids)
+            if len(event_ids) < LIFECYCLE_BATCH_SIZE:
+                break
+        counts.append(done)
+    return tuple(counts)
+
+def lifecycle_worker():
+    """
+    The scheduler thread: runs the lifecycle on its own connection every LIFECYCLE_INTERVAL_SECONDS.
+    It never migrates, start_lifecycle_scheduler only starts it once the pool has.
+    """
+    while True:
+        try:
+            db = connect_database()
+            db.row_factory = sqlite3.Row
+            try:
+                passed, archived = run_lifecycle(db)
+            finally:
+                db.close()
+            if passed or archived:
+                app.logger.info("Lifecycle: %d events passed, %d archived", passed, archived)
+        except Exception:
+            app.logger.exception("Lifecycle run failed")
+        time.sleep(LIFECYCLE_INTERVAL_SECONDS)
+
+_lifecycle_pids = set()
+_lifecycle_lock = threading.Lock()
+
+# Each process runs its own scheduler thread, started by its first request. Runs in several
+# processes only repeat each other's checks: BEGIN IMMEDIATE serialises them and a batch
+# that has been done is not found again.
+@app.before_request
+def start_lifecycle_scheduler():
+    if LIFECYCLE_INTERVAL_SECONDS and os.getpid() not in _lifecycle_pids:
+        with _lifecycle_lock:
+            if os.getpid() not in _lifecycle_pids:
+                # The pool migrates when it opens its first connection. Checking one out for this
+                # request first means the thread never races the request threads to migrate.
+                get_db()
+                _lifecycle_pids.add(os.getpid())
+                threading.Thread(target=lifecycle_worker, name="lifecycle", daemon=True).start()
+
+@app.cli.command("lifecycle")
+@click.option("--loop", is_flag=True, help="Keep running every LIFECYCLE_INTERVAL_SECONDS.")
+def lifecycle_command(loop):
+    """Marks past events as passed and archives old ones (set LIFECYCLE_INTERVAL_SECONDS = 0 to run only this)."""
+    while True:
+        db = connect_database()
+        db.row_factory = sqlite3.Row
+        migrate(db)
+        passed, archived = run_lifecycle(db)
         db.close()
+        print(f"{passed} events passed, {archived} archived")
+        if not loop:
+            break
+        time.sleep(LIFECYCLE_INTERVAL_SECONDS or 300)
+
+#////////////////////////////////////////////////////////////////////COMPACTION////////////////////////////////////////////////////////////////////
+
+# Every foreign key in the schema as (table, column, parent table, what to do with a row whose parent is gone).
+# Rows like that were left behind while foreign keys were not enforced. Parents come before their
+# children, so deleting an orphaned event cascades to its roles before the roles are checked.
+ORPHAN_CHECKS = [
+    ("Events", "OrganisationID", "Organisations", "delete"),
+    ("EventSeries", "OrganisationID", "Organisations", "delete"),
+    ("Events", "SeriesID", "EventSeries", "null"),  # the occurrence stands on its own
+    ("SeriesRoles", "SeriesID", "EventSeries", "delete"),
+    ("EventRoles", "EventID", "Events", "delete"),
+    ("EventRoles", "SkillID", "Skills", "null"),  # a role that needs no particular skill
+    ("Signups", "RoleID", "EventRoles", "delete"),
+    ("Signups", "VolunteerID", "Volunteers", "delete"),
+    ("Waitlist", "RoleID", "EventRoles", "delete"),
+    ("Waitlist", "VolunteerID", "Volunteers", "delete"),
+    ("VolunteerSkills", "SkillID", "Skills", "delete"),
+    ("VolunteerSkills", "VolunteerID", "Volunteers", "delete"),
+]
+
+def database_size(db):
+    """Page size, pages in the file and pages on the free list."""
+    return {pragma: db.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in ("page_size", "page_count", "freelist_count")}
+
+def purge_orphans(db, dry_run=False):
+    """Deletes or unlinks the rows ORPHAN_CHECKS finds, one anti-join per foreign key. Returns {"Table.Column": rows}."""
+    purged = {}
+    for table, column, parent, action in ORPHAN_CHECKS:
+        orphaned = f"{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.ID = {table}.{column})"
+        if dry_run:
+            count = db.execute(f"SELECT COUNT(*) FROM {table} WHERE {orphaned}").fetchone()[0]
+        elif action == "delete":
+            count = db.execute(f"DELETE FROM {table} WHERE {orphaned}").rowcount
+        else:
+            count = db.execute(f"UPDATE {table} SET {column} = NULL WHERE {orphaned}").rowcount
+        if count:
+            purged[f"{table}.{column}"] = count
+    return purged
+
+def compact_database(db, dry_run=False):
+    """
+    Offline maintenance: purges orphaned rows, corrects the summary tables, returns the free
+    pages to the file system and refreshes the planner's statistics. The first run switches the
+    file to incremental auto-vacuum, which takes one full VACUUM; later runs only truncate the
+    free list. Returns a report of what was found and the file size before and after.
+    """
+    before = database_size(db)
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        purged = purge_orphans(db, dry_run)
+        drifted = rebuild_stats(db)  # the purge went round the triggers for rows whose parents were already gone
+        violations = len(db.execute("PRAGMA foreign_key_check").fetchall())
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    report = {"orphans": purged, "stats_drift": drifted, "foreign_key_violations": violations, "before": before}
+    if dry_run:
+        report["after"] = before
+        return report
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")  # rewrites the file once so it keeps the pointer maps incremental vacuum needs
+    else:
+        db.execute("PRAGMA incremental_vacuum").fetchall()
+    db.execute("ANALYZE")
+    db.commit()
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    report["after"] = database_size(db)
+    return report
+
+@app.cli.command("compact")
+@click.option("--dry-run", is_flag=True, help="Only count what would be purged.")
+def compact_command(dry_run):
+    """Purges orphaned rows, vacuums and analyzes the database. Run it with the app stopped."""
+    db = connect_database()
+    migrate(db)
+    report = compact_database(db, dry_run)
+    db.close()
+    for key, count in report["orphans"].items():
+        print(f"{key}: {count} orphaned rows" + (" found" if dry_run else " purged"))
+    print(f"{report['stats_drift']} summary rows corrected, {report['foreign_key_violations']} foreign key violations left")
+    before, after = report["before"], report["after"]
+    print(f"{before['page_count']} pages ({before['page_count'] * before['page_size'] // 1024} KB, {before['freelist_count']} free) -> "
+          f"{after['page_count']} pages ({after['page_count'] * after['page_size'] // 1024} KB, {after['freelist_count']} free), "
+          f"{before['page_count'] - after['page_count']} pages reclaimed")
+
+#////////////////////////////////////////////////////////////////////READ REPLICA////////////////////////////////////////////////////////////////////
+
+# When READ_REPLICA is set, read-only routes read a copy of DATABASE that is refreshed every
+# REPLICA_REFRESH_SECONDS with the backup API. The copy is in WAL mode, so its readers keep
+# their view while the next copy is written and never wait for DATABASE's writer or checkpoints.
+replica_state = {"snapshot_at": None}  # when the snapshot this process knows of was taken
+
+def replica_snapshot_at():
+    """
+    When the READ_REPLICA snapshot was taken, from the ReplicaInfo row written with it. None if
+    there is no snapshot yet or it predates a migration, so routes never read an older schema.
+    """
+    try:
+        db = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(READ_REPLICA))}?mode=ro", uri=True, timeout=POOL_TIMEOUT)
+        try:
+            if db.execute("PRAGMA user_version").fetchone()[0] < MIGRATIONS[-1][0]:
+                return None
+            return db.execute("SELECT SnapshotAt FROM ReplicaInfo").fetchone()[0]
+        finally:
+            db.close()
+    except (sqlite3.Error, TypeError):
+        return None  # no snapshot yet, or one still being copied
+
+def refresh_replica():
+    """Copies DATABASE, which must be migrated, into READ_REPLICA in one backup step and returns when the copy was taken."""
+    source = connect_database()
+    replica = sqlite3.connect(READ_REPLICA, timeout=POOL_TIMEOUT)
+    try:
+        replica.execute("PRAGMA journal_mode = WAL")
+        # Taken before the copy starts, so a write is only counted in if it committed earlier
+        snapshot_at = time.time()
+        source.backup(replica)
+        replica.execute("CREATE TABLE IF NOT EXISTS ReplicaInfo (SnapshotAt REAL NOT NULL)")
+        replica.execute("INSERT INTO ReplicaInfo (SnapshotAt) VALUES (?)", (snapshot_at,))
+        replica.commit()
+    finally:
+        replica.close()
+        source.close()
+    return snapshot_at
+
+def replica_worker():
+    """
+    The refresher thread. Every process runs one, but a process only copies when the shared
+    snapshot is older than REPLICA_REFRESH_SECONDS, so they mostly take turns.
+    """
+    while True:
+        try:
+            if needs_migration(DATABASE):
+                get_pool().checkin(get_pool().checkout())  # the first connection migrates
+            snapshot_at = replica_snapshot_at()
+            if snapshot_at is None or time.time() - snapshot_at >= REPLICA_REFRESH_SECONDS:
+                snapshot_at = refresh_replica()
+            replica_state["snapshot_at"] = snapshot_at
+        except Exception:
+            app.logger.exception("Replica refresh failed")
+        time.sleep(REPLICA_REFRESH_SECONDS)
+
+_replica_pids = set()
+_replica_lock = threading.Lock()
+
+@app.before_request
+def start_replica_refresher():
+    if READ_REPLICA and os.getpid() not in _replica_pids:
+        with _replica_lock:
+            if os.getpid() not in _replica_pids:
+                _replica_pids.add(os.getpid())
+                threading.Thread(target=replica_worker, name="replica", daemon=True).start()
+
+@app.cli.command("refresh-replica")
+def refresh_replica_command():
+    """Copies the database into READ_REPLICA (set COMMUNITY_CONNECT_REPLICA) straight away."""
+    if not READ_REPLICA:
+        raise click.UsageError("Set COMMUNITY_CONNECT_REPLICA to the snapshot file first")
+    db = connect_database()
+    migrate(db)
+    db.close()
+    start = time.perf_counter()
+    refresh_replica()
+    print(f"Copied {DATABASE} to {READ_REPLICA} in {time.perf_counter() - start:.2f}s")
+
+#////////////////////////////////////////////////////////////////////NOTIFICATIONS////////////////////////////////////////////////////////////////////
+
+class NotificationBus:
+    """
+    In-process publish/subscribe for signup notifications. A topic is ("organisation", id)
+    or ("volunteer", id). Every message gets the next ID and is kept in a bounded ring buffer,
+    so a client that reconnects with the last ID it saw is sent what it missed. Subscribers
+    are callbacks run on the publishing thread with the lock held, so they must not block.
+    """
+
+    def __init__(self, buffer_size=NOTIFY_BUFFER_SIZE):
+        self.boot = secrets.token_hex(4)  # IDs from another process or an earlier run never match
+        self.next_id = 1
+        self.buffer = deque(maxlen=buffer_size)  # (id, topic, event, data), oldest first
+        self.subscribers = defaultdict(set)  # topic -> callbacks
+        self.lock = threading.Lock()
+
+    def publish(self, topic, event, data):
+        with self.lock:
+            message = (self.next_id, topic, event, json.dumps(data))
+            self.next_id += 1
+            self.buffer.append(message)
+            for deliver in self.subscribers.get(topic, ()):
+                deliver(message)
+
+    def subscribe(self, topic, deliver, last_event_id=None):
+        """
+        Registers deliver for a topic. Returns the buffered messages for it after
+        last_event_id, or None if that ID is unknown or messages after it have already left
+        the buffer, in which case the client has to reload.
+        """
+        with self.lock:
+            self.subscribers[topic].add(deliver)
+            if not last_event_id:
+                return []
+            boot, _, number = last_event_id.partition("-")
+            if boot != self.boot or not number.isdigit() or int(number) >= self.next_id:
+                return None
+            after = int(number)
+            if self.buffer and self.buffer[0][0] > after + 1:
+                return None
+            return [m for m in self.buffer if m[0] > after and m[1] == topic]
+
+    def unsubscribe(self, topic, deliver):
+        with self.lock:
+            callbacks = self.subscribers.get(topic)
+            if callbacks is not None:
+                callbacks.discard(deliver)
+                if not callbacks:
+                    del self.subscribers[topic]
+
+    def format(self, message):
+        """A message as a Server-Sent Events frame."""
+        message_id, _, event, data = message
+        return f"id: {self.boot}-{message_id}\nevent: {event}\ndata: {data}\n\n"
+
+    def reset_frame(self):
+        """Tells the client some notifications were lost, so it should reload the page's data."""
+        return f"id: {self.boot}-{self.next_id - 1}\nevent: reset\ndata: {{}}\n\n"
+
+notification_bus = NotificationBus()
+
+def notification_subscriber():
+    """The current session's topic and the Last-Event-ID it is resuming from, or (None, None) if logged out."""
+    if session.get("user_type") not in ("volunteer", "organisation"):
+        return None, None
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    return (session["user_type"], session["user_id"]), last_event_id
+
+def notify_signups(db, signups):
+    """
+    Tells the organisations running the roles about new signups, given as (volunteer_id,
+    role_id) pairs. Call after committing them. Returns the signups' rows.
+    """
+    rows = db.execute(
+        """
+        SELECT s.ID, s.Status, s.VolunteerID, v.FirstName || ' ' || v.LastName AS VolunteerName,
+               s.RoleID, er.Name AS RoleName, e.ID AS EventID, e.Name AS EventName, e.OrganisationID
+        FROM json_each(?) p
+        JOIN Signups s ON s.VolunteerID = json_extract(p.value, '$[0]') AND s.RoleID = json_extract(p.value, '$[1]')
+        JOIN Volunteers v ON v.ID = s.VolunteerID
+        JOIN EventRoles er ON er.ID = s.RoleID
+        JOIN Events e ON e.ID = er.EventID
+        """,
+        (json.dumps(signups),)
+    ).fetchall()
+    for signup in rows:
+        notification_bus.publish(("organisation", signup["OrganisationID"]), "signup", {
+            "signup_id": signup["ID"], "status": signup["Status"],
+            "volunteer_id": signup["VolunteerID"], "volunteer_name": signup["VolunteerName"],
+            "role_id": signup["RoleID"], "role_name": signup["RoleName"],
+            "event_id": signup["EventID"], "event_name": signup["EventName"],
+        })
+    return rows
+
+def notify_status(volunteer_id, signup_id, role_id, role_name, event_name, status):
+    """Tells a volunteer that one of their signups changed status."""
+    notification_bus.publish(("volunteer", volunteer_id), "signup_status", {
+        "signup_id": signup_id, "role_id": role_id, "role_name": role_name,
+        "event_name": event_name, "status": status,
+    })
+
+# A WSGI server would spend a thread on every open stream, for as long as the page stays open.
+# asgi.py answers this path on its event loop before Flask sees it, where an idle stream costs a
+# socket and a queue. Pages only subscribe when config LIVE_NOTIFICATIONS says that server is
+# running, and anything that still reaches Flask is refused; EventSource does not retry a 501.
+@app.route("/notifications")
+def notifications():
+    return "Live notifications are only served by the ASGI entry point: uvicorn asgi:application", 501
 
 #///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
 #///////////////////////////////////////////////////////////////////ROUTES////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
 #///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
                 
 @app.route("/")
+@read_only
 def index():
     return render_template("index.html")
 
 #///////////////////////////////////////////////////////////////ORGANISATIONS VIEW///////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
 
 @app.route("/organisations")
+@read_only
 def organisations():
-    db = get_db()
-    
-    cur = db.execute(
-        """
-        SELECT * FROM Organisations 
-        ORDER BY Name ASC
-        """
-    )
-    organisations = cur.fetchall()
+    def load():
+        cur = get_read_db(live=True).execute(
+            """
+            SELECT 
+                o.ID,
+                o.Name,
+                o.Description,
+                o.Email,
+                o.WebsiteURL,
+                o.Address,
+                o.Version,
+                COALESCE(st.EventCount, 0) AS event_count
+            FROM Organisations o
+            LEFT JOIN OrganisationStats st ON st.OrganisationID = o.ID
+            ORDER BY o.Name ASC
+            """
+        )
+        return [dict(row) for row in cur.fetchall()]
 
-    cur_counts = db.execute(
-        """
-        SELECT 
-            o.id, 
-            COUNT(e.id) AS event_count 
-        FROM Organisations o
-        LEFT JOIN Events e ON o.id = e.OrganisationID
-        GROUP BY o.id, o.Name
-        ORDER BY o.Name ASC
-        """
-    )
-    event_counts = cur_counts.fetchall()
-    
-    event_counts_dict = {row['id']: row['event_count'] for row in event_counts}
+    entry = cached("organisations", load)
+    # The header links depend on who is logged in, so each user type gets its own ETag
+    variant = "-" + session.get("user_type", "guest")
+    if is_not_modified(entry, variant):
+        return "", 304
+
+    organisations = entry["value"]
+    event_counts = {org["ID"]: org["event_count"] for org in organisations}
+    return conditional_response(entry, render_template("organisations.html", organisations=organisations, event_counts=event_counts), variant)
 
-    return render_template("organisations.html", organisations=organisations, event_counts=event_counts_dict)
 #////////////////////////////////////////////////////////////////////EVENTS PAGE///////////////////////////////////////////////////////////////////////////////////
 
 @app.route("/events", methods=["GET", "POST"])
+@read_only
 def events():
     db = get_db()
 
@@ -69,27 +2470,242 @@ def events():
         user_type = session.get("user_type")
         if user_type == "organisation":
             event_id = request.form.get("event_id")
-            if event_id:
-                db.execute(
-                    """
-                    DELETE FROM Events 
-                    WHERE Id = ?
-                    """,
-                    (event_id,)
-                )
-                db.commit()
-                flash("Event deleted.", "info")
+            event = series_event(db, event_id, session["user_id"]) if request.form.get("scope") == "following" else None
+            if event is not None:
+                try:
+                    db.execute("BEGIN IMMEDIATE")
+                    deleted = end_series(db, event)
+                    db.commit()
+                except sqlite3.Error:
+                    db.rollback()
+                    raise
+                get_matcher().remove_events(deleted)
+                invalidate("organisations")
+                flash("Event and its later occurrences deleted.", "info")
+            elif event_id:
+                # Several event_id fields delete several events at once
+                try:
+                    deleted = delete_events(db, session["user_id"], request.form.getlist("event_id"))
+                except ValueError as e:
+                    flash(str(e), "danger")
+                else:
+                    flash(f"{len(deleted)} events deleted." if len(deleted) != 1 else "Event deleted.", "info")
         return redirect(url_for("events"))
 
-    cur = db.execute(
-        """
-        SELECT * FROM Events
-        GROUP BY OrganisationID 
-        ORDER BY Date ASC
-        """
-    )
-    events = cur.fetchall()
-    return render_template("events.html", events=events)
+    try:
+        events, next_cursor = list_events(request.args)
+    except ValueError as e:
+        return str(e), 400
+    # Carry the filters over to the next page link
+    next_args = dict(request.args, cursor=next_cursor) if next_cursor else None
+    return render_template("events.html", events=events, next_args=next_args)
+
+MAX_BATCH_DELETE_EVENTS = 1000
+
+def delete_events(db, organisation_id, event_ids):
+    """
+    Deletes any number of an organisation's events in one transaction and returns the IDs
+    deleted; IDs of other organisations' events are skipped. The foreign key cascades take
+    each event's roles and their signups with it, and the stats triggers count them off.
+    Raises ValueError for IDs that are not integers or too many of them.
+    """
+    try:
+        event_ids = sorted({int(event_id) for event_id in event_ids})
+    except (TypeError, ValueError):
+        raise ValueError("Event IDs must be integers")
+    if len(event_ids) > MAX_BATCH_DELETE_EVENTS:
+        raise ValueError(f"At most {MAX_BATCH_DELETE_EVENTS} events can be deleted at once")
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        deleted = [row[0] for row in db.execute(
+            "DELETE FROM Events WHERE ID IN (SELECT value FROM json_each(?)) AND OrganisationID = ? RETURNING ID",
+            (json.dumps(event_ids), organisation_id)
+        )]
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    if deleted:
+        get_matcher().remove_events(deleted)
+        invalidate("organisations")
+    return deleted
+
+# DELETE MANY EVENTS AT ONCE, {"event_ids": [3, 4, 5]}
+@app.route("/delete_events", methods=["POST"])
+def delete_events_route():
+    if session.get("user_type") != "organisation":
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("event_ids"), list):
+        return jsonify({"error": "Expected {\"event_ids\": [...]}"}), 400
+    try:
+        deleted = delete_events(get_db(), session["user_id"], data["event_ids"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"deleted": deleted, "not_found": sorted({int(i) for i in data["event_ids"]} - set(deleted))})
+
+# JSON EVENT LISTING, takes the same filters and cursor as /events
+@app.route("/get_events", methods=["GET"])
+@read_only
+def get_events():
+    try:
+        events, next_cursor = list_events(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"events": [dict(e) for e in events], "next_cursor": next_cursor})
+
+EVENTS_PAGE_SIZE = 30
+MAX_EVENTS_PAGE_SIZE = 100
+
+def encode_cursor(event_date, event_id):
+    return base64.urlsafe_b64encode(f"{event_date}|{event_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        event_date, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return event_date, int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def list_events(args):
+    """
+    Returns one page of events ordered by (Date, ID) and the cursor for the next page (or None).
+    Paging seeks past the last (Date, ID) seen instead of using OFFSET, so every page costs
+    the same however deep it is. Optional filters: status (Upcoming by default), date_from,
+    date_to, location, organisation_id, skill_id, limit.
+    """
+    # Passed events are left out unless asked for with status=Passed or status=all
+    status = args.get("status", "Upcoming")
+    if status not in ("Upcoming", "Passed", "all"):
+        raise ValueError("status must be Upcoming, Passed or all")
+    # Written into the SQL rather than bound so the planner can use the partial index idx_events_upcoming
+    conditions = [] if status == "all" else [f"e.Status = '{status}'"]
+    params = []
+    if args.get("date_from"):
+        conditions.append("e.Date >= ?")
+        params.append(args["date_from"])
+    if args.get("date_to"):
+        conditions.append("e.Date <= ?")
+        params.append(args["date_to"])
+    if args.get("location"):
+        conditions.append("e.Location = ?")
+        params.append(args["location"])
+    if args.get("organisation_id"):
+        conditions.append("e.OrganisationID = ?")
+        params.append(args["organisation_id"])
+    if args.get("skill_id"):
+        conditions.append("EXISTS (SELECT 1 FROM EventRoles er WHERE er.EventID = e.ID AND er.SkillID = ?)")
+        params.append(args["skill_id"])
+    if args.get("cursor"):
+        conditions.append("(e.Date, e.ID) > (?, ?)")
+        params.extend(decode_cursor(args["cursor"]))
+
+    try:
+        limit = min(int(args.get("limit", EVENTS_PAGE_SIZE)), MAX_EVENTS_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    # One extra row tells us whether there is another page
+    rows = get_db().execute(
+        f"""
+        SELECT e.* FROM Events e
+        {where}
+        ORDER BY e.Date ASC, e.ID ASC
+        LIMIT ?
+        """,
+        (*params, limit + 1)
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["Date"], rows[-1]["ID"])
+    return rows, next_cursor
+
+KM_PER_DEGREE = 111.195
+NEARBY_RADIUS_KM = 25
+NEARBY_START_KM = 1
+MAX_NEARBY_RADIUS_KM = 500
+NEARBY_LIMIT = 10
+MAX_NEARBY_LIMIT = 50
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+def nearby_events(db, lat, lon, radius_km, limit):
+    """
+    Returns up to limit upcoming events within radius_km of (lat, lon), nearest first, as
+    (distance in km, row) pairs. The R*Tree only hands back events inside a bounding box, and
+    the box starts at NEARBY_START_KM and doubles until it holds enough events, so the work
+    depends on how many events are close by rather than on the size of the table.
+    """
+    # Near a point, a degree of longitude is cos(latitude) times shorter than a degree of latitude
+    lon_scale = max(math.cos(math.radians(lat)), 0.01)
+    today = datetime.now().strftime("%Y-%m-%d")
+    search_km = min(radius_km, NEARBY_START_KM)
+    while True:
+        dlat = search_km / KM_PER_DEGREE
+        dlon = dlat / lon_scale
+        # Squared flat-earth distance in degrees of latitude is exact enough to rank and cut off by
+        rows = db.execute(
+            """
+            SELECT e.ID, e.OrganisationID, e.Name, e.Date, e.Location, e.StartTime, e.EndTime, e.Latitude, e.Longitude,
+                (e.Latitude - ?) * (e.Latitude - ?) + (e.Longitude - ?) * (e.Longitude - ?) * ? AS d2
+            FROM EventLocations l
+            JOIN Events e ON e.ID = l.ID
+            WHERE l.MaxLat >= ? AND l.MinLat <= ? AND l.MaxLon >= ? AND l.MinLon <= ?
+              AND e.Status = 'Upcoming' AND e.Date >= ? AND d2 <= ?
+            ORDER BY d2
+            LIMIT ?
+            """,
+            (lat, lat, lon, lon, lon_scale * lon_scale, lat - dlat, lat + dlat, lon - dlon, lon + dlon,
+             today, dlat * dlat, limit)
+        ).fetchall()
+        # Anything outside the circle searched is further away than everything inside it
+        if len(rows) == limit or search_km >= radius_km:
+            return [(distance_km(lat, lon, r["Latitude"], r["Longitude"]), r) for r in rows]
+        search_km = min(search_km * 2, radius_km)
+
+# UPCOMING EVENTS NEAR A VOLUNTEER OR A PLACE
+# e.g. /events/nearby?radius_km=10&limit=5, or ?location=Fremantle, or ?lat=-31.95&lon=115.86
+@app.route("/events/nearby", methods=["GET"])
+@read_only
+def events_nearby():
+    db = get_db()
+    try:
+        radius_km = float(request.args.get("radius_km", NEARBY_RADIUS_KM))
+        limit = int(request.args.get("limit", NEARBY_LIMIT))
+        if request.args.get("lat") or request.args.get("lon"):
+            point = (float(request.args["lat"]), float(request.args["lon"]))
+        elif request.args.get("location"):
+            point = db.execute(geocode_sql("?"), (request.args["location"],)).fetchone()
+        elif session.get("user_type") == "volunteer":
+            point = db.execute("SELECT Latitude, Longitude FROM Volunteers WHERE ID = ?", (session["user_id"],)).fetchone()
+        else:
+            return jsonify({"error": "Give lat and lon or a location, or log in as a volunteer"}), 400
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat, lon, radius_km and limit must be numbers"}), 400
+    if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+        return jsonify({"error": f"radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}"}), 400
+    if not 1 <= limit <= MAX_NEARBY_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_NEARBY_LIMIT}"}), 400
+    if point is None or point[0] is None or point[1] is None:
+        return jsonify({"error": "That location is not in the gazetteer"}), 404
+
+    events = nearby_events(db, point[0], point[1], radius_km, limit)
+    return jsonify({
+        "latitude": point[0],
+        "longitude": point[1],
+        "events": [{"id": e["ID"], "organisation_id": e["OrganisationID"], "name": e["Name"], "date": e["Date"],
+                    "location": e["Location"], "start_time": e["StartTime"], "end_time": e["EndTime"],
+                    "distance_km": round(km, 2)} for km, e in events],
+    })
 
 # ADD EVENT
 @app.route("/add_event", methods=["POST"])
@@ -98,6 +2714,18 @@ def add_event():
         return "Unauthorized", 401
 
     db = get_db()
+    # A repeating event, e.g. rrule=FREQ=WEEKLY;BYDAY=MO with an optional until date
+    rule = request.form.get("rrule", "").strip()
+    if rule:
+        if request.form.get("until"):
+            rule += f";UNTIL={request.form['until']}"
+        try:
+            create_series(db, session["user_id"], request.form, rule)
+        except (ValueError, sqlite3.IntegrityError) as e:
+            return str(e), 400
+        invalidate("organisations")
+        return "OK", 200
+
     db.execute(
         """
         INSERT INTO Events (Name, Date, Location, StartTime, EndTime, OrganisationID, Description)
@@ -114,6 +2742,7 @@ def add_event():
         ),
     )
     db.commit()
+    invalidate("organisations")
     return "OK", 200
 
 # EDIT EVENT
@@ -125,6 +2754,21 @@ def edit_event():
     db = get_db()
     event_id = request.form["event_id"]
     desc = request.form["description"]
+    # scope=following changes this occurrence of a repeating event and every later one
+    if request.form.get("scope") == "following":
+        event = series_event(db, event_id, session["user_id"])
+        if event is not None:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                series_id = split_series(db, event)
+                db.execute("UPDATE EventSeries SET Description = ? WHERE ID = ?", (desc, series_id))
+                db.execute("UPDATE Events SET Description = ? WHERE SeriesID = ?", (desc, series_id))
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            return "OK", 200
+
     db.execute(
         """
         UPDATE Events 
@@ -136,6 +2780,321 @@ def edit_event():
     db.commit()
     return "OK", 200
 
+#////////////////////////////////////////////////////////////////////RECURRING EVENTS////////////////////////////////////////////////////////////////////
+
+SERIES_HORIZON_DAYS = 90         # occurrences this far ahead are written as real events, so volunteers can sign up
+MAX_SERIES_COUNT = 1000          # largest COUNT a rule may give
+MAX_OCCURRENCE_WINDOW_DAYS = 366
+MAX_OCCURRENCES = 1000
+RRULE_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+def parse_rrule(text):
+    """
+    Parses the subset of an iCalendar RRULE used here, e.g. "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=2026-12-31".
+    FREQ is DAILY, WEEKLY or MONTHLY (on the start date's day of the month); BYDAY is for
+    WEEKLY only; UNTIL and COUNT are optional. Raises ValueError for anything else.
+    """
+    rule = {"FREQ": None, "INTERVAL": 1, "BYDAY": None, "UNTIL": None, "COUNT": None}
+    for part in text.upper().replace(" ", "").split(";"):
+        name, _, value = part.partition("=")
+        if not part:
+            continue
+        elif name == "FREQ" and value in ("DAILY", "WEEKLY", "MONTHLY"):
+            rule["FREQ"] = value
+        elif name == "INTERVAL" and value.isdigit() and int(value) >= 1:
+            rule["INTERVAL"] = int(value)
+        elif name == "BYDAY" and value and all(day in RRULE_DAYS for day in value.split(",")):
+            rule["BYDAY"] = sorted({RRULE_DAYS.index(day) for day in value.split(",")})
+        elif name == "UNTIL":
+            rule["UNTIL"] = date.fromisoformat(value[:10])
+        elif name == "COUNT" and value.isdigit() and 1 <= int(value) <= MAX_SERIES_COUNT:
+            rule["COUNT"] = int(value)
+        else:
+            raise ValueError(f"Unsupported recurrence rule part: {part}")
+    if rule["FREQ"] is None:
+        raise ValueError("A recurrence rule needs FREQ=DAILY, WEEKLY or MONTHLY")
+    if rule["BYDAY"] and rule["FREQ"] != "WEEKLY":
+        raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+    return rule
+
+def format_rrule(rule):
+    parts = [f"FREQ={rule['FREQ']}"]
+    if rule["INTERVAL"] != 1:
+        parts.append(f"INTERVAL={rule['INTERVAL']}")
+    if rule["BYDAY"]:
+        parts.append("BYDAY=" + ",".join(RRULE_DAYS[day] for day in rule["BYDAY"]))
+    if rule["UNTIL"]:
+        parts.append(f"UNTIL={rule['UNTIL'].isoformat()}")
+    if rule["COUNT"]:
+        parts.append(f"COUNT={rule['COUNT']}")
+    return ";".join(parts)
+
+def period_dates(rule, dtstart, period):
+    """The candidate dates in the period-th day, week or month of a series, in order."""
+    step = period * rule["INTERVAL"]
+    if rule["FREQ"] == "DAILY":
+        return [dtstart + timedelta(days=step)]
+    if rule["FREQ"] == "WEEKLY":
+        monday = dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=step)
+        return [monday + timedelta(days=day) for day in rule["BYDAY"] or [dtstart.weekday()]]
+    month = dtstart.month - 1 + step
+    try:
+        return [dtstart.replace(year=dtstart.year + month // 12, month=month % 12 + 1)]
+    except ValueError:
+        return []  # no 31st (or 30th, 29th) this month
+
+def occurrences(rule, dtstart, start, end):
+    """
+    Yields the dates of a series that fall from start to end inclusive. Without COUNT the
+    walk jumps straight to the period containing start, so a window far in the future costs
+    the same as one next week.
+    """
+    if rule["UNTIL"]:
+        end = min(end, rule["UNTIL"])
+    period = 0
+    if rule["COUNT"] is None and start > dtstart:
+        if rule["FREQ"] == "DAILY":
+            period = (start - dtstart).days // rule["INTERVAL"]
+        elif rule["FREQ"] == "WEEKLY":
+            period = (start - dtstart + timedelta(days=dtstart.weekday())).days // 7 // rule["INTERVAL"]
+        else:
+            period = ((start.year - dtstart.year) * 12 + start.month - dtstart.month) // rule["INTERVAL"]
+    seen = 0
+    while True:
+        try:
+            dates = period_dates(rule, dtstart, period)
+        except OverflowError:
+            return
+        for day in dates:
+            if day < dtstart:
+                continue
+            if day > end:
+                return
+            seen += 1
+            if rule["COUNT"] is not None and seen > rule["COUNT"]:
+                return
+            if day >= start:
+                yield day
+        period += 1
+
+def series_end_date(rule, dtstart):
+    """The last date a series can fall on, or None if it never ends. Raises ValueError if it has no occurrences at all."""
+    first = next(occurrences(rule, dtstart, dtstart, date.max), None)
+    if first is None:
+        raise ValueError("That recurrence rule has no occurrences")
+    if rule["COUNT"] is not None:
+        return deque(occurrences(rule, dtstart, dtstart, date.max), maxlen=1)[0]
+    return rule["UNTIL"]
+
+def materialise_series(db, series_id, until):
+    """
+    Writes a series' occurrences after its MaterialisedUntil and up to until as Events rows,
+    with a copy of each of its roles: one multi-row insert for the events and one for the
+    roles. Runs in the caller's transaction. Returns the new (role ID, event ID, skill ID) rows.
+    """
+    series = db.execute("SELECT StartDate, Rule, MaterialisedUntil FROM EventSeries WHERE ID = ?", (series_id,)).fetchone()
+    start = date.fromisoformat(series["MaterialisedUntil"]) + timedelta(days=1)
+    if until < start:
+        return []
+    dates = json.dumps([d.isoformat() for d in occurrences(parse_rrule(series["Rule"]), date.fromisoformat(series["StartDate"]), start, until)])
+    db.execute("UPDATE EventSeries SET MaterialisedUntil = ? WHERE ID = ?", (until.isoformat(), series_id))
+    db.execute(
+        """
+        INSERT INTO Events (OrganisationID, Name, Date, Location, Description, StartTime, EndTime, SeriesID)
+        SELECT s.OrganisationID, s.Name, d.value, s.Location, s.Description, s.StartTime, s.EndTime, s.ID
+        FROM json_each(?) d, EventSeries s
+        WHERE s.ID = ?
+        """,
+        (dates, series_id)
+    )
+    return db.execute(
+        """
+        INSERT INTO EventRoles (EventID, SkillID, Name, Description, VolunteersNeeded)
+        SELECT e.ID, r.SkillID, r.Name, r.Description, r.VolunteersNeeded
+        FROM json_each(?) d
+        CROSS JOIN Events e ON e.SeriesID = ? AND e.Date = d.value
+        JOIN SeriesRoles r ON r.SeriesID = e.SeriesID
+        ORDER BY e.Date, r.ID
+        RETURNING ID, EventID, SkillID
+        """,
+        (dates, series_id)
+    ).fetchall()
+
+def create_series(db, organisation_id, fields, rule_text):
+    """
+    Saves a repeating event and writes its occurrences up to the horizon (and at least the
+    first one, so the events table's checks see the details). Returns the series ID.
+    """
+    rule = parse_rrule(rule_text)
+    try:
+        dtstart = date.fromisoformat(fields["date"])
+    except ValueError:
+        raise ValueError("date must be YYYY-MM-DD")
+    end_date = series_end_date(rule, dtstart)
+    # Start the series on its first occurrence, so that occurrence's edits never need a split
+    dtstart = next(occurrences(rule, dtstart, dtstart, date.max))
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        series_id = db.execute(
+            """
+            INSERT INTO EventSeries (OrganisationID, Name, Location, Description, StartTime, EndTime, StartDate, Rule, EndDate, MaterialisedUntil)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (organisation_id, fields["name"], fields["location"], fields.get("description", ""), fields["starttime"],
+             fields["endtime"], dtstart.isoformat(), format_rrule(rule), end_date and end_date.isoformat(),
+             (dtstart - timedelta(days=1)).isoformat())
+        ).lastrowid
+        materialise_series(db, series_id, max(dtstart, date.today() + timedelta(days=SERIES_HORIZON_DAYS)))
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    return series_id
+
+def extend_series(db, until):
+    """
+    Materialises every unfinished series up to until. Runs in the caller's transaction.
+    Returns the new role rows.
+    """
+    due = db.execute(
+        """
+        SELECT ID FROM EventSeries
+        WHERE MaterialisedUntil < ? AND (EndDate IS NULL OR EndDate > MaterialisedUntil)
+        """,
+        (until.isoformat(),)
+    ).fetchall()
+    roles = []
+    for series in due:
+        roles += materialise_series(db, series["ID"], until)
+    return roles
+
+def series_event(db, event_id, organisation_id):
+    """The ID, SeriesID and Date of an organisation's event if it is an occurrence of a series, else None."""
+    event = db.execute(
+        "SELECT ID, SeriesID, Date FROM Events WHERE ID = ? AND OrganisationID = ?",
+        (event_id, organisation_id)
+    ).fetchone()
+    return event if event is not None and event["SeriesID"] is not None else None
+
+def split_series(db, event):
+    """
+    Makes an occurrence the first of a series of its own, so that a change can be applied to
+    it and every later occurrence by updating one series and its events. The old series is cut
+    off the day before; the new one copies its template and roles, and the later occurrences
+    already written move over with one UPDATE. Returns the new series ID, or the old one when
+    the occurrence was already its first. Runs in the caller's transaction.
+    """
+    series = db.execute("SELECT * FROM EventSeries WHERE ID = ?", (event["SeriesID"],)).fetchone()
+    if series["StartDate"] == event["Date"]:
+        return series["ID"]
+    rule = parse_rrule(series["Rule"])
+    dtstart = date.fromisoformat(series["StartDate"])
+    split_date = date.fromisoformat(event["Date"])
+    head = dict(rule, UNTIL=split_date - timedelta(days=1), COUNT=None)
+    tail = dict(rule)
+    if rule["COUNT"] is not None:
+        tail["COUNT"] = rule["COUNT"] - sum(1 for _ in occurrences(head, dtstart, dtstart, head["UNTIL"]))
+    new_id = db.execute(
+        """
+        INSERT INTO EventSeries (OrganisationID, Name, Location, Description, StartTime, EndTime, StartDate, Rule, EndDate, MaterialisedUntil)
+        SELECT OrganisationID, Name, Location, Description, StartTime, EndTime, ?, ?, EndDate, MaterialisedUntil
+        FROM EventSeries WHERE ID = ?
+        """,
+        (split_date.isoformat(), format_rrule(tail), series["ID"])
+    ).lastrowid
+    db.execute(
+        """
+        INSERT INTO SeriesRoles (SeriesID, SkillID, Name, Description, VolunteersNeeded)
+        SELECT ?, SkillID, Name, Description, VolunteersNeeded FROM SeriesRoles WHERE SeriesID = ?
+        ORDER BY ID
+        """,
+        (new_id, series["ID"])
+    )
+    db.execute("UPDATE Events SET SeriesID = ? WHERE SeriesID = ? AND Date >= ?", (new_id, series["ID"], event["Date"]))
+    db.execute(
+        "UPDATE EventSeries SET Rule = ?, EndDate = ? WHERE ID = ?",
+        (format_rrule(head), head["UNTIL"].isoformat(), series["ID"])
+    )
+    return new_id
+
+def end_series(db, event):
+    """
+    Deletes an occurrence and every later one, and stops the series there. Runs in the
+    caller's transaction. Returns the deleted event IDs.
+    """
+    series = db.execute("SELECT StartDate, Rule FROM EventSeries WHERE ID = ?", (event["SeriesID"],)).fetchone()
+    last = date.fromisoformat(event["Date"]) - timedelta(days=1)
+    # The occurrences go first, the series cannot be deleted while events still refer to it
+    deleted = db.execute(
+        "DELETE FROM Events WHERE SeriesID = ? AND Date >= ? RETURNING ID",
+        (event["SeriesID"], event["Date"])
+    ).fetchall()
+    if series["StartDate"] == event["Date"]:
+        db.execute("DELETE FROM EventSeries WHERE ID = ?", (event["SeriesID"],))
+    else:
+        head = dict(parse_rrule(series["Rule"]), UNTIL=last, COUNT=None)
+        db.execute("UPDATE EventSeries SET Rule = ?, EndDate = ? WHERE ID = ?",
+                   (format_rrule(head), last.isoformat(), event["SeriesID"]))
+    return [row["ID"] for row in deleted]
+
+# EVENTS IN A DATE WINDOW, e.g. /get_occurrences?date_from=2026-01-01&date_to=2026-06-30&organisation_id=3
+# Occurrences past the materialised horizon are computed from their series' rules and have no ID yet
+@app.route("/get_occurrences", methods=["GET"])
+@read_only
+def get_occurrences():
+    try:
+        date_from = date.fromisoformat(request.args["date_from"])
+        date_to = date.fromisoformat(request.args["date_to"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "date_from and date_to must be YYYY-MM-DD"}), 400
+    if not 0 <= (date_to - date_from).days <= MAX_OCCURRENCE_WINDOW_DAYS:
+        return jsonify({"error": f"The window must run forwards and span at most {MAX_OCCURRENCE_WINDOW_DAYS} days"}), 400
+
+    db = get_db()
+    organisation_filter = "AND OrganisationID = ?" if request.args.get("organisation_id") else ""
+    organisation_params = (request.args["organisation_id"],) if organisation_filter else ()
+    events = [dict(e) for e in db.execute(
+        f"""
+        SELECT ID, SeriesID, OrganisationID, Name, Date, Location, Description, StartTime, EndTime, Status
+        FROM Events
+        WHERE Date BETWEEN ? AND ? {organisation_filter}
+        ORDER BY Date, ID
+        LIMIT ?
+        """,
+        (date_from.isoformat(), date_to.isoformat(), *organisation_params, MAX_OCCURRENCES + 1)
+    )]
+    for series in db.execute(
+        f"""
+        SELECT * FROM EventSeries
+        WHERE StartDate <= ? AND MaterialisedUntil < ? AND (EndDate IS NULL OR EndDate >= ?) {organisation_filter}
+        """,
+        (date_to.isoformat(), date_to.isoformat(), date_from.isoformat(), *organisation_params)
+    ):
+        start = max(date_from, date.fromisoformat(series["MaterialisedUntil"]) + timedelta(days=1))
+        for day in itertools.islice(occurrences(parse_rrule(series["Rule"]), date.fromisoformat(series["StartDate"]), start, date_to), MAX_OCCURRENCES + 1):
+            events.append({
+                "ID": None, "SeriesID": series["ID"], "OrganisationID": series["OrganisationID"],
+                "Name": series["Name"], "Date": day.isoformat(), "Location": series["Location"],
+                "Description": series["Description"], "StartTime": series["StartTime"],
+                "EndTime": series["EndTime"], "Status": "Upcoming",
+            })
+    events.sort(key=lambda e: (e["Date"], e["ID"] is None, e["ID"] or e["SeriesID"]))
+    return jsonify({"events": events[:MAX_OCCURRENCES], "truncated": len(events) > MAX_OCCURRENCES})
+
+@app.cli.command("materialise-series")
+@click.option("--days", default=SERIES_HORIZON_DAYS, help="How far ahead to write occurrences.")
+def materialise_series_command(days):
+    """Writes the occurrences of every repeating event up to DAYS ahead as events."""
+    db = connect_database()
+    db.row_factory = sqlite3.Row
+    migrate(db)
+    db.execute("BEGIN IMMEDIATE")
+    roles = extend_series(db, date.today() + timedelta(days=days))
+    db.commit()
+    events = db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID IS NOT NULL").fetchone()[0]
+    db.close()
+    print(f"{events} occurrences written, {len(roles)} roles copied in this run")
+
 # ADD EVENT ROLE
 @app.route("/add_event_role", methods=["POST"])
 def add_event_role():
@@ -147,9 +3106,36 @@ def add_event_role():
         event_id = request.form["event_id"]
         role_name = request.form["role_name"]
         role_desc = request.form["role_description"]
-        required_skill_id = request.form.get("required_skill")
-        
-        db.execute(
+        required_skill_id = request.form.get("required_skill") or None  # "" would fail the foreign key
+
+        # scope=following adds the role to this occurrence of a repeating event and every later one
+        event = series_event(db, event_id, session["user_id"]) if request.form.get("scope") == "following" else None
+        if event is not None:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                series_id = split_series(db, event)
+                db.execute(
+                    "INSERT INTO SeriesRoles (SeriesID, SkillID, Name, Description) VALUES (?, ?, ?, ?)",
+                    (series_id, required_skill_id, role_name, role_desc)
+                )
+                roles = db.execute(
+                    """
+                    INSERT INTO EventRoles (EventID, Name, Description, SkillID)
+                    SELECT ID, ?, ?, ? FROM Events WHERE SeriesID = ?
+                    RETURNING ID, EventID, SkillID
+                    """,
+                    (role_name, role_desc, required_skill_id, series_id)
+                ).fetchall()
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+            matcher = get_matcher()
+            for role in roles:
+                matcher.add_role(role["ID"], role["EventID"], role["SkillID"])
+            return "OK", 200
+
+        cur = db.execute(
             """
             INSERT INTO EventRoles (EventID, Name, Description, SkillID) 
             VALUES (?, ?, ?, ?)
@@ -157,72 +3143,130 @@ def add_event_role():
             (event_id, role_name, role_desc, required_skill_id),
         )
         db.commit()
+        get_matcher().add_role(cur.lastrowid, int(event_id), required_skill_id)
         return "OK", 200
     except Exception as e:
-        print(f"Error adding event role: {e}")
+        app.logger.exception("Error adding event role: %s", e)
         return jsonify({"error": "An internal error occurred"}), 500
 
 # EVENT ROLES VIEW FOR VOLUNTEER ACCOUNTS
 @app.route("/get_event_roles", methods=["GET"])
+@read_only
 def get_event_roles():
-    db = get_db()
-    user_type = session.get("user_type")
+    """One event's roles for a volunteer, the older single-event form of /get_event_roles_batch."""
+    if session.get("user_type") != "volunteer":
+        return ("Unauthorized", 401)
+    try:
+        event_id = int(request.args.get("event_id", ""))
+    except ValueError:
+        return jsonify({"error": "event_id must be an integer"}), 400
 
-    if user_type == "volunteer":
-        event_id = request.args.get("event_id")
-        volunteer_id = session.get("user_id")
-        
-        # Get all roles for the event, including the required skill name
-        cur = db.execute(
-            """
-            SELECT 
+    rows = event_roles_rows(get_db(), session["user_id"], [event_id]).fetchall()
+    roles = []
+    for row in rows:
+        if row["EventID"] is None:
+            continue  # the event has no roles, the row only carries the volunteer's skills
+        role = {"id": row["ID"], "name": row["Name"], "description": row["Description"], "required_skill_name": row["required_skill_name"]}
+        if row["signup_status"]:
+            role["signup_status"] = row["signup_status"]
+        roles.append(role)
+    return jsonify({
+        "roles": roles,
+        "volunteer_skills": json.loads(rows[0]["volunteer_skills"])
+    })
+
+# BATCHED EVENT ROLES VIEW FOR VOLUNTEER ACCOUNTS
+# Returns the roles, signup status and volunteer skills for many events in one query,
+# e.g. /get_event_roles_batch?event_ids=1,2,3
+MAX_BATCH_EVENT_IDS = 500
+
+def event_roles_rows(db, volunteer_id, event_ids):
+    """
+    A cursor over the roles of the events with the volunteer's signup status on each, ordered
+    by event. The event ids are passed as a single JSON array so the statement text never
+    changes. The volunteer's skills (a JSON array) come back on every row, and the LEFT JOIN
+    keeps one row, with EventID NULL, even when none of the events have roles.
+    """
+    return db.execute(
+        """
+        WITH vs AS (
+            SELECT json_group_array(s.Name) AS volunteer_skills
+            FROM VolunteerSkills vsk
+            JOIN Skills s ON vsk.SkillID = s.Id
+            WHERE vsk.VolunteerID = ?
+        ),
+        roles AS (
+            SELECT
+                er.EventID,
                 er.ID,
                 er.Name,
                 er.Description,
-                s.Name AS required_skill_name
-            FROM EventRoles er
+                s.Name AS required_skill_name,
+                su.Status AS signup_status
+            FROM json_each(?) ids
+            JOIN EventRoles er ON er.EventID = ids.value
             LEFT JOIN Skills s ON er.SkillID = s.Id
-            WHERE er.EventID = ?
-            """,
-            (event_id,)
+            LEFT JOIN Signups su ON su.RoleID = er.ID AND su.VolunteerID = ?
         )
-        
-        roles = [{"id": r["ID"], "name": r["Name"], "description": r["Description"], "required_skill_name": r["required_skill_name"]} for r in cur.fetchall()]
+        SELECT vs.volunteer_skills, roles.*
+        FROM vs
+        LEFT JOIN roles
+        ORDER BY roles.EventID, roles.ID
+        """,
+        (volunteer_id, json.dumps(sorted(set(event_ids))), volunteer_id)
+    )
 
-        # Check signup status for each role
-        for role in roles:
-            signup_status = db.execute(
-                """
-                SELECT Status 
-                FROM Signups 
-                WHERE VolunteerID = ? AND RoleID = ?
-                """,
-                (volunteer_id, role["id"])
-            ).fetchone()
-            if signup_status:
-                role["signup_status"] = signup_status["Status"]
-        
-        # --- NEW: Fetch volunteer's skills to pass to the frontend for filtering ---
-        volunteer_skills_cur = db.execute(
-            """
-            SELECT s.Name 
-            FROM VolunteerSkills vs
-            JOIN Skills s ON vs.SkillID = s.Id
-            WHERE vs.VolunteerID = ?
-            """,
-            (volunteer_id,)
-        )
-        volunteer_skills = [s["Name"] for s in volunteer_skills_cur.fetchall()]
-        
-        return jsonify({
-            "roles": roles,
-            "volunteer_skills": volunteer_skills
-        })
+@app.route("/get_event_roles_batch", methods=["GET"])
+@read_only
+def get_event_roles_batch():
+    if session.get("user_type") != "volunteer":
+        return "Unauthorized", 401
 
-    return ("Unauthorized", 401)
+    try:
+        event_ids = [int(i) for i in request.args.get("event_ids", "").split(",") if i.strip()]
+    except ValueError:
+        return jsonify({"error": "event_ids must be a comma separated list of integers"}), 400
+    if len(event_ids) > MAX_BATCH_EVENT_IDS:
+        return jsonify({"error": f"At most {MAX_BATCH_EVENT_IDS} event_ids per request"}), 400
+
+    volunteer_id = session["user_id"]
+
+    def generate():
+        # The query runs inside the generator: the connection opened before the
+        # response is returned has already been closed by close_connection.
+        cur = event_roles_rows(get_db(), volunteer_id, event_ids)
+        first = cur.fetchone()
+        yield '{"volunteer_skills": ' + first["volunteer_skills"] + ', "events": {'
+        # Every requested event gets a key, even if it has no roles
+        emitted = set()
+        current_event = None
+        row = first if first["EventID"] is not None else None
+        while row is not None:
+            if row["EventID"] != current_event:
+                if current_event is not None:
+                    yield '], '
+                current_event = row["EventID"]
+                emitted.add(current_event)
+                yield f'"{current_event}": ['
+            else:
+                yield ', '
+            role = {"id": row["ID"], "name": row["Name"], "description": row["Description"], "required_skill_name": row["required_skill_name"]}
+            if row["signup_status"]:
+                role["signup_status"] = row["signup_status"]
+            yield json.dumps(role)
+            row = cur.fetchone()
+        if current_event is not None:
+            yield ']'
+        missing = [f'"{event_id}": []' for event_id in dict.fromkeys(event_ids) if event_id not in emitted]
+        if missing:
+            yield (', ' if emitted else '') + ', '.join(missing)
+        yield '}}'
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 # EVENT ROLES VIEW FOR ORGANISATION ACCOUNTS
 @app.route("/get_org_event_roles", methods=["GET"])
+@read_only
 def get_org_event_roles():
     if session.get("user_type") != "organisation":
         return "Unauthorized", 401
@@ -248,6 +3292,70 @@ def get_org_event_roles():
 
     return jsonify(roles)
 
+# OPEN ROLES THE LOGGED IN VOLUNTEER HAS THE SKILLS FOR
+@app.route("/get_matching_roles", methods=["GET"])
+@read_only
+def get_matching_roles():
+    if session.get("user_type") != "volunteer":
+        return "Unauthorized", 401
+
+    role_ids = list(bit_indexes(get_matcher().matching_roles(session["user_id"])))
+    cur = get_db().execute(
+        """
+        SELECT 
+            er.ID, 
+            er.Name, 
+            er.Description, 
+            s.Name AS required_skill_name,
+            e.ID AS event_id,
+            e.Name AS event_name,
+            e.Date AS event_date
+        FROM json_each(?) ids
+        JOIN EventRoles er ON er.ID = ids.value
+        JOIN Events e ON er.EventID = e.ID
+        LEFT JOIN Skills s ON er.SkillID = s.Id
+        ORDER BY e.Date, er.ID
+        """,
+        (json.dumps(role_ids),)
+    )
+    roles = [{"id": r["ID"], "name": r["Name"], "description": r["Description"], "required_skill_name": r["required_skill_name"],
+              "event_id": r["event_id"], "event_name": r["event_name"], "event_date": r["event_date"]} for r in cur.fetchall()]
+    return jsonify(roles)
+
+# VOLUNTEERS WITH THE SKILLS FOR ONE OF THE ORGANISATION'S ROLES
+@app.route("/get_qualified_volunteers", methods=["GET"])
+@read_only
+def get_qualified_volunteers():
+    if session.get("user_type") != "organisation":
+        return "Unauthorized", 401
+
+    db = get_db()
+    role_id = request.args.get("role_id", type=int)
+    owner = db.execute(
+        """
+        SELECT e.OrganisationID 
+        FROM EventRoles er 
+        JOIN Events e ON er.EventID = e.ID 
+        WHERE er.ID = ?
+        """,
+        (role_id,)
+    ).fetchone()
+    if not owner or owner["OrganisationID"] != session["user_id"]:
+        return "Role not found", 404
+
+    matcher = get_matcher()
+    matcher.ensure_role(db, role_id)
+    volunteer_ids = list(bit_indexes(matcher.qualified_volunteers(role_id)))
+    cur = db.execute(
+        """
+        SELECT v.ID, v.FirstName || ' ' || v.LastName AS name, v.Location
+        FROM json_each(?) ids
+        JOIN Volunteers v ON v.ID = ids.value
+        """,
+        (json.dumps(volunteer_ids),)
+    )
+    return jsonify([{"id": v["ID"], "name": v["name"], "location": v["Location"]} for v in cur.fetchall()])
+
 # CREATE NEW SIGNUP FOR VOLUNTEER ACCOUNTS
 @app.route("/register_for_role", methods=["POST"])
 def register_for_role():
@@ -255,72 +3363,264 @@ def register_for_role():
         return "Unauthorized", 401
 
     db = get_db()
-    role_id = request.form["role_id"]
+    try:
+        role_id = int(request.form["role_id"])
+    except ValueError:
+        return "Invalid role", 400
     volunteer_id = session["user_id"]
 
-    # --- NEW: Check if the volunteer has the required skill for the role ---
-    role_skill_cur = db.execute(
+    status = claim_seat(db, volunteer_id, role_id)
+    if status == "Missing":
+        return "Role not found", 404
+    if status == "Unqualified":
+        return "You do not have the required skills for this role.", 400
+    if status is None:
+        return "Already signed up", 400
+    forget_profiles(volunteer_id)
+    if status == "Waitlisted":
+        return "This role is full, you have been added to the waitlist", 202
+    notify_signups(db, [(volunteer_id, role_id)])
+    return "OK", 200
+
+# Signup writers in this process queue here instead of in SQLite's busy handler, which polls
+# with sleeps of up to 100 ms and so gives a long latency tail under a burst
+signup_write_lock = threading.Lock()
+
+def claim_seat(db, volunteer_id, role_id):
+    """
+    Signs a volunteer up for a role if it has a free seat, otherwise puts them on its
+    waitlist. Pending and accepted signups hold a seat; a role with no VolunteersNeeded
+    never fills. Returns "Pending", "Waitlisted", "Missing" if there is no such role,
+    "Unqualified" if the volunteer lacks its required skill, or None if they are already
+    signed up or waiting. BEGIN IMMEDIATE takes the write lock before the seat count is read,
+    so two requests can never both take the last seat.
+    """
+    with signup_write_lock:
+        return _claim_seat(db, volunteer_id, role_id)
+
+def _claim_seat(db, volunteer_id, role_id):
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        # The skill check reads VolunteerSkills directly: the matcher's bitsets only see skill changes
+        # made through this process. A SkillID naming no skill (NULL, or '' from older forms) requires none.
+        role = db.execute(
+            """
+            SELECT NOT EXISTS (SELECT 1 FROM Skills sk WHERE sk.ID = er.SkillID)
+                OR EXISTS (SELECT 1 FROM VolunteerSkills vs WHERE vs.VolunteerID = ? AND vs.SkillID = er.SkillID)
+            FROM EventRoles er
+            WHERE er.ID = ?
+            """,
+            (volunteer_id, role_id)
+        ).fetchone()
+        if role is None or not role[0]:
+            db.rollback()
+            return "Missing" if role is None else "Unqualified"
+        # The unique (VolunteerID, RoleID) index rejects a second signup for the same role
+        claimed = db.execute(
+            """
+            INSERT INTO Signups (VolunteerID, RoleID, Status)
+            SELECT ?, er.ID, 'Pending'
+            FROM EventRoles er
+            LEFT JOIN RoleStats rs ON rs.RoleID = er.ID
+            WHERE er.ID = ?
+              AND (er.VolunteersNeeded IS NULL OR COALESCE(rs.PendingCount + rs.AcceptedCount, 0) < er.VolunteersNeeded)
+            """,
+            (volunteer_id, role_id)
+        ).rowcount
+        if claimed:
+            status = "Pending"
+        else:
+            waiting = db.execute(
+                """
+                INSERT INTO Waitlist (RoleID, VolunteerID)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM Signups WHERE VolunteerID = ? AND RoleID = ?)
+                """,
+                (role_id, volunteer_id, volunteer_id, role_id)
+            ).rowcount
+            status = "Waitlisted" if waiting else None
+        db.commit()
+        return status
+    except sqlite3.IntegrityError:
+        db.rollback()
+        return None
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+def free_seats(db, role_id):
+    """
+    Returns how many seats of a role are not held by a pending or accepted signup, or None
+    if the role does not limit its volunteers. Read it inside the write transaction.
+    """
+    free = db.execute(
         """
-        SELECT s.Name 
+        SELECT er.VolunteersNeeded - COALESCE(rs.PendingCount + rs.AcceptedCount, 0)
         FROM EventRoles er
-        LEFT JOIN Skills s ON er.SkillID = s.Id
+        LEFT JOIN RoleStats rs ON rs.RoleID = er.ID
         WHERE er.ID = ?
         """,
         (role_id,)
+    ).fetchone()
+    return None if free is None else free[0]
+
+def promote_waitlist(db, role_id):
+    """
+    Moves the longest-waiting volunteers on a role's waitlist into its free seats, as
+    pending signups. Call inside the write transaction that freed the seats. Returns the
+    promoted volunteer IDs.
+    """
+    free = free_seats(db, role_id)
+    if free is None or free <= 0:
+        return []
+    waiting = db.execute(
+        """
+        SELECT ID, VolunteerID FROM Waitlist
+        WHERE RoleID = ?
+        ORDER BY ID
+        LIMIT ?
+        """,
+        (role_id, free)
+    ).fetchall()
+    db.executemany(
+        "INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (?, ?, 'Pending')",
+        ((w["VolunteerID"], role_id) for w in waiting)
     )
-    required_skill = role_skill_cur.fetchone()
+    db.executemany("DELETE FROM Waitlist WHERE ID = ?", ((w["ID"],) for w in waiting))
+    return [w["VolunteerID"] for w in waiting]
+
+#////////////////////////////////////////////////////////////////////STATISTICS////////////////////////////////////////////////////////////////////
 
-    # If the role has a required skill, check if the volunteer has it
-    if required_skill and required_skill["Name"]:
-        volunteer_skill_cur = db.execute(
+# ORGANISATION DASHBOARD NUMBERS, read from the summary tables instead of counting signups
+# e.g. /organisation_stats, or /organisation_stats?event_id=3 for that event's roles
+@app.route("/organisation_stats", methods=["GET"])
+@read_only
+def organisation_stats():
+    if session.get("user_type") != "organisation":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    row = db.execute(
+        """
+        SELECT EventCount, RoleCount, SignupCount, PendingCount, AcceptedCount, RejectedCount
+        FROM OrganisationStats
+        WHERE OrganisationID = ?
+        """,
+        (session["user_id"],)
+    ).fetchone()
+    stats = {
+        "event_count": row["EventCount"] if row else 0,
+        "role_count": row["RoleCount"] if row else 0,
+        "signup_count": row["SignupCount"] if row else 0,
+        "pending_count": row["PendingCount"] if row else 0,
+        "accepted_count": row["AcceptedCount"] if row else 0,
+        "rejected_count": row["RejectedCount"] if row else 0,
+    }
+
+    event_id = request.args.get("event_id", type=int)
+    if event_id is not None:
+        roles = db.execute(
             """
-            SELECT s.Name 
-            FROM VolunteerSkills vs
-            JOIN Skills s ON vs.SkillID = s.Id
-            WHERE vs.VolunteerID = ? AND s.Name = ?
+            SELECT rs.RoleID, er.Name, er.VolunteersNeeded, rs.SignupCount, rs.PendingCount, rs.AcceptedCount, rs.RejectedCount
+            FROM RoleStats rs
+            JOIN EventRoles er ON er.ID = rs.RoleID
+            WHERE rs.EventID = ? AND rs.OrganisationID = ?
             """,
-            (volunteer_id, required_skill["Name"])
-        )
-        
-        if not volunteer_skill_cur.fetchone():
-            return "You do not have the required skills for this role.", 400
+            (event_id, session["user_id"])
+        ).fetchall()
+        stats["roles"] = [{"role_id": r["RoleID"], "name": r["Name"], "volunteers_needed": r["VolunteersNeeded"],
+                           "signup_count": r["SignupCount"], "pending_count": r["PendingCount"],
+                           "accepted_count": r["AcceptedCount"], "rejected_count": r["RejectedCount"]} for r in roles]
+    return jsonify(stats)
 
-    # Check if the volunteer has already signed up
-    signup_cur = db.execute(
+# A VOLUNTEER'S OWN NUMBERS
+@app.route("/volunteer_stats", methods=["GET"])
+@read_only
+def volunteer_stats():
+    if session.get("user_type") != "volunteer":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    row = get_db().execute(
         """
-        SELECT * FROM Signups 
-        WHERE VolunteerID = ? AND RoleID = ?
+        SELECT vs.SignupCount, vs.AcceptedCount, v.TotalHoursContributed
+        FROM Volunteers v
+        LEFT JOIN VolunteerStats vs ON vs.VolunteerID = v.ID
+        WHERE v.ID = ?
         """,
-        (volunteer_id, role_id),
-    )
-    if signup_cur.fetchone():
-        return "Already signed up", 400
+        (session["user_id"],)
+    ).fetchone()
+    if row is None:
+        return jsonify({"error": "Volunteer not found"}), 404
+    return jsonify({"signup_count": row["SignupCount"] or 0, "accepted_count": row["AcceptedCount"] or 0,
+                    "total_hours": row["TotalHoursContributed"] or 0})
 
-    db.execute(
+#////////////////////////////////////////////////////////////////////SEARCH////////////////////////////////////////////////////////////////////
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGES = 50
+
+def search_match_query(text):
+    """
+    Turns what the user typed into an FTS5 query: every word must match, and the last word
+    is a prefix so results appear while typing. Words are quoted, so FTS5 operators and
+    punctuation in the input are treated as plain text.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+# SEARCH EVENTS, ROLES AND ORGANISATIONS
+# e.g. /search?q=tree pla&kind=event&page=2
+@app.route("/search", methods=["GET"])
+@read_only
+def search():
+    match = search_match_query(request.args.get("q", ""))
+    kind = request.args.get("kind")
+    page = request.args.get("page", 1, type=int)
+    if kind not in (None, "event", "role", "organisation"):
+        return jsonify({"error": "kind must be event, role or organisation"}), 400
+    if not 1 <= page <= MAX_SEARCH_PAGES:
+        return jsonify({"error": f"page must be between 1 and {MAX_SEARCH_PAGES}"}), 400
+    if match is None:
+        return jsonify({"results": [], "next_page": None})
+
+    # Name matches weigh more than description or location matches
+    cur = get_db().execute(
         """
-        INSERT INTO Signups (VolunteerID, RoleID, Status) 
-        VALUES (?, ?, 'Pending')
+        SELECT Kind, ItemID, EventID, Name, Description, Location
+        FROM SearchIndex
+        WHERE SearchIndex MATCH ? AND (? IS NULL OR Kind = ?)
+        ORDER BY bm25(SearchIndex, 10.0, 2.0, 1.0)
+        LIMIT ? OFFSET ?
         """,
-        (volunteer_id, role_id),
+        (match, kind, kind, SEARCH_PAGE_SIZE + 1, (page - 1) * SEARCH_PAGE_SIZE)
     )
-    db.commit()
-    return "OK", 200
+    rows = cur.fetchall()
+    results = [{"kind": r["Kind"], "id": r["ItemID"], "event_id": r["EventID"], "name": r["Name"],
+                "description": r["Description"], "location": r["Location"]} for r in rows[:SEARCH_PAGE_SIZE]]
+    next_page = page + 1 if len(rows) > SEARCH_PAGE_SIZE and page < MAX_SEARCH_PAGES else None
+    return jsonify({"results": results, "next_page": next_page})
 
 #////////////////////////////////////////////////////////////////////SELECT ALL SKILLS////////////////////////////////////////////////////////////////////
 
 # SELECT SKILLS FOR SKILL DROPDOWN MENUS
 @app.route("/get_skills", methods=["GET"])
+@read_only
 def get_skills():
-    db = get_db()
-    cur = db.execute(
-        """
-        SELECT Id, Name 
-        FROM Skills 
-        ORDER BY Name
-        """
-    )
-    skills = [{"id": s["Id"], "name": s["Name"]} for s in cur.fetchall()]
-    return jsonify(skills)
+    def load():
+        cur = get_read_db(live=True).execute(
+            """
+            SELECT Id, Name 
+            FROM Skills 
+            ORDER BY Name
+            """
+        )
+        return [{"id": s["Id"], "name": s["Name"]} for s in cur.fetchall()]
+
+    entry = cached("skills", load)
+    if is_not_modified(entry):
+        return "", 304
+    return conditional_response(entry, jsonify(entry["value"]))
 
 #////////////////////////////////////////////////////////////////////CREATE NEW ACCOUNT////////////////////////////////////////////////////////////////////
 
@@ -333,7 +3633,6 @@ def signup():
 @app.route("/signup/volunteer", methods = ['GET', 'POST'])
 def volunteer_signup():
     if request.method == 'POST':
-        db = get_db()
         first_name = request.form['first_name']
         last_name = request.form['last_name']
         email = request.form['email']
@@ -341,14 +3640,19 @@ def volunteer_signup():
         birthdate = request.form['birthdate']
         phone_num = request.form['phone']
         location = request.form['location']
+        # Hashed before the writer is checked out, it is the slow part
+        password_hash = hash_password(password)
+        db = get_db()
         cur = db.execute(
             """
             INSERT INTO Volunteers (Password, FirstName, LastName, Email, PhoneNumber, Location, BirthDate) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            VALUES ('', ?, ?, ?, ?, ?, ?)
             """, 
-            (password, first_name, last_name, email, phone_num, location, birthdate)
+            (first_name, last_name, email, phone_num, location, birthdate)
         )
+        store_password_hash(db, "volunteer", cur.lastrowid, password_hash)
         db.commit()
+        get_matcher().refresh_volunteer(db, cur.lastrowid)
         return redirect(url_for('login')) 
     return render_template("volunteer_signup.html")
 
@@ -356,20 +3660,23 @@ def volunteer_signup():
 @app.route("/signup/organisation", methods = ['GET', 'POST'])
 def organisation_signup():
     if request.method == 'POST':
-            db = get_db()
             org_name = request.form['org_name']
             address = request.form['address']
             email = request.form['email']
             password = request.form['password']
-            print("creating organisation record")
+            app.logger.info("creating organisation record")
+            password_hash = hash_password(password)
+            db = get_db()
             cur = db.execute(
                 """
                 INSERT INTO Organisations (Password, Name, Email, Address) 
-                VALUES (?, ?, ?, ?)
+                VALUES ('', ?, ?, ?)
                 """, 
-                (password, org_name, email, address)
+                (org_name, email, address)
             )
+            store_password_hash(db, "organisation", cur.lastrowid, password_hash)
             db.commit()
+            invalidate("organisations")
             return redirect(url_for('login')) 
     return render_template("organisation_signup.html")
 
@@ -382,232 +3689,179 @@ def login():
         email = request.form['email']
         password = request.form['password']
 
-        db = get_db()
-        cur = db.execute(
-            """
-            SELECT * FROM Volunteers 
-            WHERE Email=? AND Password=?
-            """, 
-            (email, password)
-        )
-        volunteer = cur.fetchone()
+        # Looked up on a read-only connection, so the writer is not held while the password is checked
+        account = authenticate(get_read_db(live=True), email, password)
+        if account:
+            # A fresh token on every login, so a token planted before login is worthless
+            session.clear()
+            session.regenerate = True
+            session['user_type'] = account['UserType']
+            session['user_id'] = account['UserID']
+            session['first_name' if account['UserType'] == 'volunteer' else 'org_name'] = account['DisplayName']
+            return redirect(url_for('index'))
+        app.logger.info("invalid credentials")
 
-        if volunteer:
-            session['user_type'] = 'volunteer'
-            session['user_id'] = volunteer['ID']
-            session['first_name'] = volunteer['FirstName']
-            return redirect(url_for('index'))    
-        else:
-            db = get_db()
-            cur = db.execute(
+    return render_template("login.html")
+
+#////////////////////////////////////////////////////////////////////EDIT PROFILE DETAILS////////////////////////////////////////////////////////////////////////////
+
+# PROFILE FIELDS: form/JSON name -> column, per account type
+PROFILE_FIELDS = {
+    "volunteer": ("Volunteers", {
+        "email": "Email",
+        "phone": "PhoneNumber",
+        "location": "Location",
+        "bio": "Bio",
+        "password": None,  # hashed into Credentials, see hash_profile_password
+    }),
+    "organisation": ("Organisations", {
+        "name": "Name",
+        "address": "Address",
+        "website_url": "WebsiteURL",
+        "bio": "Description",  # organisations keep their bio in the Description column
+        "password": None,
+    }),
+}
+
+def hash_profile_password(changes):
+    """
+    Splits a new password out of profile changes. Returns the other changes and the password's
+    hash, or None. Call it before get_db(), hashing is the slow part. Raises ValueError for an
+    empty password.
+    """
+    changes = dict(changes)
+    password = changes.pop("password", None)
+    if password is not None and not password:
+        raise ValueError("Password cannot be empty")
+    return changes, hash_password(password) if password else None
+
+def update_profile(db, user_type, user_id, changes, password_hash=None):
+    """
+    Applies several profile fields and (for volunteers) the full skill list in one transaction.
+    Always costs at most four statements however many fields or skills are sent: one UPDATE,
+    then a bulk skill upsert, a delete of the links no longer wanted and an insert of the new
+    ones. Unchanged skill links are left in place. Raises ValueError for unknown fields and
+    sqlite3.IntegrityError if a value breaks a constraint; nothing is written in either case.
+    A new password comes as the password_hash from hash_profile_password, and logs the account
+    out of every session.
+    """
+    table, columns = PROFILE_FIELDS[user_type]
+    changes = dict(changes)
+    skills = changes.pop("skills", None)
+    # A plain password is never taken here, there is one hashing path
+    unknown = [field for field in changes if columns.get(field) is None]
+    if unknown or (skills is not None and user_type != "volunteer"):
+        raise ValueError(f"Unknown profile fields: {', '.join(unknown) or 'skills'}")
+
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    if skills is not None:
+        skills = json.dumps(list(dict.fromkeys(s.strip() for s in skills if s.strip())))
+
+    try:
+        if changes:
+            assignments = ", ".join(f"{columns[field]} = ?" for field in changes)
+            db.execute(f"UPDATE {table} SET {assignments} WHERE ID = ?", (*changes.values(), user_id))
+        if skills is not None:
+            db.execute(
                 """
-                SELECT * FROM Organisations 
-                WHERE Email=? AND Password=?
-                """, 
-                (email, password)
+                INSERT INTO Skills (Name)
+                SELECT value FROM json_each(?) WHERE true
+                ON CONFLICT(Name) DO NOTHING
+                """,
+                (skills,)
+            )
+            db.execute(
+                """
+                DELETE FROM VolunteerSkills
+                WHERE VolunteerID = ?
+                AND SkillID NOT IN (SELECT s.ID FROM json_each(?) j JOIN Skills s ON s.Name = j.value)
+                """,
+                (user_id, skills)
             )
-            org = cur.fetchone()
-            if org:
-                session['user_type'] = 'organisation'
-                session['user_id'] = org['ID']
-                session['org_name'] = org['Name']
-                return redirect(url_for('index'))
-            else:   
-                print("invalid credentials")
+            db.execute(
+                """
+                INSERT INTO VolunteerSkills (VolunteerID, SkillID)
+                SELECT ?, s.ID FROM json_each(?) j JOIN Skills s ON s.Name = j.value WHERE true
+                ON CONFLICT(VolunteerID, SkillID) DO NOTHING
+                """,
+                (user_id, skills)
+            )
+        if password_hash:
+            store_password_hash(db, user_type, user_id, password_hash)
+            revoke_sessions(db, user_type, user_id)
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
 
-    return render_template("login.html")
+    if user_type == "volunteer":
+        forget_profiles(user_id)
+    if skills is not None:
+        get_matcher().refresh_volunteer(db, user_id)
+        invalidate("skills")  # new skill names may have been created
+    if user_type == "organisation":
+        invalidate("organisations")
 
-#////////////////////////////////////////////////////////////////////EDIT PROFILE DETAILS////////////////////////////////////////////////////////////////////////////
+def refresh_session_identity(user_type, changes):
+    """Keeps the identity cached in the session in step with a profile update."""
+    if user_type == "organisation" and "name" in changes:
+        session["org_name"] = changes["name"]
+    if changes.get("password"):
+        # update_profile logged out every session, this one carries on under a new token
+        session.regenerate = True
+
+# UPDATE SEVERAL PROFILE FIELDS AT ONCE (JSON)
+# e.g. {"location": "Sydney", "bio": "...", "skills": ["First Aid", "Cooking"]}
+@app.route('/update_profile', methods=['POST'])
+def update_profile_api():
+    user_type = session.get('user_type')
+    if user_type not in PROFILE_FIELDS:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'Expected a JSON object of fields to update.'}), 400
+    try:
+        changes, password_hash = hash_profile_password(data)
+        update_profile(get_db(), user_type, session['user_id'], changes, password_hash)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.IntegrityError as e:
+        return jsonify({'error': str(e)}), 400
+    refresh_session_identity(user_type, data)
+    return jsonify({'success': True, 'updated': sorted(data)})
 
 # UPDATE PROFILE INFO
 @app.route('/edit_profile', methods=['GET', 'POST'])
+@read_only
 def edit_profile():
     if 'user_id' not in session or 'user_type' not in session:
         return redirect('/login')
 
     user_id = session['user_id']
     user_type = session['user_type']
-    db = get_db()
 
     if request.method == 'POST':
         field_to_update = request.form.get('field')
         new_value = request.form.get('value')
-        
-        def get_or_create_skill_id(skill_name):
-            cur = db.execute(
-                """
-                SELECT ID 
-                FROM Skills 
-                WHERE Name = ?
-                """, 
-                (skill_name,)
-            )
-            skill = cur.fetchone()
-            if skill:
-                return skill['ID']
-            else:
-                cur = db.execute(
-                    """
-                    INSERT INTO Skills (Name) 
-                    VALUES (?)
-                    """, 
-                    (skill_name,)
-                )
-                db.commit()
-                return cur.lastrowid
-
-        if user_type == 'volunteer':
-            if field_to_update == 'email':
-                db.execute(
-                    """
-                    UPDATE Volunteers 
-                    SET Email = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'phone':
-                db.execute(
-                    """
-                    UPDATE Volunteers 
-                    SET PhoneNumber = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'location':
-                db.execute(
-                    """
-                    UPDATE Volunteers 
-                    SET Location = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'bio':
-                db.execute(
-                    """
-                    UPDATE Volunteers 
-                    SET Bio = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'skills':
-                # Split the skills string from the form, handling empty values
-                skills = [s.strip() for s in new_value.split(',') if s.strip()]
-
-                # First, delete all existing skills for the volunteer
-                db.execute(
-                    """
-                    DELETE FROM VolunteerSkills 
-                    WHERE VolunteerID = ?
-                    """, 
-                    (user_id,)
-                )
-                
-                # Then, insert the new skills
-                for skill_name in skills:
-                    skill_id = get_or_create_skill_id(skill_name)
-                    if skill_id:
-                        db.execute(
-                            """
-                            INSERT INTO VolunteerSkills (VolunteerID, SkillID) 
-                            VALUES (?, ?)
-                            """, 
-                            (user_id, skill_id)
-                        )
-            elif field_to_update == 'password':
-                # Note: In a real app, you would hash the password here
-                db.execute(
-                    """
-                    UPDATE Volunteers 
-                    SET Password = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-
-        elif user_type == 'organisation':
-            if field_to_update == 'name':
-                db.execute(
-                    """
-                    UPDATE Organisations 
-                    SET Name = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'address':
-                db.execute(
-                    """
-                    UPDATE Organisations 
-                    SET Address = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'website_url':
-                db.execute(
-                    """
-                    UPDATE Organisations 
-                    SET WebsiteURL = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'bio':
-                # Correctly using the 'Description' column name for organisation bio
-                db.execute(
-                    """
-                    UPDATE Organisations 
-                    SET Description = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-            elif field_to_update == 'password':
-                # Note: In a real app, you would hash the password here
-                db.execute(
-                    """
-                    UPDATE Organisations 
-                    SET Password = ? 
-                    WHERE ID = ?
-                    """, 
-                    (new_value, user_id)
-                )
-
-        db.commit()
+        try:
+            changes, password_hash = hash_profile_password({field_to_update: new_value})
+            update_profile(get_db(), user_type, user_id, changes, password_hash)
+            refresh_session_identity(user_type, {field_to_update: new_value})
+        except (ValueError, sqlite3.IntegrityError) as e:
+            flash(f"Could not update {field_to_update}: {e}", "danger")
         return redirect('/edit_profile')
 
     # GET request: Get user info for rendering the page
+    db = get_db()
     user = {}
     if user_type == 'volunteer':
-        # Retrieve volunteer's basic info
-        cur = db.execute(
-            """
-            SELECT Email, PhoneNumber, Location, Bio 
-            FROM Volunteers 
-            WHERE ID = ?
-            """, 
-            (user_id,)
-        )
-        volunteer_data = cur.fetchone()
-        if not volunteer_data:
+        # Read past the memo, the volunteer may have just saved a change through another process
+        volunteer = load_profiles(db, [user_id]).get(user_id)
+        if not volunteer:
             return "Volunteer not found.", 404
-        user['email'], user['phone_number'], user['location'], user['bio'] = volunteer_data
-
-        # Retrieve volunteer's skills from the separate table
-        cur = db.execute(
-            """
-            SELECT T2.Name
-            FROM VolunteerSkills AS T1
-            JOIN Skills AS T2 ON T1.SkillID = T2.ID
-            WHERE T1.VolunteerID = ?
-            """, 
-            (user_id,)
-        )
-        user['skills'] = [row[0] for row in cur.fetchall()]
+        user = {field: volunteer[field] for field in ("email", "phone_number", "location", "bio", "skills")}
 
     elif user_type == 'organisation':
         # Retrieve organisation's info
@@ -632,6 +3886,7 @@ def edit_profile():
 #////////////////////////////////////////////////////////////////////VIEW SIGNUPS PAGE////////////////////////////////////////////////////////////////////////////
 
 @app.route('/view_signups')
+@read_only
 def view_signups():
     """
     Handles the logic for the signups page, returning different views
@@ -665,94 +3920,276 @@ def view_signups():
         signups = db.execute(query, (user_id,)).fetchall()
 
     elif user_type == "organisation":
-        # Use organisation's ID directly
-        org_id = user_id
-        # NOTE: Added the volunteer's ID (v.id) to the select statement to enable linking
-        query = """
-            SELECT 
-                s.id, 
-                s.status,
-                v.FirstName || ' ' || v.LastName AS volunteer_name,
-                v.Id AS volunteerID,
-                e.Name AS event_name,
-                r.Name AS role_name
-            FROM Signups s
-            JOIN EventRoles r ON s.roleID = r.id
-            JOIN Events e ON r.eventID = e.id
-            JOIN Volunteers v ON s.volunteerID = v.id
-            WHERE e.organisationID = ?
-            ORDER BY e.Date ASC;
-        """
-        signups = db.execute(query, (org_id,)).fetchall()
+        # Counts per event and role only; the signups themselves are fetched a role at a time
+        try:
+            dashboard = signup_dashboard_page(db, user_id, request.args)
+        except ValueError as e:
+            return str(e), 400
+        next_args = dict(request.args, cursor=dashboard["next_cursor"]) if dashboard["next_cursor"] else None
+        return render_template('view_signups.html', dashboard=dashboard, next_args=next_args, session=session)
 
     return render_template('view_signups.html', signups=signups, session=session)
 
-@app.route('/volunteers')
-def volunteers():
-    """Displays a list of all volunteers."""
-    conn = get_db()
-    volunteers = conn.execute(
-        """
-        SELECT * FROM Users
-        """
+DASHBOARD_EVENTS_PAGE_SIZE = 20
+MAX_DASHBOARD_EVENTS_PAGE_SIZE = 100
+ROLE_SIGNUPS_PAGE_SIZE = 50
+MAX_ROLE_SIGNUPS_PAGE_SIZE = 500
+
+def signup_dashboard_page(db, organisation_id, args):
+    """
+    One page of an organisation's events, ordered by (Date, ID), each with its roles' pending,
+    accepted and rejected counts against VolunteersNeeded, plus the organisation's totals.
+    The counts are read from RoleStats in one grouped query, so a page costs the same however
+    many signups the organisation has. Optional arguments: status (Upcoming by default,
+    Passed or all), cursor, limit.
+    """
+    status = args.get("status", "Upcoming")
+    if status not in ("Upcoming", "Passed", "all"):
+        raise ValueError("status must be Upcoming, Passed or all")
+    conditions = ["OrganisationID = ?"] + ([] if status == "all" else [f"Status = '{status}'"])
+    params = [organisation_id]
+    if args.get("cursor"):
+        conditions.append("(Date, ID) > (?, ?)")
+        params.extend(decode_cursor(args["cursor"]))
+    try:
+        limit = min(int(args.get("limit", DASHBOARD_EVENTS_PAGE_SIZE)), MAX_DASHBOARD_EVENTS_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+    rows = db.execute(
+        f"""
+        SELECT
+            e.ID, e.Name, e.Date, e.Status,
+            json_group_array(json_object(
+                'id', er.ID,
+                'name', er.Name,
+                'volunteers_needed', er.VolunteersNeeded,
+                'pending', COALESCE(rs.PendingCount, 0),
+                'accepted', COALESCE(rs.AcceptedCount, 0),
+                'rejected', COALESCE(rs.RejectedCount, 0)
+            )) FILTER (WHERE er.ID IS NOT NULL) AS roles
+        FROM (
+            SELECT ID, Name, Date, Status FROM Events
+            WHERE {" AND ".join(conditions)}
+            ORDER BY Date, ID
+            LIMIT ?
+        ) e
+        LEFT JOIN EventRoles er ON er.EventID = e.ID
+        LEFT JOIN RoleStats rs ON rs.RoleID = er.ID
+        GROUP BY e.ID
+        ORDER BY e.Date, e.ID
+        """,
+        (*params, limit + 1)
     ).fetchall()
-    conn.close()
-    return render_template('volunteers.html', volunteers=volunteers)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["Date"], rows[-1]["ID"])
+    events = []
+    for row in rows:
+        roles = sorted(json.loads(row["roles"]), key=lambda role: role["id"])
+        events.append({
+            "id": row["ID"], "name": row["Name"], "date": row["Date"], "status": row["Status"], "roles": roles,
+            "volunteers_needed": sum(role["volunteers_needed"] or 0 for role in roles),
+            **{count: sum(role[count] for role in roles) for count in ("pending", "accepted", "rejected")},
+        })
+    totals = db.execute(
+        "SELECT PendingCount, AcceptedCount, RejectedCount FROM OrganisationStats WHERE OrganisationID = ?",
+        (organisation_id,)
+    ).fetchone()
+    return {
+        "status": status,
+        "totals": {"pending": totals[0], "accepted": totals[1], "rejected": totals[2]} if totals
+                  else {"pending": 0, "accepted": 0, "rejected": 0},
+        "events": events,
+        "next_cursor": next_cursor,
+    }
+
+# EVENT AND ROLE SIGNUP COUNTS FOR THE LOGGED IN ORGANISATION, a page of events at a time
+@app.route("/signup_dashboard", methods=["GET"])
+@read_only
+def signup_dashboard():
+    if session.get("user_type") != "organisation":
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        return jsonify(signup_dashboard_page(get_db(), session["user_id"], request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# ONE ROLE'S SIGNUPS, ordered by (Status, ID) and paged with a cursor
+# names=0 leaves out the volunteers' names, which is the only part that needs the Volunteers table
+@app.route("/get_role_signups", methods=["GET"])
+@read_only
+def get_role_signups():
+    if session.get("user_type") != "organisation":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    role_id = request.args.get("role_id", type=int)
+    owner = db.execute("SELECT OrganisationID FROM RoleStats WHERE RoleID = ?", (role_id,)).fetchone()
+    if not owner or owner["OrganisationID"] != session["user_id"]:
+        return jsonify({"error": "Role not found"}), 404
+
+    status = request.args.get("status")
+    if status not in (None, "Pending", "Accepted", "Rejected"):
+        return jsonify({"error": "status must be Pending, Accepted or Rejected"}), 400
+    limit = request.args.get("limit", ROLE_SIGNUPS_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_ROLE_SIGNUPS_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_ROLE_SIGNUPS_PAGE_SIZE}"}), 400
+    conditions = ["RoleID = ?"]
+    params = [role_id]
+    if status:
+        conditions.append("Status = ?")
+        params.append(status)
+    if request.args.get("cursor"):
+        conditions.append("(Status, ID) > (?, ?)")
+        try:
+            params.extend(decode_cursor(request.args["cursor"]))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    with_names = request.args.get("names", "1") != "0"
+
+    # The page is cut from idx_signups_role before any volunteer is looked up
+    rows = db.execute(
+        f"""
+        SELECT s.ID, s.Status, s.VolunteerID
+            {", v.FirstName || ' ' || v.LastName AS volunteer_name" if with_names else ""}
+        FROM (
+            SELECT ID, Status, VolunteerID FROM Signups
+            WHERE {" AND ".join(conditions)}
+            ORDER BY Status, ID
+            LIMIT ?
+        ) s
+        {"JOIN Volunteers v ON v.ID = s.VolunteerID" if with_names else ""}
+        ORDER BY s.Status, s.ID
+        """,
+        (*params, limit + 1)
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["Status"], rows[-1]["ID"])
+    signups = []
+    for row in rows:
+        signup = {"id": row["ID"], "status": row["Status"], "volunteer_id": row["VolunteerID"]}
+        if with_names:
+            signup["volunteer_name"] = row["volunteer_name"]
+        signups.append(signup)
+    return jsonify({"signups": signups, "next_cursor": next_cursor})
+
+#////////////////////////////////////////////////////////////////////VOLUNTEER PROFILES////////////////////////////////////////////////////////////////////
+
+# Profiles are memoised for PROFILE_TTL seconds. Writes made through this process drop the
+# copy straight away; a write made by another process shows up once the copy expires.
+profile_cache = MemoryCache(PROFILE_CACHE_MAX_ENTRIES)
+
+# Upper age limit (exclusive) and label
+AGE_BUCKETS = [(18, "Under 18"), (25, "18-24"), (35, "25-34"), (50, "35-49"), (65, "50-64"), (math.inf, "65+")]
+
+# Whole years between BirthDate and today, worked out by SQLite instead of parsing the date per view
+AGE_SQL = """
+    CAST(strftime('%Y', 'now', 'localtime') AS INTEGER) - CAST(strftime('%Y', v.BirthDate) AS INTEGER)
+    - (strftime('%m-%d', 'now', 'localtime') < strftime('%m-%d', v.BirthDate))"""
+
+def load_profiles(db, volunteer_ids):
+    """Reads the profiles of several volunteers in one query. Returns {volunteer ID: profile}."""
+    rows = db.execute(
+        f"""
+        SELECT v.ID, v.FirstName, v.LastName, v.Email, v.PhoneNumber, v.Location, v.BirthDate, v.Bio,
+               v.TotalHoursContributed, v.Version, p.Skills, p.UpcomingSignupCount, {AGE_SQL} AS Age
+        FROM json_each(?) ids
+        JOIN Volunteers v ON v.ID = ids.value
+        LEFT JOIN VolunteerProfiles p ON p.VolunteerID = v.ID
+        """,
+        (json.dumps(volunteer_ids),)
+    ).fetchall()
+    profiles = {}
+    for row in rows:
+        age = row["Age"]
+        profiles[row["ID"]] = {
+            "id": row["ID"],
+            "first_name": row["FirstName"],
+            "last_name": row["LastName"],
+            "full_name": f"{row['FirstName']} {row['LastName']}",
+            "email": row["Email"],
+            "phone_number": row["PhoneNumber"],
+            "location": row["Location"],
+            "birthdate": row["BirthDate"],
+            "age": age,
+            "age_bucket": None if age is None else next(label for limit, label in AGE_BUCKETS if age < limit),
+            "bio": row["Bio"],
+            "total_hours": row["TotalHoursContributed"],
+            "skills": json.loads(row["Skills"] or "[]"),
+            "upcoming_signups": row["UpcomingSignupCount"] or 0,
+            "version": row["Version"],
+        }
+    return profiles
+
+def volunteer_profiles(db, volunteer_ids):
+    """Returns {volunteer ID: profile} for the volunteers that exist, reading only the ones not memoised."""
+    profiles = {}
+    missing = []
+    for volunteer_id in dict.fromkeys(volunteer_ids):
+        profile = profile_cache.get(volunteer_id)
+        if profile is None:
+            missing.append(volunteer_id)
+        else:
+            profiles[volunteer_id] = profile
+    if missing:
+        for volunteer_id, profile in load_profiles(db, missing).items():
+            profile_cache.set(volunteer_id, profile, PROFILE_TTL)
+            profiles[volunteer_id] = profile
+    return profiles
+
+def forget_profiles(*volunteer_ids):
+    profile_cache.delete(*volunteer_ids)
 
 @app.route("/volunteer/<int:volunteer_id>")
+@read_only
 def view_volunteer(volunteer_id):
-    db = get_db()
+    volunteer = volunteer_profiles(get_read_db(live=True), [volunteer_id]).get(volunteer_id)
+    if not volunteer:
+        return "Volunteer not found.", 404
 
-    volunteer_cur = db.execute(
-        """
-        SELECT 
-            FirstName, 
-            LastName, 
-            Email, 
-            PhoneNumber, 
-            BirthDate, 
-            Bio
-        FROM Volunteers
-        WHERE Id = ?
-        """, 
-        (volunteer_id,)
-    )
-    volunteer_data = volunteer_cur.fetchone()
+    # The age in the block changes with the date, and the signup count without a new Version
+    key = ("volunteer", volunteer_id, volunteer["version"], volunteer["upcoming_signups"], date.today().isoformat())
+    profile = render_fragment("fragments/volunteer_profile.html", key,
+                              volunteer=dict(volunteer, bio=volunteer["bio"] or "No bio provided."))
+    return render_template('view_volunteer.html', profile=profile)
 
-    if not volunteer_data:
-        flash("Volunteer not found.", "danger")
-        return redirect(url_for('volunteers'))
+MAX_BATCH_PROFILES = 500
 
-    # 2. Fetch volunteer's skills
-    skills_cur = db.execute(
-        """
-        SELECT s.Name
-        FROM VolunteerSkills vs
-        JOIN Skills s ON vs.SkillID = s.Id
-        WHERE vs.VolunteerID = ?
-        """, 
-        (volunteer_id,)
-    )
-    skills = [s['Name'] for s in skills_cur.fetchall()]
-
-    # 3. Calculate age from birthdate
-    # NOTE: The age calculation has been re-added as requested
-    birthdate = datetime.strptime(volunteer_data['BirthDate'], '%Y-%m-%d').date()
-    today = date.today()
-    age = today.year - birthdate.year - ((today.month, today.day) < (birthdate.month, today.day))
-
-    # Prepare data to send to the template
-    volunteer = {
-        'full_name': f"{volunteer_data['FirstName']} {volunteer_data['LastName']}",
-        'email': volunteer_data['Email'],
-        'phone_number': volunteer_data['PhoneNumber'],
-        'birthdate': volunteer_data['BirthDate'],
-        'bio': volunteer_data['Bio'] if volunteer_data['Bio'] else 'No bio provided.',
-        'skills': skills,
-        'age': age
-    }
+# PROFILES OF MANY VOLUNTEERS AT ONCE, e.g. everyone on the organisation's signup list
+# Only volunteers who have signed up for one of the organisation's roles are returned
+@app.route("/get_volunteer_profiles", methods=["GET"])
+@read_only
+def get_volunteer_profiles():
+    if session.get("user_type") != "organisation":
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        volunteer_ids = list(dict.fromkeys(int(i) for i in request.args.get("ids", "").split(",") if i.strip()))
+    except ValueError:
+        return jsonify({"error": "ids must be a comma separated list of volunteer IDs"}), 400
+    if not 1 <= len(volunteer_ids) <= MAX_BATCH_PROFILES:
+        return jsonify({"error": f"Give between 1 and {MAX_BATCH_PROFILES} volunteer IDs"}), 400
 
-    return render_template('view_volunteer.html', volunteer=volunteer)
+    db = get_db()
+    allowed = [row[0] for row in db.execute(
+        """
+        SELECT ids.value FROM json_each(?) ids
+        WHERE EXISTS (
+            SELECT 1 FROM Signups s JOIN RoleStats rs ON rs.RoleID = s.RoleID
+            WHERE s.VolunteerID = ids.value AND rs.OrganisationID = ?
+        )
+        """,
+        (json.dumps(volunteer_ids), session["user_id"])
+    )]
+    profiles = volunteer_profiles(get_read_db(live=True), allowed)
+    return jsonify({"profiles": [profiles[i] for i in volunteer_ids if i in profiles]})
 
 @app.route('/update_signup_status', methods=['POST'])
 def update_signup_status():
@@ -776,18 +4213,160 @@ def update_signup_status():
         return jsonify({'error': 'Invalid request data. Missing or invalid signup_id or status.'}), 400
 
     try:
-        db.execute(
+        results, promoted = review_signups(db, session['user_id'], [(signup_id, status)])
+    except sqlite3.Error as e:
+        return jsonify({'error': str(e)}), 500
+    if "error" in results[0]:
+        return jsonify({'error': results[0]["error"]}), 409 if results[0]["error"] == "Role full" else 404
+    return jsonify({'success': True, 'message': f'Signup {signup_id} updated to {status}',
+                    'promoted': [v for volunteers in promoted.values() for v in volunteers]})
+
+MAX_BATCH_SIGNUPS = 1000
+
+# REVIEW MANY SIGNUPS AT ONCE
+# {"updates": [{"signup_id": 4, "status": "Accepted"}, ...]}
+# or a filter: {"role_id": 7, "from_status": "Pending", "status": "Accepted"}
+# Rejected signups are only accepted into free seats, oldest first; the rest come back in "skipped"
+@app.route('/update_signup_statuses', methods=['POST'])
+def update_signup_statuses():
+    if session.get('user_type') != 'organisation':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    db = get_db()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+
+    if "updates" in data:
+        updates = data["updates"]
+        if not isinstance(updates, list) or not all(isinstance(u, dict) for u in updates):
+            return jsonify({'error': 'updates must be a list of {"signup_id", "status"} objects'}), 400
+        updates = [(u.get("signup_id"), u.get("status")) for u in updates]
+    elif "role_id" in data:
+        from_status = data.get("from_status", "Pending")
+        if data.get("status") not in ("Accepted", "Rejected") or from_status not in ("Pending", "Accepted", "Rejected"):
+            return jsonify({'error': 'status must be Accepted or Rejected'}), 400
+        # Signups of another organisation's role are dropped again by review_signups
+        signup_ids = db.execute(
             """
-            UPDATE Signups 
-            SET status = ? 
-            WHERE id = ?
+            SELECT ID FROM Signups
+            WHERE RoleID = ? AND Status = ?
+            ORDER BY ID
+            LIMIT ?
             """,
-            (status, signup_id)
-        )
-        db.commit()
-        return jsonify({'success': True, 'message': f'Signup {signup_id} updated to {status}'})
+            (data["role_id"], from_status, MAX_BATCH_SIGNUPS + 1)
+        ).fetchall()
+        updates = [(row["ID"], data["status"]) for row in signup_ids]
+    else:
+        return jsonify({'error': 'Give either updates or role_id'}), 400
+    if len(updates) > MAX_BATCH_SIGNUPS:
+        return jsonify({'error': f'At most {MAX_BATCH_SIGNUPS} signups per request'}), 400
+
+    try:
+        results, promoted = review_signups(db, session['user_id'], updates)
     except sqlite3.Error as e:
         return jsonify({'error': str(e)}), 500
+    skipped = [r["signup_id"] for r in results if r.get("error") == "Role full"]
+    return jsonify({'results': results, 'promoted': promoted, 'skipped': skipped})
+
+def review_signups(db, organisation_id, updates):
+    """
+    Applies (signup_id, status) pairs for one organisation in a single transaction. Signups
+    that are not the organisation's are left alone. Accepting a rejected signup needs a free
+    seat, so once a role is full the rest are refused with "Role full". Seats freed by
+    rejections go to the waitlist. Returns a result per pair, in order, and the volunteers
+    promoted per role.
+    """
+    results = []
+    valid = {}
+    for signup_id, status in updates:
+        if not isinstance(signup_id, int) or isinstance(signup_id, bool):
+            try:
+                signup_id = int(signup_id)
+            except (TypeError, ValueError):
+                results.append({"signup_id": signup_id, "error": "Invalid signup_id"})
+                continue
+        if status not in ("Accepted", "Rejected"):
+            results.append({"signup_id": signup_id, "error": "status must be Accepted or Rejected"})
+            continue
+        results.append({"signup_id": signup_id, "status": status})
+        valid[signup_id] = status  # the last status given for a signup wins
+
+    promoted = {}
+    full = set()
+    with signup_write_lock:
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            owned = db.execute(
+                """
+                SELECT s.ID, s.RoleID, s.VolunteerID, s.Status, er.Name AS RoleName, e.Name AS EventName
+                FROM json_each(?) ids
+                JOIN Signups s ON s.ID = ids.value
+                JOIN EventRoles er ON er.ID = s.RoleID
+                JOIN Events e ON e.ID = er.EventID
+                WHERE e.OrganisationID = ?
+                """,
+                (json.dumps(list(valid)), organisation_id)
+            ).fetchall()
+            owned = {row["ID"]: row for row in owned}
+            role_of = {signup_id: row["RoleID"] for signup_id, row in owned.items()}
+            # Rejections go first so the seats they free can be taken by acceptances in the same batch
+            for status in ("Rejected", "Accepted"):
+                ids = [signup_id for signup_id, s in valid.items() if s == status and signup_id in role_of]
+                if status == "Accepted":
+                    ids, full = take_seats(db, [(i, role_of[i]) for i in ids if owned[i]["Status"] == "Rejected"], ids)
+                if ids:
+                    db.execute(
+                        """
+                        UPDATE Signups SET Status = ?
+                        WHERE ID IN (SELECT value FROM json_each(?))
+                        """,
+                        (status, json.dumps(ids))
+                    )
+            for role_id in sorted({role_of[i] for i, s in valid.items() if s == "Rejected" and i in role_of}):
+                volunteers = promote_waitlist(db, role_id)
+                if volunteers:
+                    promoted[role_id] = volunteers
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+
+    forget_profiles(*(row["VolunteerID"] for row in owned.values()),
+                    *(volunteer_id for volunteers in promoted.values() for volunteer_id in volunteers))
+    for signup_id, status in valid.items():
+        if signup_id in owned and signup_id not in full:
+            row = owned[signup_id]
+            notify_status(row["VolunteerID"], signup_id, row["RoleID"], row["RoleName"], row["EventName"], status)
+    if promoted:
+        promoted_signups = [(volunteer_id, role_id) for role_id, volunteers in promoted.items() for volunteer_id in volunteers]
+        for signup in notify_signups(db, promoted_signups):
+            notify_status(signup["VolunteerID"], signup["ID"], signup["RoleID"], signup["RoleName"], signup["EventName"], signup["Status"])
+
+    for result in results:
+        if "status" in result and result["signup_id"] not in role_of:
+            del result["status"]
+            result["error"] = "Signup not found"
+        elif "status" in result and result["signup_id"] in full:
+            del result["status"]
+            result["error"] = "Role full"
+    return results, promoted
+
+def take_seats(db, seatless, ids):
+    """
+    Keeps the signups in ids that may be accepted. seatless lists the (signup_id, role_id)
+    pairs among them that hold no seat yet; per role, only as many of those as the role
+    has free seats are kept, in order. Returns the kept IDs and the set of refused ones.
+    """
+    by_role = {}
+    for signup_id, role_id in seatless:
+        by_role.setdefault(role_id, []).append(signup_id)
+    full = set()
+    for role_id, waiting in by_role.items():
+        free = free_seats(db, role_id)
+        if free is not None:
+            full.update(waiting[max(free, 0):])
+    return [i for i in ids if i not in full], full
 
 #////////////////////////////////////////////////////////////////////LOG OUT/////////////////////////////////////////////////////////////////////////////////////
 
@@ -0,0 +1,167 @@
+"""
+ASGI entry point for Community Connect. Serves the same Flask routes and templates as
+app.py, for example:
+
+    uvicorn asgi:application --host 127.0.0.1 --port 8000
+
+The event loop owns the client sockets, so idle keep-alive AJAX clients cost no threads.
+GET /notifications is served on the loop itself: an open event stream costs a socket and a
+queue rather than a thread, so a process can hold many thousands of them.
+Each request is handed to a bounded thread pool where the Flask view and its SQLite calls
+run exactly as they do under WSGI. Size the pool with the ASGI_THREADS environment
+variable; by default it is twice the database pool, so a thread seldom waits long for a
+connection.
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, POOL_SIZE, NOTIFY_HEARTBEAT_SECONDS, NOTIFY_RETRY_MS, notification_bus, notification_subscriber
+
+# Pages subscribe to /notifications only when a server that streams it is running
+app.config["LIVE_NOTIFICATIONS"] = True
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", POOL_SIZE * 2))
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+
+def build_environ(scope, body):
+    """Translates an ASGI http scope and request body into a WSGI environ."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            environ[name] = value
+        elif f"HTTP_{name}" in environ:
+            environ[f"HTTP_{name}"] += "," + value
+        else:
+            environ[f"HTTP_{name}"] = value
+    return environ
+
+def run_wsgi(environ, send, loop):
+    """Runs the Flask app on a pool thread, forwarding the response to the event loop as it is produced."""
+    response_start = {}
+
+    def start_response(status, headers, exc_info=None):
+        response_start["message"] = {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+        }
+
+    def push(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    result = app(environ, start_response)
+    try:
+        for chunk in result:
+            if "message" in response_start:
+                push(response_start.pop("message"))
+            if chunk:
+                push({"type": "http.response.body", "body": chunk, "more_body": True})
+        if "message" in response_start:
+            push(response_start.pop("message"))
+        push({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+def resolve_subscriber(environ):
+    """Opens the request's session on a pool thread (it needs the database) and returns notification_subscriber()."""
+    with app.request_context(environ):
+        return notification_subscriber()
+
+async def serve_notifications(scope, receive, send):
+    """The /notifications event stream, without holding a pool thread while it is open."""
+    loop = asyncio.get_running_loop()
+    topic, last_event_id = await loop.run_in_executor(executor, resolve_subscriber, build_environ(scope, io.BytesIO()))
+    if topic is None:
+        await send({"type": "http.response.start", "status": 401, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Unauthorized"})
+        return
+
+    messages = asyncio.Queue()
+    def deliver(message):
+        loop.call_soon_threadsafe(messages.put_nowait, message)
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        messages.put_nowait(None)
+
+    backlog = notification_bus.subscribe(topic, deliver, last_event_id)
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]})
+        first = [f"retry: {NOTIFY_RETRY_MS}\n\n"]
+        if backlog is None:
+            first.append(notification_bus.reset_frame())
+        first.extend(notification_bus.format(message) for message in backlog or ())
+        await send({"type": "http.response.body", "body": "".join(first).encode(), "more_body": True})
+        while True:
+            try:
+                message = await asyncio.wait_for(messages.get(), NOTIFY_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                frame = ": keep-alive\n\n"
+            else:
+                if message is None:
+                    return
+                frame = notification_bus.format(message)
+            await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+    finally:
+        notification_bus.unsubscribe(topic, deliver)
+        watcher.cancel()
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return  # websockets are not served
+    if scope["path"] == "/notifications" and scope["method"] == "GET":
+        await serve_notifications(scope, receive, send)
+        return
+
+    body = io.BytesIO()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        body.write(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body.seek(0)
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, run_wsgi, build_environ(scope, body), send, loop)
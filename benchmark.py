@@ -0,0 +1,1059 @@
+"""
+Benchmarks for the Community Connect app.
+
+Each benchmark builds a throwaway copy of the schema in a temporary directory,
+seeds it with synthetic rows and drives the routes through Flask's test client,
+so the real "Community Connect.db" file is never touched.
+
+Usage:
+    python benchmark.py [event_roles] [events_paging] [matching] [search] [nearby] [signup_burst] [render] [series] [lifecycle] [serving] [notifications] [routes] [compact] [replica]
+
+The serving and notifications benchmarks start real servers and need uvicorn installed.
+
+The routes benchmark drives every route against a generated database and writes a JSON
+report. It is configured through the environment:
+
+    BENCH_VOLUNTEERS   volunteers in the generated database, 1000 to 1000000 (default 10000)
+    BENCH_SEED         random seed, the same seed and size give the same rows (default 0)
+    BENCH_REQUESTS     requests timed per route (default 50)
+    BENCH_REPORT       where to write the report (default benchmark-report.json)
+    BENCH_BASELINE     an earlier report to print the change against
+"""
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from flask import render_template
+
+import app as community_connect
+
+# The scheduler thread would pass and archive the seeded events behind the benchmarks' backs
+community_connect.LIFECYCLE_INTERVAL_SECONDS = 0
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "initialisedb.sql")
+
+# HELPERS
+def create_database():
+    """Creates an empty database from initialisedb.sql and points the app at it."""
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    db = sqlite3.connect(path)
+    with open(SCHEMA_FILE) as f:
+        db.executescript(f.read())
+    db.commit()
+    db.close()
+    community_connect.DATABASE = path
+    return path
+
+class QueryCounter:
+    """Counts the statements the app runs by tracing every connection a request is handed, read-only or writer."""
+
+    def __init__(self):
+        self.count = 0
+        self.request_connection = community_connect.request_connection
+        community_connect.request_connection = self.traced_request_connection
+
+    def traced_request_connection(self, kind):
+        db = self.request_connection(kind)
+        db.set_trace_callback(self.trace)
+        return db
+
+    def trace(self, statement):
+        # Statements run by triggers and virtual tables are traced too, as "-- ..." comments
+        if not statement.startswith("--"):
+            self.count += 1
+
+counter = QueryCounter()
+
+def login(client, user_type, user_id):
+    with client.session_transaction() as sess:
+        sess["user_type"] = user_type
+        sess["user_id"] = user_id
+
+def timed(client, url, repeat=20):
+    """Returns the mean latency of a GET in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url)
+        response.get_data()
+    return (time.perf_counter() - start) / repeat * 1000
+
+#////////////////////////////////////////////////////////////////////SYNTHETIC DATA////////////////////////////////////////////////////////////////////
+
+# Skill popularity falls off like a Zipf distribution: the first few are common, the tail is rare
+SKILL_NAMES = [
+    "First Aid", "Cooking", "Teaching", "Event Setup", "Cleaning", "Driving", "Gardening", "Fundraising",
+    "Photography", "Social Media", "Translation", "Carpentry", "Counselling", "Bookkeeping", "Music",
+    "Coaching", "Graphic Design", "Animal Care", "Aged Care", "Childcare", "Web Development", "Sign Language",
+    "Plumbing", "Legal Advice", "Nursing",
+]
+FIRST_NAMES = ["Olivia", "Noah", "Charlotte", "Oliver", "Amelia", "Jack", "Isla", "William", "Mia", "Leo",
+               "Ava", "Henry", "Grace", "Lucas", "Chloe", "Thomas", "Zoe", "James", "Ruby", "Ethan"]
+LAST_NAMES = ["Smith", "Jones", "Williams", "Brown", "Wilson", "Taylor", "Nguyen", "Johnson", "Martin", "White",
+              "Anderson", "Walker", "Thompson", "Thomas", "Lee", "Ryan", "Robinson", "Kelly", "King", "Singh"]
+ROLE_NAMES = ["Helper", "Team Leader", "Greeter", "Driver", "Cook", "Setup Crew", "Pack Down", "Registration",
+              "Photographer", "First Aider", "Tutor", "Runner"]
+
+def generate_database(volunteers, seed=0):
+    """
+    Builds a database with `volunteers` volunteers and proportionate organisations (1 per
+    100), events (1 per 10), roles (1 to 5 an event) and signups (about 1 per volunteer),
+    and returns its path. The same size and seed give the same rows; event dates are
+    relative to today. Rows go into the bare schema with bulk inserts and the migrations
+    run afterwards, so search, coordinates and statistics are built in one pass each rather
+    than by a trigger per row. Databases are kept in the temp directory and reused.
+    """
+    from datetime import date, timedelta
+    path = os.path.join(tempfile.gettempdir(), f"community-connect-{volunteers}-{seed}.db")
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    building = path + ".building"
+    for leftover in (building, building + "-journal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    db = sqlite3.connect(building)
+    with open(SCHEMA_FILE) as f:
+        db.executescript(f.read())
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("BEGIN")
+
+    db.executemany("INSERT OR IGNORE INTO Skills (Name) VALUES (?)", ((name,) for name in SKILL_NAMES))
+    skill_ids = [db.execute("SELECT ID FROM Skills WHERE Name = ?", (name,)).fetchone()[0] for name in SKILL_NAMES]
+    skill_weights = [1 / (rank + 1) for rank in range(len(skill_ids))]
+    with open(os.path.join(os.path.dirname(SCHEMA_FILE), "gazetteer.csv"), newline="") as f:
+        places = [row["Name"] for row in csv.DictReader(f)]
+
+    organisation_count = max(10, volunteers // 100)
+    event_count = max(20, volunteers // 10)
+    db.executemany(
+        "INSERT INTO Organisations (Password, Name, Address, Description, Email, Verified) VALUES ('password', ?, ?, ?, ?, ?)",
+        ((f"Org {i}", f"{rng.randint(1, 300)} {rng.choice(LAST_NAMES)} Street", f"Community group number {i}",
+          f"org{i}@example.org", rng.random() < 0.8) for i in range(organisation_count))
+    )
+    organisation_ids = [row[0] for row in db.execute("SELECT ID FROM Organisations WHERE Email LIKE 'org%@example.org'")]
+
+    first_volunteer = db.execute("SELECT COALESCE(MAX(ID), 0) + 1 FROM Volunteers").fetchone()[0]
+    db.executemany(
+        """
+        INSERT INTO Volunteers (ID, Password, FirstName, LastName, Email, PhoneNumber, Location, BirthDate, Bio, TotalHoursContributed)
+        VALUES (?, 'password', ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        ((first_volunteer + i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"v{i}@example.com", f"9{i:09d}",
+          rng.choice(places), (date(1950, 1, 1) + timedelta(days=rng.randrange(21000))).isoformat(),
+          "Happy to help wherever I am needed", int(rng.expovariate(1 / 20))) for i in range(volunteers))
+    )
+    volunteer_skills = []
+    for i in range(volunteers):
+        count = rng.choices(range(5), weights=[15, 35, 30, 15, 5])[0]
+        volunteer_skills.append(sorted(set(rng.choices(skill_ids, weights=skill_weights, k=count))))
+    db.executemany(
+        "INSERT INTO VolunteerSkills (SkillID, VolunteerID) VALUES (?, ?)",
+        ((skill_id, first_volunteer + i) for i, skills in enumerate(volunteer_skills) for skill_id in skills)
+    )
+
+    # A few busy organisations run most of the events
+    today = date.today()
+    organisation_weights = [1 / (rank + 1) for rank in range(len(organisation_ids))]
+    event_dates = [today + timedelta(days=rng.randint(-365, 365)) for _ in range(event_count)]
+    db.executemany(
+        """
+        INSERT INTO Events (OrganisationID, Name, Date, Location, Description, StartTime, EndTime, Status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        ((organisation_id, f"Event {i}", day.isoformat(), rng.choice(places), f"Volunteers needed for event {i}",
+          f"{8 + i % 4:02d}:00", f"{13 + i % 5:02d}:00", "Passed" if day < today else "Upcoming")
+         for i, (organisation_id, day) in enumerate(zip(
+             rng.choices(organisation_ids, weights=organisation_weights, k=event_count), event_dates)))
+    )
+    event_ids = [row[0] for row in db.execute("SELECT ID FROM Events WHERE Name LIKE 'Event %' ORDER BY ID")]
+    roles = []
+    for event_id in event_ids:
+        for _ in range(rng.randint(1, 5)):
+            skill_id = None if rng.random() < 0.3 else rng.choices(skill_ids, weights=skill_weights)[0]
+            roles.append((event_id, skill_id, rng.choice(ROLE_NAMES), rng.randint(1, 20)))
+    db.executemany("INSERT INTO EventRoles (EventID, SkillID, Name, VolunteersNeeded) VALUES (?, ?, ?, ?)", roles)
+
+    # Volunteers mostly sign up for roles they have the skill for
+    roles_by_skill = {}
+    for role_id, skill_id in db.execute("SELECT ID, SkillID FROM EventRoles WHERE EventID >= ?", (event_ids[0],)):
+        roles_by_skill.setdefault(skill_id, []).append(role_id)
+    signups = []
+    for i, skills in enumerate(volunteer_skills):
+        chosen = set()
+        for _ in range(rng.choices(range(4), weights=[35, 40, 15, 10])[0]):
+            pool = roles_by_skill.get(rng.choice(skills + [None]) if rng.random() < 0.8 else None) or roles_by_skill[None]
+            chosen.add(rng.choice(pool))
+        signups.extend((first_volunteer + i, role_id, rng.choices(("Accepted", "Pending", "Rejected"), weights=[55, 35, 10])[0])
+                       for role_id in sorted(chosen))
+    db.executemany("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (?, ?, ?)", signups)
+    db.commit()
+
+    db.execute("PRAGMA journal_mode = DELETE")
+    community_connect.migrate(db)
+    db.execute("ANALYZE")
+    db.close()
+    os.rename(building, path)
+    print(f"Generated {volunteers} volunteers, {organisation_count} organisations, {event_count} events, "
+          f"{len(roles)} roles and {len(signups)} signups in {time.perf_counter() - start:.1f}s ({path})")
+    return path
+
+#////////////////////////////////////////////////////////////////////BENCHMARKS////////////////////////////////////////////////////////////////////
+
+def bench_event_roles():
+    """Per-event /get_event_roles calls versus one /get_event_roles_batch call."""
+    print(f"{'events':>8} {'roles':>6} | {'loop queries':>12} {'loop ms':>9} | {'batch queries':>13} {'batch ms':>9}")
+    for event_count, roles_per_event in [(10, 5), (50, 10), (200, 10), (500, 20)]:
+        path = create_database()
+        db = sqlite3.connect(path)
+        db.executemany(
+            "INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime) VALUES (1, ?, '2030-01-01', 'Sydney', '09:00', '17:00')",
+            [(f"Event {i}",) for i in range(event_count)]
+        )
+        event_ids = [r[0] for r in db.execute("SELECT ID FROM Events ORDER BY ID DESC LIMIT ?", (event_count,))]
+        db.executemany(
+            "INSERT INTO EventRoles (EventID, SkillID, Name) VALUES (?, ?, ?)",
+            [(e, (i % 5) + 1, f"Role {i}") for e in event_ids for i in range(roles_per_event)]
+        )
+        db.commit()
+        db.close()
+
+        client = community_connect.app.test_client()
+        login(client, "volunteer", 1)
+
+        counter.count = 0
+        start = time.perf_counter()
+        for event_id in event_ids:
+            client.get(f"/get_event_roles?event_id={event_id}").get_data()
+        loop_ms = (time.perf_counter() - start) * 1000
+        loop_queries = counter.count
+
+        url = "/get_event_roles_batch?event_ids=" + ",".join(map(str, event_ids))
+        counter.count = 0
+        client.get(url).get_data()
+        batch_queries = counter.count
+        batch_ms = timed(client, url)
+
+        print(f"{event_count:>8} {roles_per_event:>6} | {loop_queries:>12} {loop_ms:>9.2f} | {batch_queries:>13} {batch_ms:>9.2f}")
+
+def bench_events_paging():
+    """/get_events first and deep page latency as the Events table grows."""
+    print(f"{'events':>9} | {'first page ms':>13} {'deep page ms':>12} {'skill filter ms':>15}")
+    for event_count in [100, 10_000, 1_000_000]:
+        path = create_database()
+        db = sqlite3.connect(path)
+        db.executemany(
+            "INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime) VALUES (?, ?, date('2030-01-01', ?), 'Sydney', '09:00', '17:00')",
+            ((i % 50 + 1, f"Event {i}", f"+{i % 3650} days") for i in range(event_count))
+        )
+        db.execute("INSERT INTO EventRoles (EventID, SkillID, Name) SELECT ID, ID % 5 + 1, 'Helper' FROM Events")
+        db.commit()
+        db.close()
+
+        client = community_connect.app.test_client()
+        first = client.get("/get_events").get_json()
+        # Follow the cursor a few pages in, then time the page after that
+        cursor = first["next_cursor"]
+        for _ in range(2):
+            page = client.get(f"/get_events?cursor={cursor}").get_json()
+            if not page["next_cursor"]:
+                break
+            cursor = page["next_cursor"]
+        first_ms = timed(client, "/get_events")
+        deep_ms = timed(client, f"/get_events?cursor={cursor}")
+        skill_ms = timed(client, "/get_events?skill_id=3")
+        print(f"{event_count:>9} | {first_ms:>13.2f} {deep_ms:>12.2f} {skill_ms:>15.2f}")
+
+def bench_matching():
+    """SkillMatcher build and lookups at 100k volunteers and 10k roles, against the SQL joins."""
+    volunteer_count, role_count, skill_count = 100_000, 10_000, 40
+    path = create_database()
+    db = sqlite3.connect(path)
+    db.executemany("INSERT OR IGNORE INTO Skills (ID, Name) VALUES (?, ?)", ((i, f"Skill {i}") for i in range(1, skill_count + 1)))
+    db.executemany(
+        "INSERT INTO Volunteers (Password, FirstName, LastName, Email, PhoneNumber, Location, BirthDate) VALUES ('pw', 'Vol', ?, ?, ?, 'Sydney', '1990-01-01')",
+        ((str(i), f"v{i}@example.com", f"{i:010d}") for i in range(volunteer_count))
+    )
+    # Every volunteer gets three skills
+    db.execute(
+        """
+        INSERT OR IGNORE INTO VolunteerSkills (VolunteerID, SkillID)
+        SELECT v.ID, (v.ID * k.n) % ? + 1 FROM Volunteers v, (SELECT 1 AS n UNION SELECT 7 UNION SELECT 13) k
+        """,
+        (skill_count,)
+    )
+    db.execute("INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime) VALUES (1, 'Big Event', '2030-01-01', 'Sydney', '09:00', '17:00')")
+    event_id = db.execute("SELECT MAX(ID) FROM Events").fetchone()[0]
+    db.executemany(
+        "INSERT INTO EventRoles (EventID, SkillID, Name) VALUES (?, ?, ?)",
+        ((event_id, (i % (skill_count + 1)) or None, f"Role {i}") for i in range(role_count))
+    )
+    db.commit()
+    community_connect.migrate(db)
+
+    start = time.perf_counter()
+    matcher = community_connect.SkillMatcher()
+    matcher.load(db)
+    print(f"build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    volunteer_ids = [r[0] for r in db.execute("SELECT ID FROM Volunteers ORDER BY random() LIMIT 200")]
+    role_ids = [r[0] for r in db.execute("SELECT ID FROM EventRoles ORDER BY random() LIMIT 200")]
+
+    def per_call(fn, ids):
+        start = time.perf_counter()
+        for i in ids:
+            fn(i)
+        return (time.perf_counter() - start) / len(ids) * 1000
+
+    matcher_roles = per_call(lambda v: list(community_connect.bit_indexes(matcher.matching_roles(v))), volunteer_ids)
+    sql_roles = per_call(lambda v: db.execute(
+        """
+        SELECT er.ID FROM EventRoles er
+        WHERE er.SkillID IS NULL OR er.SkillID IN (SELECT SkillID FROM VolunteerSkills WHERE VolunteerID = ?)
+        """, (v,)).fetchall(), volunteer_ids)
+    matcher_volunteers = per_call(lambda r: list(community_connect.bit_indexes(matcher.qualified_volunteers(r))), role_ids)
+    sql_volunteers = per_call(lambda r: db.execute(
+        """
+        SELECT vs.VolunteerID FROM EventRoles er
+        JOIN VolunteerSkills vs ON vs.SkillID = er.SkillID
+        WHERE er.ID = ?
+        """, (r,)).fetchall(), role_ids)
+    print(f"{'lookup':>22} | {'matcher ms':>10} {'sql ms':>8}")
+    print(f"{'roles for volunteer':>22} | {matcher_roles:>10.3f} {sql_roles:>8.3f}")
+    print(f"{'volunteers for role':>22} | {matcher_volunteers:>10.3f} {sql_volunteers:>8.3f}")
+    db.close()
+
+# LOAD TEST: real servers driven over keep-alive sockets
+SEARCH_WORDS = ["tree", "planting", "kitchen", "beach", "cleanup", "tutoring", "food", "drive", "park", "garden",
+                "animal", "shelter", "library", "reading", "sports", "coaching", "charity", "market", "river", "restoration"]
+
+def bench_search():
+    """/search (FTS5 with bm25) against a LIKE '%term%' scan as the Events table grows."""
+    print(f"{'events':>9} | {'fts word ms':>11} {'fts prefix ms':>13} {'like ms':>9}")
+    for event_count in [10_000, 1_000_000]:
+        path = create_database()
+        db = sqlite3.connect(path)
+        db.executemany(
+            "INSERT INTO Events (OrganisationID, Name, Date, Location, Description, StartTime, EndTime) VALUES (?, ?, '2030-01-01', 'Sydney', ?, '09:00', '17:00')",
+            ((i % 50 + 1, f"{SEARCH_WORDS[i % 20].title()} {i}",
+              f"{SEARCH_WORDS[i % 7]} {SEARCH_WORDS[i % 13]} {SEARCH_WORDS[i % 17]} event number {i}") for i in range(event_count))
+        )
+        db.commit()
+        db.close()
+
+        client = community_connect.app.test_client()
+        # The first request runs the migration that builds the index
+        client.get("/search?q=warmup")
+        word_ms = timed(client, "/search?q=river restoration")
+        prefix_ms = timed(client, "/search?q=river resto")
+        db = sqlite3.connect(path)
+        start = time.perf_counter()
+        for _ in range(5):
+            db.execute(
+                "SELECT ID, Name FROM Events WHERE (Name LIKE ? OR Description LIKE ?) AND Description LIKE ? LIMIT 21",
+                ("%river%", "%river%", "%restoration%")
+            ).fetchall()
+        like_ms = (time.perf_counter() - start) / 5 * 1000
+        db.close()
+        print(f"{event_count:>9} | {word_ms:>11.2f} {prefix_ms:>13.2f} {like_ms:>9.2f}")
+
+# Metro areas the synthetic events are scattered around, (latitude, longitude)
+NEARBY_CENTRES = [(-31.95, 115.86), (-33.87, 151.21), (-37.81, 144.96), (-27.47, 153.03), (-34.93, 138.60)]
+
+def bench_nearby():
+    """/events/nearby (R*Tree) against computing the distance to every event, as the table grows."""
+    import random
+    random.seed(1)
+    print(f"{'events':>9} | {'nearby ms':>9} {'wide radius ms':>14} {'full scan ms':>12}")
+    for event_count in [10_000, 100_000, 1_000_000]:
+        path = create_database()
+        db = sqlite3.connect(path)
+        community_connect.migrate(db)
+
+        def events():
+            for i in range(event_count):
+                lat, lon = NEARBY_CENTRES[i % len(NEARBY_CENTRES)]
+                yield (i % 50 + 1, f"Event {i}", f"+{i % 365} days", lat + random.gauss(0, 0.3), lon + random.gauss(0, 0.3))
+        db.executemany(
+            "INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime, Latitude, Longitude) VALUES (?, ?, date('2030-01-01', ?), 'Somewhere', '09:00', '17:00', ?, ?)",
+            events()
+        )
+        db.commit()
+
+        client = community_connect.app.test_client()
+        nearby_ms = timed(client, "/events/nearby?lat=-31.95&lon=115.86&radius_km=25&limit=10")
+        wide_ms = timed(client, "/events/nearby?lat=-31.95&lon=115.86&radius_km=500&limit=50")
+        start = time.perf_counter()
+        for _ in range(5):
+            db.execute(
+                """
+                SELECT ID, (Latitude + 31.95) * (Latitude + 31.95) + (Longitude - 115.86) * (Longitude - 115.86) * 0.72 AS d2
+                FROM Events WHERE Status = 'Upcoming' AND d2 <= 0.05 ORDER BY d2 LIMIT 10
+                """
+            ).fetchall()
+        scan_ms = (time.perf_counter() - start) / 5 * 1000
+        db.close()
+        print(f"{event_count:>9} | {nearby_ms:>9.2f} {wide_ms:>14.2f} {scan_ms:>12.2f}")
+
+SERVERS = {
+    # Werkzeug's threaded server, what app.run() uses
+    "wsgi": [sys.executable, "-c", "import sys, app; app.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application", "--log-level", "warning", "--port"],
+}
+
+async def http_get(reader, writer, path):
+    """Sends one keep-alive GET and reads the response, returning (status code, connection kept open)."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin1").split("\r\n")
+    headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(lines[0].split()[1]), headers.get("connection", "").lower() != "close"
+
+async def load_client(port, path, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            # A server that does not keep connections alive pays for the reconnect in its latency
+            start = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            status, keep_alive = await http_get(reader, writer, path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            errors.append("reset")
+            writer = None
+    if writer is not None:
+        writer.close()
+
+async def load_run(port, path, clients, seconds):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(load_client(port, path, deadline, latencies, errors) for _ in range(clients)))
+    return latencies, errors
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+def bench_serving(seconds=5):
+    """Requests/s and p99 latency of WSGI (threaded Werkzeug) against ASGI (uvicorn + asgi.py)."""
+    path = create_database()
+    env = dict(os.environ, COMMUNITY_CONNECT_DB=path)
+    print(f"{'server':>6} {'clients':>7} | {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, command in SERVERS.items():
+        port = 8700 + len(name)
+        server = subprocess.Popen(command + [str(port)], env=env, cwd=os.path.dirname(SCHEMA_FILE),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(2)  # let the server bind
+            for clients in [10, 100, 1000]:
+                latencies, errors = asyncio.run(load_run(port, "/get_events?limit=20", clients, seconds))
+                print(f"{name:>6} {clients:>7} | {len(latencies) / seconds:>8.0f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+                      f"{percentile(latencies, 0.99) * 1000:>8.1f} {len(errors):>6}")
+        finally:
+            server.terminate()
+            server.wait()
+
+def bench_signup_burst(volunteer_count=3000, seats=100, threads=64):
+    """Thousands of simultaneous /register_for_role calls for one role: overbooking and latency."""
+    from concurrent.futures import ThreadPoolExecutor
+    path = create_database()
+    db = sqlite3.connect(path)
+    community_connect.migrate(db)
+    db.executemany(
+        "INSERT INTO Volunteers (Password, FirstName, LastName, Email, PhoneNumber, Location, BirthDate) VALUES ('pw', 'Burst', ?, ?, ?, 'Perth', '2000-01-01')",
+        ((f"V{i}", f"burst{i}@example.com", f"{i:010d}") for i in range(volunteer_count))
+    )
+    volunteer_ids = [row[0] for row in db.execute("SELECT ID FROM Volunteers WHERE FirstName = 'Burst'")]
+    role_id = db.execute("INSERT INTO EventRoles (EventID, Name, VolunteersNeeded) VALUES (1, 'Popular', ?)", (seats,)).lastrowid
+    db.commit()
+
+    def sign_up(volunteer_id):
+        client = community_connect.app.test_client()
+        login(client, "volunteer", volunteer_id)
+        start = time.perf_counter()
+        response = client.post("/register_for_role", data={"role_id": role_id})
+        return response.status_code, time.perf_counter() - start
+
+    # Build the skill matcher first so the burst measures signups, not its one-off load
+    with community_connect.app.app_context():
+        community_connect.get_matcher()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(sign_up, volunteer_ids))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for _, seconds in results]
+    codes = [code for code, _ in results]
+    seated = db.execute("SELECT COUNT(*) FROM Signups WHERE RoleID = ?", (role_id,)).fetchone()[0]
+    waiting = db.execute("SELECT COUNT(*) FROM Waitlist WHERE RoleID = ?", (role_id,)).fetchone()[0]
+    db.close()
+    print(f"{volunteer_count} signups on {threads} threads for {seats} seats in {elapsed:.1f}s")
+    print(f"seated {seated}, waitlisted {waiting}, overbooked {max(seated - seats, 0)}, "
+          f"errors {sum(code not in (200, 202) for code in codes)}")
+    print(f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+def bench_render():
+    """organisations.html and events.html with an empty fragment cache against a warm one, as the page grows."""
+    import tracemalloc
+    app = community_connect.app
+    print(f"{'rows':>6} | {'page':>13} | {'cold ms':>8} {'warm ms':>8} {'cold peak KB':>12} {'warm peak KB':>12}")
+    for row_count in [10, 1_000, 10_000]:
+        organisations = [
+            {"ID": i, "Name": f"Organisation {i}", "Description": f"Helping out around town since {1900 + i % 120}",
+             "Email": f"org{i}@example.com", "Version": 0, "event_count": i % 40}
+            for i in range(row_count)
+        ]
+        events = [
+            {"Id": i, "Name": f"Event {i}", "Description": f"Lending a hand at event number {i}",
+             "Date": "2030-01-01", "Version": 0}
+            for i in range(row_count)
+        ]
+        pages = {
+            "organisations": lambda: render_template("organisations.html", organisations=organisations,
+                                                     event_counts={org["ID"]: org["event_count"] for org in organisations}),
+            "events": lambda: render_template("events.html", events=events),
+        }
+        for page, render in pages.items():
+            with app.test_request_context("/"):
+                timings = []
+                for cache_state in ("cold", "warm"):
+                    if cache_state == "cold":
+                        community_connect.fragment_cache.entries.clear()
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    render()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    peak = tracemalloc.get_traced_memory()[1] / 1024
+                    tracemalloc.stop()
+                    timings.append((elapsed, peak))
+            (cold_ms, cold_kb), (warm_ms, warm_kb) = timings
+            print(f"{row_count:>6} | {page:>13} | {cold_ms:>8.2f} {warm_ms:>8.2f} {cold_kb:>12.0f} {warm_kb:>12.0f}")
+
+def bench_series(series_count=1_000, organisations=50):
+    """Creating weekly series (one multi-row insert each) and /get_occurrences windows inside and past the horizon."""
+    from datetime import date, timedelta
+    path = create_database()
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    community_connect.migrate(db)
+    db.executemany(
+        "INSERT INTO Organisations (Password, Name, Address, Email) VALUES ('pw', ?, 'Somewhere', ?)",
+        ((f"Series Org {i}", f"series{i}@example.com") for i in range(organisations))
+    )
+    organisation_ids = [row[0] for row in db.execute("SELECT ID FROM Organisations")]
+    db.commit()
+    today = date.today()
+    start = time.perf_counter()
+    for i in range(series_count):
+        fields = {"name": f"Weekly {i}", "date": (today + timedelta(days=i % 7)).isoformat(), "location": "Perth",
+                  "starttime": "10:00", "endtime": "14:00", "description": "A weekly shift"}
+        community_connect.create_series(db, organisation_ids[i % organisations], fields, "FREQ=WEEKLY")
+    create_ms = (time.perf_counter() - start) / series_count * 1000
+    stored = db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID IS NOT NULL").fetchone()[0]
+    db.close()
+    print(f"{series_count} weekly series created at {create_ms:.2f} ms each, {stored} occurrences stored "
+          f"(horizon {community_connect.SERIES_HORIZON_DAYS} days)")
+
+    client = community_connect.app.test_client()
+    print(f"{'window':>26} | {'ms':>7} {'events':>7}")
+    for label, offset in [("next 90 days (stored)", 0), ("six months, 2 years out", 730), ("six months, 20 years out", 7300)]:
+        date_from = today + timedelta(days=offset)
+        days = 90 if offset == 0 else 182
+        url = f"/get_occurrences?date_from={date_from}&date_to={date_from + timedelta(days=days)}&organisation_id={organisation_ids[0]}"
+        count = len(client.get(url).get_json()["events"])
+        print(f"{label:>26} | {timed(client, url):>7.2f} {count:>7}")
+
+def bench_lifecycle(years=3, events_per_day=100):
+    """Passing and archiving years of past events in batches: write-lock hold time and hot table sizes."""
+    from datetime import date, timedelta
+    path = create_database()
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")  # so the app's pool can open connections while this one stays open
+    community_connect.migrate(db)
+    today = date.today()
+    days = years * 365
+    db.executemany(
+        "INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime) VALUES (?, ?, ?, 'Perth', '09:00', '13:00')",
+        ((i % 2 + 1, f"Event {i}", (today - timedelta(days=days - i // events_per_day)).isoformat())
+         for i in range((days + 30) * events_per_day))
+    )
+    db.execute("INSERT INTO EventRoles (EventID, Name, VolunteersNeeded) SELECT ID, 'Helper', 5 FROM Events")
+    db.execute(
+        """
+        INSERT OR IGNORE INTO Signups (VolunteerID, RoleID, Status)
+        SELECT v.ID, er.ID, CASE WHEN (er.ID + v.ID) % 3 = 0 THEN 'Pending' ELSE 'Accepted' END
+        FROM EventRoles er, Volunteers v
+        """
+    )
+    db.commit()
+
+    def sizes():
+        return [db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("Events", "EventRoles", "Signups")]
+
+    client = community_connect.app.test_client()
+    before = sizes()
+    page_before = timed(client, "/get_events?status=all")
+    print(f"{before[0]} events ({events_per_day} a day for {years} years and the next 30 days), "
+          f"{before[1]} roles, {before[2]} signups")
+
+    db.row_factory = sqlite3.Row
+    for label, step, cutoff in (("pass", community_connect.pass_events, today),
+                                ("archive", community_connect.archive_events,
+                                 today - timedelta(days=community_connect.ARCHIVE_AFTER_DAYS))):
+        holds = []
+        total = 0
+        while True:
+            start = time.perf_counter()
+            db.execute("BEGIN IMMEDIATE")
+            event_ids = step(db, cutoff)
+            db.commit()
+            holds.append(time.perf_counter() - start)
+            total += len(event_ids)
+            if len(event_ids) < community_connect.LIFECYCLE_BATCH_SIZE:
+                break
+        print(f"{label:>8}: {total} events in {len(holds)} batches, {sum(holds):.1f}s, "
+              f"write lock held p50 {percentile(holds, 0.5) * 1000:.0f} ms, max {max(holds) * 1000:.0f} ms")
+    after = sizes()
+    page_after = timed(client, "/get_events?status=all")
+    hours = db.execute("SELECT SUM(TotalHoursContributed) FROM Volunteers").fetchone()[0]
+    print(f"hot tables: {after[0]} events, {after[1]} roles, {after[2]} signups; {hours:.0f} volunteer hours credited")
+    print(f"/get_events?status=all first page {page_before:.2f} ms -> {page_after:.2f} ms")
+    db.close()
+
+def process_status(pid):
+    """VmRSS in KB and the thread count of a running process, from /proc."""
+    with open(f"/proc/{pid}/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return int(fields["VmRSS"].split()[0]), int(fields["Threads"])
+
+def bench_notifications(subscriber_count=10_000, publishes=100):
+    """Thousands of idle /notifications streams on one ASGI process: memory, threads and delivery latency."""
+    path = create_database()
+    db = sqlite3.connect(path)
+    community_connect.migrate(db)
+    db.executemany(
+        "INSERT INTO Volunteers (Password, FirstName, LastName, Email, PhoneNumber, Location, BirthDate) VALUES ('pw', 'Idle', ?, ?, ?, 'Perth', '2000-01-01')",
+        ((f"V{i}", f"idle{i}@example.com", f"{i:010d}") for i in range(subscriber_count))
+    )
+    volunteer_ids = [row[0] for row in db.execute("SELECT ID FROM Volunteers WHERE FirstName = 'Idle'")]
+    role_id = db.execute("INSERT INTO EventRoles (EventID, Name) VALUES (1, 'Open')").lastrowid
+
+    # Log everyone in by writing their sessions directly
+    def session_token(user_type, user_id):
+        token = f"{user_type}-{user_id}"
+        now = time.time()
+        db.execute(
+            "INSERT INTO Sessions (ID, UserType, UserID, Data, CreatedAt, LastSeen) VALUES (?, ?, ?, ?, ?, ?)",
+            (hashlib.sha256(token.encode()).hexdigest(), user_type, user_id,
+             json.dumps({"user_type": user_type, "user_id": user_id}), now, now)
+        )
+        return token
+    volunteer_tokens = [session_token("volunteer", volunteer_id) for volunteer_id in volunteer_ids]
+    organisation_token = session_token("organisation", 1)
+    db.commit()
+    db.close()
+
+    port = 8790
+    server = subprocess.Popen(SERVERS["asgi"] + [str(port), "--limit-concurrency", str(subscriber_count * 2)],
+                              env=dict(os.environ, COMMUNITY_CONNECT_DB=path), cwd=os.path.dirname(SCHEMA_FILE),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def open_stream(token):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /notifications HTTP/1.1\r\nHost: localhost\r\nCookie: session={token}\r\n\r\n".encode())
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200"), head
+        await reader.readuntil(b"retry: ")
+        return reader, writer
+
+    async def sign_up(token):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = f"role_id={role_id}"
+        writer.write(f"POST /register_for_role HTTP/1.1\r\nHost: localhost\r\nCookie: session={token}\r\n"
+                     f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n{body}".encode())
+        await reader.read()
+        writer.close()
+
+    async def run():
+        rss_before, threads_before = process_status(server.pid)
+        start = time.perf_counter()
+        streams = []
+        for i in range(0, subscriber_count, 500):
+            streams += await asyncio.gather(*(open_stream(token) for token in volunteer_tokens[i:i + 500]))
+        connect_seconds = time.perf_counter() - start
+        await asyncio.sleep(1)
+        rss_after, threads_after = process_status(server.pid)
+
+        # The organisation hears about each signup while every volunteer stream sits idle
+        org_reader, org_writer = await open_stream(organisation_token)
+        latencies = []
+        for token in volunteer_tokens[:publishes]:
+            start = time.perf_counter()
+            await asyncio.gather(sign_up(token), org_reader.readuntil(b"event: signup\n"))
+            latencies.append(time.perf_counter() - start)
+
+        for _, writer in streams + [(org_reader, org_writer)]:
+            writer.close()
+        return connect_seconds, rss_before, rss_after, threads_before, threads_after, latencies
+
+    try:
+        time.sleep(2)  # let the server bind
+        connect_seconds, rss_before, rss_after, threads_before, threads_after, latencies = asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{subscriber_count} streams opened in {connect_seconds:.1f}s")
+    print(f"server RSS {rss_before / 1024:.0f} MB -> {rss_after / 1024:.0f} MB "
+          f"({(rss_after - rss_before) / subscriber_count:.1f} KB per stream), threads {threads_before} -> {threads_after}")
+    print(f"signup to notification: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+def bench_routes():
+    """Every route against a generated database: p50/p95/p99 latency, queries per request and RSS, saved as a JSON report."""
+    from datetime import date, timedelta
+    volunteers = int(os.environ.get("BENCH_VOLUNTEERS", 10_000))
+    seed = int(os.environ.get("BENCH_SEED", 0))
+    request_count = int(os.environ.get("BENCH_REQUESTS", 50))
+    report_path = os.environ.get("BENCH_REPORT", "benchmark-report.json")
+    baseline_path = os.environ.get("BENCH_BASELINE")
+
+    # Requests write to the database, so they run against a copy of the generated one
+    source = sqlite3.connect(generate_database(volunteers, seed))
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    db = sqlite3.connect(path)
+    source.backup(db)
+    source.close()
+    community_connect.DATABASE = path
+    db.row_factory = sqlite3.Row
+    dataset = {"volunteers": volunteers, "seed": seed}
+    for table in ("Organisations", "Volunteers", "VolunteerSkills", "Events", "EventRoles", "Signups"):
+        dataset[table] = db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    # The busiest organisation, its fullest upcoming event and the volunteer with the most signups
+    today = date.today()
+    organisation_id = db.execute(
+        "SELECT OrganisationID FROM Events GROUP BY OrganisationID ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    event_id = db.execute(
+        """
+        SELECT e.ID FROM Events e JOIN EventRoles er ON er.EventID = e.ID
+        WHERE e.OrganisationID = ? AND e.Status = 'Upcoming'
+        GROUP BY e.ID ORDER BY COUNT(*) DESC, e.ID LIMIT 1
+        """,
+        (organisation_id,)
+    ).fetchone()[0]
+    role_ids = [row[0] for row in db.execute(
+        "SELECT er.ID FROM EventRoles er JOIN Events e ON e.ID = er.EventID WHERE e.OrganisationID = ? ORDER BY er.ID",
+        (organisation_id,))]
+    volunteer_id = db.execute(
+        "SELECT VolunteerID FROM Signups GROUP BY VolunteerID ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    upcoming_ids = [row[0] for row in db.execute("SELECT ID FROM Events WHERE Status = 'Upcoming' ORDER BY Date, ID LIMIT 20")]
+    open_role_ids = [row[0] for row in db.execute(
+        "SELECT er.ID FROM EventRoles er JOIN Events e ON e.ID = er.EventID WHERE er.SkillID IS NULL AND e.Status = 'Upcoming'")]
+    pending_ids = [row[0] for row in db.execute(
+        """
+        SELECT s.ID FROM Signups s JOIN EventRoles er ON er.ID = s.RoleID JOIN Events e ON e.ID = er.EventID
+        WHERE e.OrganisationID = ? AND s.Status = 'Pending' ORDER BY s.ID
+        """,
+        (organisation_id,))] or [0]
+    volunteer_ids = [row[0] for row in db.execute("SELECT ID FROM Volunteers ORDER BY ID")]
+    signed_up_ids = [row[0] for row in db.execute(
+        "SELECT DISTINCT s.VolunteerID FROM Signups s JOIN RoleStats rs ON rs.RoleID = s.RoleID WHERE rs.OrganisationID = ? LIMIT 100",
+        (organisation_id,))]
+    db.close()
+    rng = random.Random(seed)
+
+    deep_cursor = None
+    client = community_connect.app.test_client()
+    for _ in range(5):
+        page = client.get("/get_events" + (f"?cursor={deep_cursor}" if deep_cursor else "")).get_json()
+        deep_cursor = page["next_cursor"] or deep_cursor
+        if not page["next_cursor"]:
+            break
+
+    # name: (who is logged in, method, request for the i-th call as (url, keyword arguments for client.open))
+    window = f"date_from={today}&date_to={today + timedelta(days=90)}"
+    routes = {
+        "GET /": (None, "GET", lambda i: ("/", {})),
+        "GET /organisations": (None, "GET", lambda i: ("/organisations", {})),
+        "GET /events": (None, "GET", lambda i: ("/events", {})),
+        "GET /get_events": (None, "GET", lambda i: ("/get_events", {})),
+        "GET /get_events deep page": (None, "GET", lambda i: (f"/get_events?cursor={deep_cursor}", {})),
+        "GET /get_events by skill": (None, "GET", lambda i: ("/get_events?skill_id=1", {})),
+        "GET /events/nearby": (None, "GET", lambda i: ("/events/nearby?location=Sydney", {})),
+        "GET /get_occurrences": (None, "GET", lambda i: (f"/get_occurrences?{window}", {})),
+        "GET /search": (None, "GET", lambda i: ("/search?q=event", {})),
+        "GET /get_skills": (None, "GET", lambda i: ("/get_skills", {})),
+        "GET /volunteer/<id>": (None, "GET", lambda i: (f"/volunteer/{volunteer_ids[i % len(volunteer_ids)]}", {})),
+        "GET /login": (None, "GET", lambda i: ("/login", {})),
+        "POST /login": (None, "POST", lambda i: ("/login", {"data": {
+            "email": f"v{i}@example.com", "password": "password"}})),
+        "GET /view_signups (volunteer)": ("volunteer", "GET", lambda i: ("/view_signups", {})),
+        "GET /get_event_roles": ("volunteer", "GET", lambda i: (f"/get_event_roles?event_id={event_id}", {})),
+        "GET /get_event_roles_batch": ("volunteer", "GET", lambda i: (
+            "/get_event_roles_batch?event_ids=" + ",".join(map(str, upcoming_ids)), {})),
+        "GET /get_matching_roles": ("volunteer", "GET", lambda i: ("/get_matching_roles", {})),
+        "GET /volunteer_stats": ("volunteer", "GET", lambda i: ("/volunteer_stats", {})),
+        "GET /edit_profile (volunteer)": ("volunteer", "GET", lambda i: ("/edit_profile", {})),
+        "POST /register_for_role": ("volunteers", "POST", lambda i: (
+            "/register_for_role", {"data": {"role_id": rng.choice(open_role_ids)}})),
+        "GET /view_signups (organisation)": ("organisation", "GET", lambda i: ("/view_signups", {})),
+        "GET /get_org_event_roles": ("organisation", "GET", lambda i: (f"/get_org_event_roles?event_id={event_id}", {})),
+        "GET /get_qualified_volunteers": ("organisation", "GET", lambda i: (
+            f"/get_qualified_volunteers?role_id={role_ids[i % len(role_ids)]}", {})),
+        "GET /organisation_stats": ("organisation", "GET", lambda i: ("/organisation_stats", {})),
+        "GET /signup_dashboard": ("organisation", "GET", lambda i: ("/signup_dashboard", {})),
+        "GET /get_volunteer_profiles": ("organisation", "GET", lambda i: (
+            "/get_volunteer_profiles?ids=" + ",".join(map(str, signed_up_ids)), {})),
+        "GET /get_role_signups": ("organisation", "GET", lambda i: (
+            f"/get_role_signups?role_id={role_ids[i % len(role_ids)]}", {})),
+        "POST /update_signup_status": ("organisation", "POST", lambda i: ("/update_signup_status", {"json": {
+            "signup_id": pending_ids[i % len(pending_ids)], "status": ("Accepted", "Rejected")[i % 2]}})),
+        "POST /update_signup_statuses": ("organisation", "POST", lambda i: ("/update_signup_statuses", {"json": {
+            "updates": [{"signup_id": signup_id, "status": "Rejected"} for signup_id in pending_ids[i * 10:i * 10 + 10]]}})),
+        "POST /add_event": ("organisation", "POST", lambda i: ("/add_event", {"data": {
+            "name": f"Added {i}", "date": (today + timedelta(days=30)).isoformat(), "location": "Perth",
+            "starttime": "09:00", "endtime": "12:00", "description": "Added by the benchmark"}})),
+        "POST /add_event_role": ("organisation", "POST", lambda i: ("/add_event_role", {"data": {
+            "event_id": event_id, "role_name": f"Extra {i}", "role_description": "Added by the benchmark"}})),
+        "POST /edit_event": ("organisation", "POST", lambda i: ("/edit_event", {"data": {
+            "event_id": event_id, "description": f"Edited {i}"}})),
+    }
+
+    results = {}
+    print(f"{'route':>34} | {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'errors':>6} {'RSS MB':>7}")
+    for name, (user, method, make_request) in routes.items():
+        client = community_connect.app.test_client()
+        if user in ("volunteer", "organisation"):
+            login(client, user, volunteer_id if user == "volunteer" else organisation_id)
+        latencies = []
+        errors = 0
+        queries = 0
+        for i in range(request_count):
+            if user == "volunteers":
+                login(client, "volunteer", rng.choice(volunteer_ids))
+            url, kwargs = make_request(i)
+            counter.count = 0
+            start = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries += counter.count
+            errors += response.status_code >= 500
+        rss_kb = process_status(os.getpid())[0]
+        results[name] = {
+            "requests": request_count,
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "queries_per_request": round(queries / request_count, 2),
+            "rss_kb": rss_kb,
+        }
+        print(f"{name:>34} | {results[name]['p50_ms']:>8.2f} {results[name]['p95_ms']:>8.2f} {results[name]['p99_ms']:>8.2f} "
+              f"{results[name]['queries_per_request']:>7.1f} {errors:>6} {rss_kb / 1024:>7.0f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "dataset": dataset,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "routes": results,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Peak RSS {report['peak_rss_kb'] / 1024:.0f} MB, report written to {report_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"Against {baseline_path} ({baseline['dataset']['volunteers']} volunteers, created {baseline['created']}):")
+        print(f"{'route':>34} | {'p50 change':>10} {'p99 change':>10} {'queries':>9}")
+        for name, result in results.items():
+            before = baseline["routes"].get(name)
+            if before is None:
+                continue
+            p50 = (result["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else float("nan")
+            p99 = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else float("nan")
+            print(f"{name:>34} | {p50:>+9.0f}% {p99:>+9.0f}% "
+                  f"{result['queries_per_request'] - before['queries_per_request']:>+9.1f}")
+
+def bench_compact(batch=200):
+    """Deleting events one request at a time against one /delete_events batch, then compacting a database full of orphans."""
+    volunteers = int(os.environ.get("BENCH_VOLUNTEERS", 10_000))
+    source = sqlite3.connect(generate_database(volunteers))
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    db = sqlite3.connect(path)
+    source.backup(db)
+    source.close()
+    community_connect.DATABASE = path
+    # Generated organisations run about ten events each, so two of them take over `batch` apiece
+    organisations = (1, 2)
+    db.execute("UPDATE Events SET OrganisationID = ID % 2 + 1 WHERE ID IN (SELECT ID FROM Events ORDER BY ID LIMIT ?)",
+               (batch * 2,))
+    community_connect.rebuild_stats(db)
+    db.commit()
+    db.close()
+
+    client = community_connect.app.test_client()
+    db = community_connect.connect_database()
+    for label, organisation_id, bulk in (("one by one", organisations[0], False), ("one batch", organisations[1], True)):
+        event_ids = [row[0] for row in db.execute(
+            "SELECT ID FROM Events WHERE OrganisationID = ? ORDER BY ID LIMIT ?", (organisation_id, batch))]
+        login(client, "organisation", organisation_id)
+        start = time.perf_counter()
+        if bulk:
+            deleted = len(client.post("/delete_events", json={"event_ids": event_ids}).get_json()["deleted"])
+        else:
+            for event_id in event_ids:
+                client.post("/events", data={"event_id": event_id})
+            deleted = batch - db.execute(
+                "SELECT COUNT(*) FROM Events WHERE ID IN (SELECT value FROM json_each(?))", (json.dumps(event_ids),)).fetchone()[0]
+        print(f"{label:>10}: {deleted} events deleted in {(time.perf_counter() - start) * 1000:.0f} ms")
+    db.execute("BEGIN")
+    print(f"summary rows out of date after deleting: {community_connect.rebuild_stats(db)}")
+    db.rollback()
+    db.close()
+
+    # What years without foreign keys leave behind: a tenth of the volunteers and organisations
+    # deleted with nothing following them
+    raw = sqlite3.connect(path)
+    raw.execute("DELETE FROM Volunteers WHERE ID % 10 = 0")
+    raw.execute("DELETE FROM Organisations WHERE ID % 10 = 0")
+    raw.commit()
+    raw.close()
+    join = "SELECT COUNT(*) FROM Signups s JOIN EventRoles er ON er.ID = s.RoleID JOIN Events e ON e.ID = er.EventID"
+    db = community_connect.connect_database()
+    db.execute(join).fetchone()  # warm the page cache, so both timings read from memory
+    start = time.perf_counter()
+    db.execute(join).fetchone()
+    join_before = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    report = community_connect.compact_database(db)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    db.execute(join).fetchone()
+    join_after = (time.perf_counter() - start) * 1000
+    db.close()
+    before, after = report["before"], report["after"]
+    print(f"orphans purged: {report['orphans']}")
+    print(f"compact: {elapsed:.1f}s, {report['stats_drift']} summary rows corrected, "
+          f"{report['foreign_key_violations']} foreign key violations left")
+    print(f"file: {before['page_count'] * before['page_size'] / 2**20:.1f} MB ({before['freelist_count']} free pages) -> "
+          f"{after['page_count'] * after['page_size'] / 2**20:.1f} MB ({after['freelist_count']} free pages), "
+          f"{before['page_count'] - after['page_count']} pages reclaimed")
+    print(f"signups joined to their events: {join_before:.1f} ms -> {join_after:.1f} ms")
+
+READ_URLS = ["/get_events", "/events", "/get_skills", "/organisations", "/search?q=garden"]
+
+def replica_client(replica, role, organisation_id, deadline, results):
+    """One benchmark process: reads READ_URLS in turn, or adds events as an organisation, until the deadline."""
+    community_connect.READ_REPLICA = replica
+    client = community_connect.app.test_client()
+    latencies = []
+    i = 0
+    if role == "writer":
+        login(client, "organisation", organisation_id)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if role == "writer":
+            client.post("/add_event", data={"name": f"Replica {i}", "date": "2031-01-01", "location": "Perth",
+                                            "starttime": "09:00", "endtime": "12:00"}).get_data()
+        else:
+            client.get(READ_URLS[i % len(READ_URLS)]).get_data()
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    results.put((role, latencies))
+
+def bench_replica(seconds=3):
+    """Read requests/s across processes beside a busy writer: read-only connections to the database file against a snapshot replica."""
+    import multiprocessing
+    volunteers = int(os.environ.get("BENCH_VOLUNTEERS", 10_000))
+    source = sqlite3.connect(generate_database(volunteers))
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark.db")
+    db = sqlite3.connect(path)
+    source.backup(db)
+    source.close()
+    organisation_id = db.execute("SELECT MIN(ID) FROM Organisations").fetchone()[0]
+    db.execute("PRAGMA journal_mode = WAL")
+    db.close()
+    community_connect.DATABASE = path
+    replica = os.path.join(directory, "replica.db")
+    community_connect.READ_REPLICA = replica
+    community_connect.refresh_replica()
+    community_connect.READ_REPLICA = None
+
+    context = multiprocessing.get_context("fork")
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'reads from':>10} {'readers':>7} | {'reads/s':>8} {'p99 ms':>8} | {'writes/s':>8} {'p99 ms':>8}")
+    for label, target in (("database", None), ("replica", replica)):
+        for readers in (1, 2, 4):
+            results = context.Queue()
+            deadline = time.perf_counter() + seconds
+            roles = ["writer"] + ["reader"] * readers
+            processes = [context.Process(target=replica_client, args=(target, role, organisation_id, deadline, results))
+                         for role in roles]
+            for process in processes:
+                process.start()
+            latencies = {"reader": [], "writer": []}
+            for _ in processes:
+                role, values = results.get()
+                latencies[role].extend(values)
+            for process in processes:
+                process.join()
+            reads, writes = latencies["reader"], latencies["writer"]
+            print(f"{label:>10} {readers:>7} | {len(reads) / seconds:>8.0f} {percentile(reads, 0.99) * 1000:>8.1f} | "
+                  f"{len(writes) / seconds:>8.0f} {percentile(writes, 0.99) * 1000:>8.1f}")
+
+BENCHMARKS = {
+    "event_roles": bench_event_roles,
+    "events_paging": bench_events_paging,
+    "matching": bench_matching,
+    "search": bench_search,
+    "nearby": bench_nearby,
+    "signup_burst": bench_signup_burst,
+    "render": bench_render,
+    "series": bench_series,
+    "lifecycle": bench_lifecycle,
+    "serving": bench_serving,
+    "notifications": bench_notifications,
+    "routes": bench_routes,
+    "compact": bench_compact,
+    "replica": bench_replica,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -1,3 +1,6 @@
+-- Indexes and later schema changes live in the MIGRATIONS list in app.py, which runs
+-- automatically the first time the app connects (or with: flask --app app migrate).
+
 -- Organisations Table
 CREATE TABLE IF NOT EXISTS Organisations (
     ID INTEGER PRIMARY KEY,
@@ -0,0 +1,706 @@
+"""
+Behaviour tests for app.py. Each test runs against its own migrated copy of the sample
+database: python -m pytest -q
+"""
+import json
+import shutil
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+import flask
+import pytest
+
+import app as A
+
+SAMPLE_DATABASE = Path(__file__).with_name("Community Connect.db")
+ORGANISATION = ("Paranthropus@Robustus", "test")  # organisation 4
+ORGANISATION_ID = 4
+
+
+def copy_sample(tmp_path):
+    path = tmp_path / "test.db"
+    shutil.copy(SAMPLE_DATABASE, path)
+    return path
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = copy_sample(tmp_path)
+    monkeypatch.setattr(A, "DATABASE", str(path))
+    monkeypatch.setattr(A, "LIFECYCLE_INTERVAL_SECONDS", 0)  # tests call run_lifecycle themselves
+    # Cached lists and fragments are keyed on IDs and versions that every copy shares
+    monkeypatch.setattr(A, "_cache", None)
+    monkeypatch.setattr(A, "fragment_cache", A.MemoryCache(A.FRAGMENT_CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(A, "profile_cache", A.MemoryCache(A.PROFILE_CACHE_MAX_ENTRIES))
+    db = A.connect_database()
+    db.row_factory = sqlite3.Row
+    A.migrate(db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def client(db):
+    A.app.config["TESTING"] = True
+    return A.app.test_client()
+
+
+@pytest.fixture
+def organisation(db):
+    client = A.app.test_client()
+    response = login(client, *ORGANISATION)
+    assert response.headers["Location"] == "/"
+    return client
+
+
+def login(client, email, password):
+    return client.post("/login", data={"email": email, "password": password})
+
+
+def add_event(db, days_ahead=30, name="Test event"):
+    event_id = db.execute(
+        """
+        INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime)
+        VALUES (?, ?, ?, 'Sydney', '09:00', '12:00')
+        """,
+        (ORGANISATION_ID, name, (date.today() + timedelta(days=days_ahead)).isoformat())
+    ).lastrowid
+    db.commit()
+    return event_id
+
+
+def add_role(db, event_id, volunteers_needed):
+    role_id = db.execute(
+        "INSERT INTO EventRoles (EventID, Name, VolunteersNeeded) VALUES (?, 'Helper', ?)",
+        (event_id, volunteers_needed)
+    ).lastrowid
+    db.commit()
+    return role_id
+
+
+def volunteer_ids(db, n):
+    return [row[0] for row in db.execute("SELECT ID FROM Volunteers ORDER BY ID LIMIT ?", (n,))]
+
+
+def signup(db, volunteer_id, role_id):
+    return db.execute("SELECT ID, Status FROM Signups WHERE VolunteerID = ? AND RoleID = ?", (volunteer_id, role_id)).fetchone()
+
+
+def seats_held(db, role_id):
+    return db.execute("SELECT PendingCount + AcceptedCount FROM RoleStats WHERE RoleID = ?", (role_id,)).fetchone()[0]
+
+
+def drift(db):
+    """How many summary rows differ from a full recount, leaving the tables as they were."""
+    db.execute("BEGIN")
+    try:
+        return A.rebuild_stats(db)
+    finally:
+        db.rollback()
+
+
+def schema(db):
+    return db.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+#////////////////////////////////////////////////////////////////////MIGRATIONS////////////////////////////////////////////////////////////////////
+
+def test_migrating_twice_changes_nothing(db):
+    before = schema(db)
+    assert A.migrate(db) == []
+    assert schema(db) == before
+    assert db.execute("PRAGMA user_version").fetchone()[0] == A.MIGRATIONS[-1][0]
+
+
+def test_concurrent_migrations_apply_each_version_once(tmp_path):
+    path = copy_sample(tmp_path)
+    start = threading.Barrier(2)
+    applied, errors = [], []
+
+    def run():
+        db = sqlite3.connect(path, timeout=30)
+        try:
+            start.wait()
+            applied.extend(A.migrate(db))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(applied) == [version for version, _, _ in A.MIGRATIONS]
+    assert not A.needs_migration(str(path))
+
+
+def test_migrate_records_the_connections_own_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "DATABASE", str(tmp_path / "elsewhere.db"))
+    path = copy_sample(tmp_path)
+    db = sqlite3.connect(path)
+    A.migrate(db)
+    db.close()
+    assert not A.needs_migration(str(path))
+    assert A.needs_migration(A.DATABASE)
+
+#////////////////////////////////////////////////////////////////////SKILL MATCHING////////////////////////////////////////////////////////////////////
+
+CHARLIE = 3  # charlie@gmail.com, who has no First Aid
+
+
+def test_role_without_a_skill_is_open_to_everyone(client):
+    login(client, "charlie@gmail.com", "pass3")
+    # Role 14's SkillID is '' rather than NULL
+    assert client.post("/register_for_role", data={"role_id": 14}).status_code == 200
+
+
+def test_role_requiring_a_skill_refuses_volunteers_without_it(client):
+    login(client, "charlie@gmail.com", "pass3")
+    response = client.post("/register_for_role", data={"role_id": 15})
+    assert response.status_code == 400
+
+
+def test_skill_added_outside_the_process_is_honoured(client, db):
+    login(client, "charlie@gmail.com", "pass3")
+    assert client.post("/register_for_role", data={"role_id": 15}).status_code == 400
+    db.execute("INSERT INTO VolunteerSkills (VolunteerID, SkillID) VALUES (?, 1)", (CHARLIE,))
+    db.commit()
+    assert client.post("/register_for_role", data={"role_id": 15}).status_code == 200
+
+
+def test_missing_role_is_not_found(client):
+    login(client, "charlie@gmail.com", "pass3")
+    assert client.post("/register_for_role", data={"role_id": 9999}).status_code == 404
+
+#////////////////////////////////////////////////////////////////////BULK IMPORT////////////////////////////////////////////////////////////////////
+
+def test_import_reaches_a_running_servers_matcher(client, tmp_path):
+    login(client, *ORGANISATION)
+    before = client.get("/get_qualified_volunteers", query_string={"role_id": 15}).get_json()
+    path = tmp_path / "volunteers.jsonl"
+    volunteer = {
+        "Email": "dana@example.com", "Password": "x", "FirstName": "Dana", "LastName": "Imported",
+        "PhoneNumber": "0400000000", "Location": "Perth", "BirthDate": "1990-01-01", "Skills": "First Aid",
+    }
+    path.write_text(json.dumps(volunteer) + "\n")
+    result = A.app.test_cli_runner().invoke(args=["import-data", "volunteers", str(path)])
+    assert "Imported 1 volunteers (0 skipped)" in result.output
+    after = client.get("/get_qualified_volunteers", query_string={"role_id": 15}).get_json()
+    assert [v["name"] for v in after if v not in before] == ["Dana Imported"]
+
+#////////////////////////////////////////////////////////////////////SUMMARY TABLES////////////////////////////////////////////////////////////////////
+
+def role_stats(db, role_id):
+    return db.execute(
+        "SELECT SignupCount, PendingCount, AcceptedCount, RejectedCount FROM RoleStats WHERE RoleID = ?", (role_id,)
+    ).fetchone()
+
+
+def test_stats_follow_signups_and_match_a_recount(db, client, organisation):
+    role_id = add_role(db, add_event(db), 3)
+    login(client, "charlie@gmail.com", "pass3")
+    assert client.post("/register_for_role", data={"role_id": role_id}).status_code == 200
+    db.executemany("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (?, ?, 'Pending')", [(1, role_id), (2, role_id)])
+    db.commit()
+    signup_id = db.execute("SELECT ID FROM Signups WHERE VolunteerID = 1 AND RoleID = ?", (role_id,)).fetchone()[0]
+    response = organisation.post("/update_signup_status", json={"signup_id": signup_id, "status": "Accepted"})
+    assert response.status_code == 200
+
+    assert tuple(role_stats(db, role_id)) == (3, 2, 1, 0)
+    assert drift(db) == 0
+
+
+def test_deleting_an_event_removes_its_counts(db):
+    event_id = add_event(db)
+    role_id = add_role(db, event_id, 2)
+    db.execute("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (1, ?, 'Accepted')", (role_id,))
+    db.commit()
+    db.execute("DELETE FROM Events WHERE ID = ?", (event_id,))
+    db.commit()
+    assert role_stats(db, role_id) is None
+    assert drift(db) == 0
+
+
+def test_passing_an_event_credits_accepted_volunteers_hours(db):
+    event_id = add_event(db, days_ahead=-1)
+    role_id = add_role(db, event_id, 2)
+    db.execute("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (1, ?, 'Accepted')", (role_id,))
+    db.commit()
+    hours = db.execute("SELECT TotalHoursContributed FROM Volunteers WHERE ID = 1").fetchone()[0] or 0
+    db.execute("UPDATE Events SET Status = 'Passed' WHERE ID = ?", (event_id,))
+    db.commit()
+    assert db.execute("SELECT TotalHoursContributed FROM Volunteers WHERE ID = 1").fetchone()[0] == hours + 3
+
+#////////////////////////////////////////////////////////////////////SEATS AND WAITLIST////////////////////////////////////////////////////////////////////
+
+def test_seats_fill_then_waitlist(db):
+    role_id = add_role(db, add_event(db), 2)
+    first, second, third = volunteer_ids(db, 3)
+
+    assert A.claim_seat(db, first, role_id) == "Pending"
+    assert A.claim_seat(db, second, role_id) == "Pending"
+    assert A.claim_seat(db, third, role_id) == "Waitlisted"
+    assert A.claim_seat(db, first, role_id) is None
+    assert A.claim_seat(db, third, role_id) is None
+    assert seats_held(db, role_id) == 2
+    assert signup(db, third, role_id) is None
+
+
+def test_full_role_answers_202(db, client):
+    role_id = add_role(db, add_event(db), 1)
+    A.claim_seat(db, volunteer_ids(db, 1)[0], role_id)
+    login(client, "charlie@gmail.com", "pass3")
+    assert client.post("/register_for_role", data={"role_id": role_id}).status_code == 202
+
+
+def test_rejection_promotes_the_waitlist(db, organisation):
+    role_id = add_role(db, add_event(db), 1)
+    first, second, third = volunteer_ids(db, 3)
+    for volunteer_id in (first, second, third):
+        A.claim_seat(db, volunteer_id, role_id)
+
+    response = organisation.post("/update_signup_status", json={"signup_id": signup(db, first, role_id)["ID"], "status": "Rejected"})
+    assert response.status_code == 200
+    assert response.get_json()["promoted"] == [second]
+    assert signup(db, second, role_id)["Status"] == "Pending"
+    assert [row[0] for row in db.execute("SELECT VolunteerID FROM Waitlist WHERE RoleID = ?", (role_id,))] == [third]
+    assert seats_held(db, role_id) == 1
+
+
+def test_accepting_a_rejected_signup_on_a_full_role_is_refused(db, organisation):
+    role_id = add_role(db, add_event(db), 1)
+    first, second = volunteer_ids(db, 2)
+    A.claim_seat(db, first, role_id)
+    A.claim_seat(db, second, role_id)
+    rejected = signup(db, first, role_id)["ID"]
+    organisation.post("/update_signup_status", json={"signup_id": rejected, "status": "Rejected"})
+
+    response = organisation.post("/update_signup_status", json={"signup_id": rejected, "status": "Accepted"})
+    assert response.status_code == 409
+    assert response.get_json()["error"] == "Role full"
+    assert signup(db, first, role_id)["Status"] == "Rejected"
+    assert seats_held(db, role_id) == 1
+
+#////////////////////////////////////////////////////////////////////BULK REVIEW////////////////////////////////////////////////////////////////////
+
+def test_bulk_review_leaves_other_organisations_signups_alone(db, organisation):
+    role_id = add_role(db, add_event(db), None)
+    foreign_event = db.execute(
+        "INSERT INTO Events (OrganisationID, Name, Date, Location, StartTime, EndTime) VALUES (1, 'Theirs', '2030-01-01', 'Sydney', '09:00', '12:00')"
+    ).lastrowid
+    foreign_role = add_role(db, foreign_event, None)
+    A.claim_seat(db, 1, role_id)
+    A.claim_seat(db, 1, foreign_role)
+
+    results = organisation.post("/update_signup_statuses", json={"updates": [
+        {"signup_id": signup(db, 1, role_id)["ID"], "status": "Accepted"},
+        {"signup_id": signup(db, 1, foreign_role)["ID"], "status": "Rejected"},
+    ]}).get_json()["results"]
+    assert results[0] == {"signup_id": signup(db, 1, role_id)["ID"], "status": "Accepted"}
+    assert results[1]["error"] == "Signup not found"
+    assert signup(db, 1, role_id)["Status"] == "Accepted"
+    assert signup(db, 1, foreign_role)["Status"] == "Pending"
+
+
+def test_a_rejection_in_the_same_batch_frees_a_seat(db, organisation):
+    role_id = add_role(db, add_event(db), 1)
+    first, second = volunteer_ids(db, 2)
+    A.claim_seat(db, first, role_id)
+    db.execute("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (?, ?, 'Rejected')", (second, role_id))
+    db.commit()
+
+    response = organisation.post("/update_signup_statuses", json={"updates": [
+        {"signup_id": signup(db, first, role_id)["ID"], "status": "Rejected"},
+        {"signup_id": signup(db, second, role_id)["ID"], "status": "Accepted"},
+    ]})
+    assert response.get_json()["skipped"] == []
+    assert signup(db, first, role_id)["Status"] == "Rejected"
+    assert signup(db, second, role_id)["Status"] == "Accepted"
+
+
+def test_bulk_acceptance_stops_at_the_free_seats(db, organisation):
+    role_id = add_role(db, add_event(db), 2)
+    volunteers = volunteer_ids(db, 3)
+    db.executemany("INSERT INTO Signups (VolunteerID, RoleID, Status) VALUES (?, ?, 'Rejected')", ((v, role_id) for v in volunteers))
+    db.commit()
+
+    response = organisation.post("/update_signup_statuses", json={"role_id": role_id, "from_status": "Rejected", "status": "Accepted"})
+    assert response.get_json()["skipped"] == [signup(db, volunteers[2], role_id)["ID"]]
+    assert [signup(db, v, role_id)["Status"] for v in volunteers] == ["Accepted", "Accepted", "Rejected"]
+    assert seats_held(db, role_id) == 2
+
+#////////////////////////////////////////////////////////////////////SESSIONS AND PASSWORDS////////////////////////////////////////////////////////////////////
+
+def test_login_moves_a_plain_password_to_a_hash(db, client):
+    assert login(client, "charlie@gmail.com", "pass3").headers["Location"] == "/"
+    assert db.execute("SELECT Password FROM Volunteers WHERE ID = ?", (CHARLIE,)).fetchone()[0] == ""
+    password_hash = db.execute("SELECT PasswordHash FROM Credentials WHERE UserType = 'volunteer' AND UserID = ?", (CHARLIE,)).fetchone()[0]
+    assert A.check_password_hash(password_hash, "pass3")
+
+    client.get("/logout")
+    assert login(client, "charlie@gmail.com", "pass3").headers["Location"] == "/"
+    assert login(A.app.test_client(), "charlie@gmail.com", "wrong").status_code == 200
+
+
+def test_password_change_revokes_the_other_sessions(client):
+    other = A.app.test_client()
+    login(client, "charlie@gmail.com", "pass3")
+    login(other, "charlie@gmail.com", "pass3")
+
+    assert client.post("/update_profile", json={"password": "changed"}).status_code == 200
+    assert client.get("/volunteer_stats").status_code == 200
+    assert other.get("/volunteer_stats").status_code == 401
+    assert login(other, "charlie@gmail.com", "changed").headers["Location"] == "/"
+
+
+def test_revoke_sessions_command_logs_an_account_out(client):
+    login(client, "charlie@gmail.com", "pass3")
+    result = A.app.test_cli_runner().invoke(args=["revoke-sessions", "charlie@gmail.com"])
+    assert "Revoked the sessions of 1 account(s)" in result.output
+    assert client.get("/volunteer_stats").status_code == 401
+
+
+def session_rows(db):
+    return db.execute("SELECT COUNT(*) FROM Sessions").fetchone()[0]
+
+
+def test_anonymous_flash_stays_in_the_cookie(db):
+    before = session_rows(db)
+    with A.app.test_request_context("/"):
+        flask.flash("Please log in", "info")
+        response = A.app.response_class()
+        A.app.session_interface.save_session(A.app, flask.session._get_current_object(), response)
+    cookie = response.headers["Set-Cookie"].split(";")[0]
+    assert session_rows(db) == before
+
+    with A.app.test_request_context("/", headers={"Cookie": cookie}):
+        assert flask.get_flashed_messages(with_categories=True) == [("info", "Please log in")]
+
+
+def test_signed_cookie_identity_is_not_trusted(client):
+    serializer = A.app.session_interface.get_signing_serializer(A.app)
+    client.set_cookie(A.app.config["SESSION_COOKIE_NAME"], serializer.dumps({"user_type": "volunteer", "user_id": CHARLIE}))
+    assert client.get("/volunteer_stats").status_code == 401
+
+
+def test_a_profile_password_is_hashed_once(db, client, monkeypatch):
+    login(client, "charlie@gmail.com", "pass3")
+    hashed = []
+    hash_password = A.hash_password
+    monkeypatch.setattr(A, "hash_password", lambda password: hashed.append(password) or hash_password(password))
+
+    assert client.post("/update_profile", json={"password": "changed", "bio": "Hi"}).status_code == 200
+    assert hashed == ["changed"]
+    with pytest.raises(ValueError):
+        A.update_profile(db, "volunteer", CHARLIE, {"password": "plain"})
+
+#////////////////////////////////////////////////////////////////////NOTIFICATIONS////////////////////////////////////////////////////////////////////
+
+def test_wsgi_refuses_the_notification_stream(organisation):
+    response = organisation.get("/notifications")
+    assert response.status_code == 501
+    assert b"asgi" in response.data
+
+
+def test_signups_page_subscribes_only_when_streams_are_served(organisation, monkeypatch):
+    assert b"new EventSource" not in organisation.get("/view_signups").data
+    monkeypatch.setitem(A.app.config, "LIVE_NOTIFICATIONS", True)
+    assert b"new EventSource" in organisation.get("/view_signups").data
+
+
+def test_a_signup_is_published_to_the_organisation(db, client):
+    role_id = add_role(db, add_event(db), None)
+    received = []
+    A.notification_bus.subscribe(("organisation", ORGANISATION_ID), received.append)
+    try:
+        login(client, "charlie@gmail.com", "pass3")
+        assert client.post("/register_for_role", data={"role_id": role_id}).status_code == 200
+    finally:
+        A.notification_bus.unsubscribe(("organisation", ORGANISATION_ID), received.append)
+    assert [(event, json.loads(data)["role_id"]) for _, _, event, data in received] == [("signup", role_id)]
+
+#////////////////////////////////////////////////////////////////////RECURRING EVENTS////////////////////////////////////////////////////////////////////
+
+def test_count_is_counted_from_the_start_of_the_series():
+    rule = A.parse_rrule("FREQ=WEEKLY;BYDAY=MO,TH;COUNT=5")
+    monday = date(2026, 1, 5)
+    assert list(A.occurrences(rule, monday, monday, date.max)) == [
+        date(2026, 1, 5), date(2026, 1, 8), date(2026, 1, 12), date(2026, 1, 15), date(2026, 1, 19)
+    ]
+    # A window starting later still stops at the fifth occurrence of the whole series
+    assert list(A.occurrences(rule, monday, date(2026, 1, 13), date.max)) == [date(2026, 1, 15), date(2026, 1, 19)]
+    assert A.series_end_date(rule, monday) == date(2026, 1, 19)
+
+
+def test_until_is_inclusive():
+    rule = A.parse_rrule("FREQ=DAILY;INTERVAL=2;UNTIL=2026-01-09")
+    start = date(2026, 1, 1)
+    assert list(A.occurrences(rule, start, start, date(2026, 12, 31))) == [
+        date(2026, 1, 1), date(2026, 1, 3), date(2026, 1, 5), date(2026, 1, 7), date(2026, 1, 9)
+    ]
+    assert A.series_end_date(rule, start) == date(2026, 1, 9)
+
+
+def test_monthly_skips_months_without_the_day():
+    rule = A.parse_rrule("FREQ=MONTHLY;COUNT=3")
+    start = date(2026, 1, 31)
+    assert list(A.occurrences(rule, start, start, date.max)) == [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)]
+
+
+def test_unsupported_rules_are_rejected():
+    for text in ("FREQ=YEARLY", "FREQ=DAILY;BYDAY=MO", "FREQ=WEEKLY;COUNT=0", "INTERVAL=2"):
+        with pytest.raises(ValueError):
+            A.parse_rrule(text)
+
+
+def create_weekly_series(organisation, db, count):
+    start = date.today() + timedelta(days=7)
+    response = organisation.post("/add_event", data={
+        "name": "Weekly clean-up", "date": start.isoformat(), "location": "Sydney",
+        "starttime": "09:00", "endtime": "11:00", "rrule": f"FREQ=WEEKLY;COUNT={count}",
+    })
+    assert response.status_code == 200
+    series_id = db.execute("SELECT MAX(ID) FROM EventSeries").fetchone()[0]
+    events = db.execute("SELECT ID, Date FROM Events WHERE SeriesID = ? ORDER BY Date", (series_id,)).fetchall()
+    assert len(events) == count
+    return series_id, events
+
+
+def test_deleting_following_occurrences_ends_the_series(db, organisation):
+    series_id, events = create_weekly_series(organisation, db, 6)
+
+    organisation.post("/events", data={"event_id": events[2]["ID"], "scope": "following"})
+    remaining = db.execute("SELECT ID FROM Events WHERE SeriesID = ? ORDER BY Date", (series_id,)).fetchall()
+    assert [row["ID"] for row in remaining] == [events[0]["ID"], events[1]["ID"]]
+    series = db.execute("SELECT Rule, EndDate FROM EventSeries WHERE ID = ?", (series_id,)).fetchone()
+    last = date.fromisoformat(events[2]["Date"]) - timedelta(days=1)
+    assert series["EndDate"] == last.isoformat()
+    rule = A.parse_rrule(series["Rule"])
+    assert rule["COUNT"] is None and rule["UNTIL"] == last
+    assert drift(db) == 0
+
+
+def test_editing_following_occurrences_splits_the_series(db, organisation):
+    series_id, events = create_weekly_series(organisation, db, 4)
+
+    response = organisation.post("/edit_event", data={"event_id": events[1]["ID"], "description": "Bring gloves", "scope": "following"})
+    assert response.status_code == 200
+    rows = db.execute(
+        "SELECT SeriesID, Description FROM Events WHERE ID IN (SELECT value FROM json_each(?)) ORDER BY Date",
+        (A.json.dumps([e["ID"] for e in events]),)
+    ).fetchall()
+    assert rows[0]["SeriesID"] == series_id and rows[0]["Description"] != "Bring gloves"
+    new_series = rows[1]["SeriesID"]
+    assert new_series != series_id
+    assert [(row["SeriesID"], row["Description"]) for row in rows[1:]] == [(new_series, "Bring gloves")] * 3
+    old_rule = A.parse_rrule(db.execute("SELECT Rule FROM EventSeries WHERE ID = ?", (series_id,)).fetchone()[0])
+    new_rule = A.parse_rrule(db.execute("SELECT Rule FROM EventSeries WHERE ID = ?", (new_series,)).fetchone()[0])
+    assert list(A.occurrences(old_rule, date.fromisoformat(events[0]["Date"]), date.min, date.max)) == [date.fromisoformat(events[0]["Date"])]
+    assert len(list(A.occurrences(new_rule, date.fromisoformat(events[1]["Date"]), date.min, date.max))) == 3
+
+#////////////////////////////////////////////////////////////////////EVENT LIFECYCLE////////////////////////////////////////////////////////////////////
+
+def add_signed_up_events(db, n, days_ahead=30):
+    volunteers = volunteer_ids(db, 3)
+    event_ids = []
+    for i in range(n):
+        event_id = add_event(db, days_ahead + i, name=f"Stats {i}")
+        role_id = add_role(db, event_id, 2)
+        for volunteer_id in volunteers:
+            A.claim_seat(db, volunteer_id, role_id)
+        event_ids.append(event_id)
+    db.execute("UPDATE Signups SET Status = 'Accepted' WHERE ID IN (SELECT MIN(ID) FROM Signups GROUP BY RoleID)")
+    db.commit()
+    return event_ids
+
+
+def test_stats_match_a_recount_after_archiving(db):
+    event_ids = add_signed_up_events(db, 3, days_ahead=-(A.ARCHIVE_AFTER_DAYS + 30))
+    assert drift(db) == 0
+
+    passed, archived = A.run_lifecycle(db)
+    assert archived >= len(event_ids)
+    assert db.execute("SELECT COUNT(*) FROM ArchivedEvents WHERE ID IN (SELECT value FROM json_each(?))",
+                      (json.dumps(event_ids),)).fetchone()[0] == len(event_ids)
+    assert drift(db) == 0
+
+
+def test_passing_an_event_closes_its_pending_signups(db):
+    event_id, = add_signed_up_events(db, 1, days_ahead=-1)
+    A.run_lifecycle(db)
+    assert db.execute("SELECT Status FROM Events WHERE ID = ?", (event_id,)).fetchone()[0] == "Passed"
+    statuses = db.execute(
+        "SELECT s.Status FROM Signups s JOIN EventRoles er ON er.ID = s.RoleID WHERE er.EventID = ? ORDER BY s.ID", (event_id,)
+    ).fetchall()
+    assert [row[0] for row in statuses] == ["Accepted", "Rejected"]
+    assert drift(db) == 0
+
+
+def test_scheduler_starts_after_the_pool_has_migrated(tmp_path, monkeypatch):
+    path = copy_sample(tmp_path)
+    monkeypatch.setattr(A, "DATABASE", str(path))
+    monkeypatch.setattr(A, "LIFECYCLE_INTERVAL_SECONDS", 3600)
+    monkeypatch.setattr(A, "_lifecycle_pids", set())
+    migrated_threads = []
+    migrate = A.migrate
+    monkeypatch.setattr(A, "migrate", lambda db: migrated_threads.append(threading.current_thread().name) or migrate(db))
+    first_run = threading.Event()
+    seen = []
+    monkeypatch.setattr(A, "run_lifecycle", lambda db: seen.append(A.needs_migration(str(path))) or first_run.set() or (0, 0))
+
+    A.app.test_client().get("/")
+    assert first_run.wait(10)
+    assert seen == [False]
+    assert "lifecycle" not in migrated_threads
+
+
+def test_series_are_extended_by_the_lifecycle_not_by_reads(db, organisation):
+    organisation.post("/add_event", data={
+        "name": "Weekly clean-up", "date": (date.today() + timedelta(days=7)).isoformat(), "location": "Sydney",
+        "starttime": "09:00", "endtime": "11:00", "rrule": "FREQ=WEEKLY",
+    })
+    series_id = db.execute("SELECT MAX(ID) FROM EventSeries").fetchone()[0]
+    stored = db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID = ?", (series_id,)).fetchone()[0]
+    # As if the horizon was last moved a month ago
+    db.execute("DELETE FROM Events WHERE SeriesID = ? AND Date > ?", (series_id, (date.today() + timedelta(days=60)).isoformat()))
+    db.execute("UPDATE EventSeries SET MaterialisedUntil = ? WHERE ID = ?", ((date.today() + timedelta(days=60)).isoformat(), series_id))
+    db.commit()
+    trimmed = db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID = ?", (series_id,)).fetchone()[0]
+    generation = db.execute("SELECT Value FROM DataGeneration").fetchone()[0]
+
+    assert organisation.get("/get_events").status_code == 200
+    assert db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID = ?", (series_id,)).fetchone()[0] == trimmed
+
+    A.run_lifecycle(db)
+    assert db.execute("SELECT COUNT(*) FROM Events WHERE SeriesID = ?", (series_id,)).fetchone()[0] == stored
+    assert db.execute("SELECT Value FROM DataGeneration").fetchone()[0] == generation + 1
+
+#////////////////////////////////////////////////////////////////////SIGNUP DASHBOARD////////////////////////////////////////////////////////////////////
+
+def test_dashboard_counts_each_events_roles(db, organisation):
+    add_signed_up_events(db, 1, days_ahead=400)
+    page = organisation.get("/signup_dashboard", query_string={"limit": 100}).get_json()
+    event = page["events"][-1]
+    assert (event["volunteers_needed"], event["pending"], event["accepted"], event["rejected"]) == (2, 1, 1, 0)
+    role_id = event["roles"][0]["id"]
+    signups = organisation.get("/get_role_signups", query_string={"role_id": role_id}).get_json()["signups"]
+    assert [s["status"] for s in signups] == ["Accepted", "Pending"]
+
+#////////////////////////////////////////////////////////////////////VOLUNTEER PROFILES////////////////////////////////////////////////////////////////////
+
+def test_profile_follows_signups_and_skills(db, client):
+    login(client, "charlie@gmail.com", "pass3")
+    before = A.load_profiles(db, [CHARLIE])[CHARLIE]
+    role_id = add_role(db, add_event(db), None)
+    assert client.post("/register_for_role", data={"role_id": role_id}).status_code == 200
+    assert client.post("/update_profile", json={"skills": ["First Aid", "Cooking"]}).status_code == 200
+
+    after = A.load_profiles(db, [CHARLIE])[CHARLIE]
+    assert after["upcoming_signups"] == before["upcoming_signups"] + 1
+    assert after["skills"] == ["Cooking", "First Aid"]
+    assert drift(db) == 0
+
+
+def test_missing_volunteer_is_not_found(client):
+    assert client.get("/volunteer/9999").status_code == 404
+
+
+#////////////////////////////////////////////////////////////////////DELETING EVENTS////////////////////////////////////////////////////////////////////
+
+def test_stats_match_a_recount_after_bulk_delete(db, organisation):
+    event_ids = add_signed_up_events(db, 4)
+    assert drift(db) == 0
+
+    response = organisation.post("/delete_events", json={"event_ids": event_ids[:3]})
+    assert sorted(response.get_json()["deleted"]) == sorted(event_ids[:3])
+    assert db.execute("SELECT COUNT(*) FROM EventRoles WHERE EventID IN (SELECT value FROM json_each(?))",
+                      (json.dumps(event_ids[:3]),)).fetchone()[0] == 0
+    assert drift(db) == 0
+
+
+def test_organisations_only_delete_their_own_events(db, organisation):
+    event_id = add_event(db)
+    db.execute("UPDATE Events SET OrganisationID = (SELECT MIN(ID) FROM Organisations WHERE ID != ?) WHERE ID = ?",
+               (ORGANISATION_ID, event_id))
+    db.commit()
+
+    response = organisation.post("/delete_events", json={"event_ids": [event_id]})
+    assert response.get_json() == {"deleted": [], "not_found": [event_id]}
+    assert db.execute("SELECT 1 FROM Events WHERE ID = ?", (event_id,)).fetchone()
+
+
+def test_the_foreign_key_cascade_replaces_the_delete_trigger(db, organisation):
+    assert not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_cascade_delete'").fetchone()
+    event_id = add_signed_up_events(db, 1)[0]
+    role_id = db.execute("SELECT ID FROM EventRoles WHERE EventID = ?", (event_id,)).fetchone()[0]
+    assert db.execute("SELECT COUNT(*) FROM Waitlist WHERE RoleID = ?", (role_id,)).fetchone()[0] == 1
+
+    assert organisation.post("/delete_events", json={"event_ids": [event_id]}).get_json()["deleted"] == [event_id]
+    assert not db.execute("SELECT 1 FROM EventRoles WHERE ID = ?", (role_id,)).fetchone()
+    for table in ("Signups", "Waitlist"):
+        assert db.execute(f"SELECT COUNT(*) FROM {table} WHERE RoleID = ?", (role_id,)).fetchone()[0] == 0
+        assert db.execute(f"PRAGMA foreign_key_check({table})").fetchall() == []
+    assert drift(db) == 0
+
+
+def test_delete_form_offers_the_later_occurrences():
+    event = {"Id": 1, "Name": "Clean-up", "Description": "", "Date": "2030-01-01", "SeriesID": None}
+    with A.app.test_request_context():
+        single = flask.render_template("fragments/event_card.html", event=event, manage=True)
+        repeating = flask.render_template("fragments/event_card.html", event=dict(event, SeriesID=7), manage=True)
+    assert 'name="scope"' not in single
+    assert 'name="scope" value="following"' in repeating
+
+
+#////////////////////////////////////////////////////////////////////READ CONNECTIONS////////////////////////////////////////////////////////////////////
+
+def connected_file(db):
+    return Path(db.execute("PRAGMA database_list").fetchone()[2])
+
+
+def test_read_only_views_cannot_write(db):
+    with A.app.test_request_context("/events"):
+        flask.g._read_only = True
+        reader = A.get_db()
+        assert connected_file(reader) == Path(A.DATABASE)
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            reader.execute("INSERT INTO Skills (Name) VALUES ('Juggling')")
+
+
+def test_a_session_reads_the_live_file_after_it_writes(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "READ_REPLICA", str(tmp_path / "replica.db"))
+    monkeypatch.setitem(A.replica_state, "snapshot_at", A.refresh_replica())
+    with A.app.test_request_context("/events"):
+        assert connected_file(A.get_read_db()) == tmp_path / "replica.db"
+    with A.app.test_request_context("/events"):
+        flask.session["written_at"] = A.replica_state["snapshot_at"] + 1
+        assert connected_file(A.get_read_db()) == Path(A.DATABASE)
+
+
+def test_signups_hash_before_taking_the_writer(db, client, monkeypatch):
+    writer_held = []
+    hash_password = A.hash_password
+    monkeypatch.setattr(A, "hash_password",
+                        lambda password: writer_held.append("write" in flask.g.get("_connections", {})) or hash_password(password))
+
+    client.post("/signup/volunteer", data={
+        "first_name": "Dana", "last_name": "Scully", "email": "dana@example.com", "password": "secret",
+        "birthdate": "1990-01-01", "phone": "0400000000", "location": "Sydney",
+    })
+    client.post("/signup/organisation", data={
+        "org_name": "Shore Care", "address": "1 Beach Rd", "email": "shore@example.com", "password": "secret",
+    })
+    assert writer_held == [False, False]
+    assert login(A.app.test_client(), "dana@example.com", "secret").headers["Location"] == "/"
+
+
+def test_profile_page_reads_from_a_read_only_connection(client):
+    login(client, "charlie@gmail.com", "pass3")
+    write_pool = A.get_pool("write")
+    checkouts = write_pool.metrics["checkouts"]
+    assert client.get("/edit_profile").status_code == 200
+    assert write_pool.metrics["checkouts"] == checkouts